@@ -0,0 +1,53 @@
+import time
+import random
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# ==============================
+# 🌐 Flow 전용 HTTP 세션
+# ==============================
+# 업로드 API 를 여러 번 호출하므로 세션 하나로 keep-alive 연결을 재사용한다
+RETRIES = 3
+RETRY_STATUS = (429, 503)   # 서버가 요청을 처리하지 않았다고 볼 수 있는 응답만 (POST 중복 등록 방지)
+BACKOFF_BASE = 0.5          # 초
+BACKOFF_CAP = 30.0          # 초
+
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_maxsize=4))
+session.mount("https://", HTTPAdapter(pool_maxsize=4))
+
+
+def backoff(attempt: int, retry_after=None) -> float:
+    """Retry-After(초) 가 있으면 그대로, 없으면 지수 백오프 + full jitter"""
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), BACKOFF_CAP)
+    except ValueError:
+        pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def post(url: str, retries: int = RETRIES, retry_status=RETRY_STATUS, **kwargs) -> requests.Response:
+    """
+    POST 1건 → 마지막 응답 (상태 코드 확인은 호출하는 쪽에서)
+    연결 실패(요청이 서버에 닿지 않음)와 retry_status 응답만 재시도한다.
+    타임아웃은 서버가 이미 처리했을 수 있으므로 재시도하지 않는다.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = session.post(url, **kwargs)
+        except requests.ConnectionError as e:
+            if attempt == retries:
+                raise
+            delay = backoff(attempt)
+            print(f"⚠️ 요청 실패: {e} → {delay:.1f}s 후 재시도 ({attempt + 1}/{retries})")
+            time.sleep(delay)
+            continue
+
+        if response.status_code not in retry_status or attempt == retries:
+            return response
+        delay = backoff(attempt, response.headers.get("Retry-After"))
+        print(f"⚠️ 응답 오류: {response.status_code} → {delay:.1f}s 후 재시도 ({attempt + 1}/{retries})")
+        response.close()
+        time.sleep(delay)
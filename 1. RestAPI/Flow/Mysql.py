@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 from dotenv import load_dotenv
 from dataclasses import dataclass
 from typing import List, Optional
@@ -8,6 +7,8 @@ from datetime import datetime
 
 # ✅ Vision 기능 import
 import VisionAPI
+# ✅ 재시도 / keep-alive 세션 (Flow/HttpClient.py)
+import HttpClient
 
 
 # ==============================
@@ -107,7 +108,8 @@ class Mysql:
         print(json.dumps(payload, ensure_ascii=False, indent=2))
 
         headers = {"Content-Type": "application/json"}
-        response = requests.post(api_url, json=payload, headers=headers, timeout=10)
+        # POST 는 중복 등록을 막기 위해 서버가 처리하지 않은 경우(연결 실패 / 429 / 503)만 재시도
+        response = HttpClient.post(api_url, json=payload, headers=headers, timeout=10)
 
         if response.status_code == 200:
             print(f"✅ 업로드 성공: {payload_dto.instaPostId}")
@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+import pymysql
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .Metrics import metrics
+except ImportError:
+    # 단독 실행(Pipeline/Database.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        from Logger import Logger
+        from Metrics import metrics
+    except ImportError:
+        # 이 파일을 그대로 복사해 쓰는 앱(3. FCM / 5. streamlit): 로그는 print, 실행 지표는 생략
+        class Logger:
+            def __init__(self, name: str):
+                self.name = name
+
+            def plain(self, msg: str):
+                print(f"[{self.name}] {msg}")
+
+            warn = plain
+
+        class _NoMetrics:
+            def add(self, *args, **kwargs):
+                pass
+
+        metrics = _NoMetrics()
+
+
+DEFAULT_POOL_SIZE = 5
+BORROW_TIMEOUT = 30.0        # 풀이 가득 찼을 때 대기 한도 (초)
+SLOW_QUERY_SECONDS = 1.0     # 이보다 오래 걸린 문장은 경고 로그
+
+
+# ==============================
+# ⏱ 문장별 실행 시간 측정 커서
+# ==============================
+class TimedCursor:
+    """pymysql 커서를 감싸 execute/executemany 시간을 풀 통계에 기록한다"""
+
+    def __init__(self, cursor, pool: "ConnectionPool"):
+        self._cursor = cursor
+        self._pool = pool
+
+    def _timed(self, method, query, args):
+        start = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            self._pool.record(query, time.perf_counter() - start)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+# ==============================
+# 🔌 풀에서 빌린 연결
+# ==============================
+class PooledConnection:
+    """
+    pymysql 연결 대리 객체. close() / with 블록 종료 시 실제로 끊지 않고 풀에 반납한다.
+    기존 코드(conn.cursor(), conn.commit(), conn.close(), with get_connection() as conn)를 그대로 쓸 수 있다.
+    """
+
+    def __init__(self, conn, pool: "ConnectionPool"):
+        self._conn = conn
+        self._pool = pool
+
+    def cursor(self, *args, **kwargs):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("이미 반납된 연결")
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._pool)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("이미 반납된 연결")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # 반납을 잊은 연결도 GC 시점에 풀로 돌려준다
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ==============================
+# 🗄 MySQL 커넥션 풀
+# ==============================
+class ConnectionPool:
+    """
+    크기가 정해진 pymysql 커넥션 풀
+    - 빌릴 때 ping 으로 상태 확인 (끊긴 연결은 재연결, 실패하면 새로 연결)
+    - 반납 시 끝나지 않은 트랜잭션은 rollback
+    - 문장 종류별 실행 횟수/누적 시간 통계 + 느린 문장 경고
+    """
+
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE, timeout: float = BORROW_TIMEOUT,
+                 slow_query: float = SLOW_QUERY_SECONDS, name: str = "MySQL", **connect_kwargs):
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.slow_query = slow_query
+        self.connect_kwargs = {
+            "charset": "utf8mb4",
+            "cursorclass": pymysql.cursors.DictCursor,
+            **connect_kwargs,
+        }
+        self.slots = threading.BoundedSemaphore(self.max_size)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.created = 0
+        self.timings: Dict[str, list] = defaultdict(lambda: [0, 0.0])   # 문장 종류 → [횟수, 누적 초]
+        self.log = Logger(f"{name}Pool")
+
+    # ---------- 대여 / 반납 ----------
+    def connection(self) -> PooledConnection:
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"DB 커넥션 풀 대기 시간 초과 ({self.max_size}개 모두 사용 중)")
+        try:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is not None:
+                try:
+                    conn.ping(reconnect=True)   # 서버가 끊은 유휴 연결은 여기서 다시 연결
+                except Exception:
+                    self._discard(conn)
+                    conn = None
+            if conn is None:
+                conn = pymysql.connect(**self.connect_kwargs)
+                self.created += 1
+            return PooledConnection(conn, self)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.open:
+                conn.rollback()   # 커밋하지 않은 작업은 다음 사용자에게 넘기지 않는다
+                with self.lock:
+                    self.idle.append(conn)
+        except Exception:
+            self._discard(conn)
+        finally:
+            self.slots.release()
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    # ---------- 통계 ----------
+    def record(self, query: str, elapsed: float):
+        kind = " ".join(query.split()[:3]).upper()   # 예: "SELECT ID, UUID," / "INSERT INTO POPUP"
+        with self.lock:
+            self.timings[kind][0] += 1
+            self.timings[kind][1] += elapsed
+        metrics.add("db", "calls")
+        metrics.add("db", "api_seconds", elapsed)
+        if elapsed >= self.slow_query:
+            self.log.warn(f"🐢 느린 쿼리 {elapsed:.2f}s: {' '.join(query.split())[:120]}")
+
+    def report(self):
+        with self.lock:
+            rows = sorted(self.timings.items(), key=lambda kv: -kv[1][1])
+        self.log.plain(f"🗄 연결 생성 {self.created}회, 풀 크기 {self.max_size}")
+        for kind, (count, total) in rows:
+            self.log.plain(f"   {kind:<40} {count:>5}회  {total:7.2f}s  (평균 {total / count * 1000:.1f}ms)")
+
+
+# ==============================
+# 🧭 공용 풀 (프로세스당 접속 정보별 1개)
+# ==============================
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: Optional[str] = None, prefix: str = "DB", max_size: Optional[int] = None) -> ConnectionPool:
+    """
+    환경 변수로 접속 정보를 읽어 공용 풀을 돌려준다.
+    - 기본: DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+    - prefix 를 바꾸면 {prefix}_HOST ... ({prefix}_NAME 이 없으면 {prefix}_DATABASE)
+    host 를 주면 {prefix}_HOST 대신 사용 (서버 실행 시 127.0.0.1 등)
+    """
+    config = {
+        "host": host or os.getenv(f"{prefix}_HOST"),
+        "port": int(os.getenv(f"{prefix}_PORT", 3306)),
+        "user": os.getenv(f"{prefix}_USER"),
+        "password": os.getenv(f"{prefix}_PASSWORD"),
+        "database": os.getenv(f"{prefix}_NAME") or os.getenv(f"{prefix}_DATABASE"),
+    }
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            size = max_size or int(os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+            pool = _pools[key] = ConnectionPool(max_size=size, **config)
+        return pool
+
+
+def get_connection(host: Optional[str] = None, prefix: str = "DB") -> PooledConnection:
+    """공용 풀에서 연결 1개 대여 (close() 하면 반납)"""
+    return get_pool(host, prefix).connection()
+
+
+def report_all():
+    """프로세스에서 만든 모든 풀의 쿼리 통계 출력"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.report()
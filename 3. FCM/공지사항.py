@@ -1,24 +1,19 @@
-import os
-import mysql.connector
-from mysql.connector import Error
 from dotenv import load_dotenv
-from FCM import send_fcm_notification
+from FCM import initialize_firebase
+# ✅ Database.py / FcmSender.py 는 6. ETL/v6/Pipeline 의 같은 파일을 그대로 복사한 것 (수정 시 함께 맞출 것)
+import Database
+from FcmSender import FcmSender
 
 # .env 파일 로드
 load_dotenv()
 
 def fetch_all_fcm_tokens():
+    conn = None
     try:
-        # DB 연결
-        conn = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            port=int(os.getenv("DB_PORT")),       # ← 여기 추가됨
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-        )
+        # DB 연결 (DB_HOST / DB_PORT / DB_USER / DB_PASSWORD / DB_NAME)
+        conn = Database.get_connection()
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         # FCM 전체 조회
         # cursor.execute("SELECT uuid, fcm_token FROM users")
@@ -31,23 +26,31 @@ def fetch_all_fcm_tokens():
         rows = cursor.fetchall()
 
         print("전체 사용자에게 알림을 보냅니다.")
-        for row in rows:
-            print(f"{row['uuid']} → {row['fcm_token']}")
-            send_fcm_notification(
-                fcm_token=row['fcm_token'],
-                title="공지사항 🔔",
-                body="팝팡 알림 반복 테스트 예정입니다. 알림을 해제해주세요."
-            )
+        initialize_firebase()
+        # 500개 단위 multicast 묶음을 동시에 전송 (묶음 수 / 소요 시간 / 초당 전송 수 출력)
+        sender = FcmSender(max_workers=8)
+        results = sender.broadcast(
+            [row['fcm_token'] for row in rows],
+            title="공지사항 🔔",
+            body="팝팡 알림 반복 테스트 예정입니다. 알림을 해제해주세요."
+        )
+        for result in results:
+            if not result.success and not result.dead:
+                print(f"❌ 전송 실패 {result.token[:20]}... ({result.error_code}): {result.error}")
+
+        # 만료/잘못된 토큰은 users.fcm_token NULL 처리 → 다음 공지부터 살아있는 기기에만 전송
+        sender.prune_dead_tokens(conn, results)
+        print(f"📊 FCM 지표: {dict(sender.metrics)}")
 
         return rows
 
-    except Error as e:
-        print("❌ MySQL Error:", e)
+    except Exception as e:
+        print("❌ 오류:", e)
 
     finally:
-        if conn.is_connected():
-            cursor.close()
+        if conn:
             conn.close()
+        Database.report_all()   # 문장별 실행 횟수 / 시간
 
 
 # 실행
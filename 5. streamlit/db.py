@@ -1,16 +1,11 @@
-import pymysql
-import os
 from dotenv import load_dotenv
 
+# ✅ Database.py 는 6. ETL/v6/Pipeline/Database.py 를 그대로 복사한 것 (수정 시 두 파일을 함께 맞출 것)
+#    페이지가 다시 실행돼도 모듈은 유지되므로 풀의 연결을 재사용한다
+import Database
+
 load_dotenv()
 
 def get_connection():
-    return pymysql.connect(
-        host=os.getenv("MYSQL_HOST"),
-        port=int(os.getenv("MYSQL_PORT", 3306)),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DATABASE"),
-        charset="utf8mb4",
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    """풀에서 연결 대여 — with 블록 종료 / conn.close() 시 반납 (반납을 잊은 연결은 GC 때 반납)"""
+    return Database.get_connection(prefix="MYSQL")
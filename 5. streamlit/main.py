@@ -31,8 +31,7 @@ st.caption("PopPang 운영 데이터를 한눈에 확인할 수 있는 관리자
 # ✅ 1. 통계 함수들
 # ------------------------------------------------------------
 def get_summary_stats():
-    conn = get_connection()
-    with conn.cursor() as cursor:
+    with get_connection() as conn, conn.cursor() as cursor:
         cursor.execute("SELECT COUNT(*) AS count FROM users;")
         total_users = cursor.fetchone()
         total_users = total_users["count"] if total_users else 0
@@ -49,13 +48,11 @@ def get_summary_stats():
         today_popups = cursor.fetchone()
         today_popups = today_popups["count"] if today_popups else 0
 
-    conn.close()
     return total_users, active_popups, inactive_popups, today_popups
 
 
 def get_system_status():
-    conn = get_connection()
-    with conn.cursor() as cursor:
+    with get_connection() as conn, conn.cursor() as cursor:
         cursor.execute("""
             SELECT name, updated_at
             FROM popup
@@ -69,7 +66,6 @@ def get_system_status():
             FROM users;
         """)
         alert_ratio_row = cursor.fetchone()
-    conn.close()
 
     last_popup_name = last_popup.get("name") if last_popup else "없음"
     last_updated_at = str(last_popup.get("updated_at")) if last_popup else "-"
@@ -80,8 +76,7 @@ def get_system_status():
 
 # ✅ 중복 위경도 그룹 수 계산
 def get_duplicate_popup_groups():
-    conn = get_connection()
-    with conn.cursor() as cursor:
+    with get_connection() as conn, conn.cursor() as cursor:
         cursor.execute("""
             SELECT latitude, longitude, COUNT(*) AS count
             FROM popup
@@ -90,14 +85,12 @@ def get_duplicate_popup_groups():
             HAVING COUNT(*) >= 2;
         """)
         rows = cursor.fetchall()
-    conn.close()
     duplicate_group_count = len(rows)
     return duplicate_group_count
 
 
 def get_user_trend():
-    conn = get_connection()
-    with conn.cursor() as cursor:
+    with get_connection() as conn, conn.cursor() as cursor:
         cursor.execute("""
             SELECT DATE(created_at) AS date, COUNT(*) AS count
             FROM users
@@ -107,7 +100,6 @@ def get_user_trend():
             LIMIT 14;
         """)
         rows = cursor.fetchall()
-    conn.close()
     if not rows:
         return pd.DataFrame(columns=["date", "count"])
     df = pd.DataFrame(rows)
@@ -15,6 +15,7 @@ st.caption("PopPang 사용자 계정 데이터 관리")
 
 # ✅ 사용자 목록 로드 함수
 def load_users():
+    conn = None
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
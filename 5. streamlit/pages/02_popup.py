@@ -14,6 +14,7 @@ st.caption("PopPang 앱의 팝업 스케줄 데이터 관리")
 
 # ✅ 팝업 목록 로드
 def load_popups():
+    conn = None
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
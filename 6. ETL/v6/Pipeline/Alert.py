@@ -0,0 +1,342 @@
+import os
+import json
+from dotenv import load_dotenv
+import firebase_admin
+from firebase_admin import credentials, messaging
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .StateStore import StateStore
+    from .KeywordMatcher import KeywordMatcher
+    from .FcmSender import FcmSender
+    from . import Database
+    from .Metrics import metrics
+except ImportError:
+    # 단독 실행(Pipeline/Alert.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from StateStore import StateStore
+    from KeywordMatcher import KeywordMatcher
+    from FcmSender import FcmSender
+    import Database
+    from Metrics import metrics
+
+
+# ==============================================
+# 🔥 Firebase 모듈
+# ==============================================
+def initialize_firebase():
+    """ Firebase Admin SDK 초기화 (중복 방지) """
+    if not firebase_admin._apps:
+        cred = credentials.Certificate("./poppangfcm-firebase-adminsdk-fbsvc-84728d5589.json")
+        firebase_admin.initialize_app(cred)
+
+
+def send_fcm_notification(fcm_token: str, title: str, body: str) -> bool:
+    """ FCM 전송 """
+    if not fcm_token:
+        print("⚠️  FCM 토큰 없음 → 스킵")
+        return False
+
+    try:
+        initialize_firebase()
+        message = messaging.Message(
+            token=fcm_token,
+            notification=messaging.Notification(title=title, body=body),
+        )
+        response = messaging.send(message)
+        print(f"✅ FCM 전송 성공 → {response}")
+        return True
+    except Exception as e:
+        print(f"❌ FCM 전송 실패: {e}")
+        return False
+
+
+# ==============================================
+# 🗄 DB Utility
+# ==============================================
+def get_connection(local=True):
+    """ MySQL 연결 (공용 풀에서 대여 → close() 시 반납) """
+    load_dotenv()
+    host = "127.0.0.1" if local else "poppang.co.kr"
+    return Database.get_connection(host)
+
+
+# ==============================================
+# 📌 쿼리 함수 — 유저별 키워드 묶어서 반환
+# ==============================================
+def fetch_user_keywords_grouped(conn):
+    """
+    결과 형태:
+    [
+        {
+            "user_id": 1,
+            "nickname": "김동현",
+            "fcm_token": "...",
+            "keywords": ["팝업", "짱구"]
+        }
+    ]
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 
+                u.id AS user_id,
+                u.nickname,
+                u.fcm_token,
+                k.alert_keyword AS keyword
+            FROM users u
+            JOIN user_alert_keyword k ON u.id = k.users_id
+            WHERE u.is_deleted = 0
+              AND u.is_alerted = 1
+        """)
+        rows = cursor.fetchall()
+
+    users = {}
+    for row in rows:
+        uid = row["user_id"]
+        if uid not in users:
+            users[uid] = {
+                "user_id": uid,
+                "nickname": row["nickname"],
+                "fcm_token": row["fcm_token"],
+                "keywords": []
+            }
+        users[uid]["keywords"].append(row["keyword"])
+
+    return list(users.values())
+
+
+# ==============================================
+# 📌 user_alert 묶음 INSERT (중복 방지)
+# ==============================================
+# 중복 방지는 (users_id, popup_id) 유니크 키 + INSERT IGNORE 로 한다 — 키가 없으면 INSERT IGNORE 가 중복을 막지 못하므로
+# 알림 단계를 멈춘다 (완료 기록이 남지 않아 키를 만든 뒤 다음 실행에서 다시 처리). 배포 DB 에 한 번만 (DBA):
+#   ALTER TABLE user_alert ADD UNIQUE KEY uk_user_alert_users_popup (users_id, popup_id);
+# 기존 쌍은 청크 단위로 먼저 조회해서 걸러낸다 (이미 보낸 알림을 INSERT 문장에 싣지 않는다)
+USER_ALERT_CHUNK = 1000
+_user_alert_key_checked = False
+
+
+def require_user_alert_key(conn):
+    """user_alert 에 (users_id, popup_id) 유니크 키가 있는지 확인 (프로세스당 1회), 없으면 RuntimeError"""
+    global _user_alert_key_checked
+    if _user_alert_key_checked:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT index_name AS index_name, column_name AS column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'user_alert' AND non_unique = 0
+        """)
+        unique_keys = {}
+        for row in cursor.fetchall():
+            unique_keys.setdefault(row["index_name"], set()).add(row["column_name"].lower())
+    if {"users_id", "popup_id"} not in unique_keys.values():
+        raise RuntimeError(
+            "user_alert (users_id, popup_id) 유니크 키 없음 → INSERT IGNORE 로 중복을 막을 수 없어 알림 중단. "
+            "ALTER TABLE user_alert ADD UNIQUE KEY uk_user_alert_users_popup (users_id, popup_id);"
+        )
+    _user_alert_key_checked = True
+
+
+def insert_user_alerts(conn, pairs):
+    """(user_id, popup_id) 목록 → multi-row INSERT IGNORE (청크별 1문장, 커밋 1회) → 삽입 행 수"""
+    pairs = list(dict.fromkeys((user_id, popup_id) for user_id, popup_id in pairs if popup_id))
+    if not pairs:
+        return 0
+    require_user_alert_key(conn)   # 예외는 호출한 쪽(Alert.notify)으로 → 전송 / 완료 기록 없이 종료
+
+    inserted = 0
+    try:
+        with conn.cursor() as cursor:
+            popup_ids = list({popup_id for _, popup_id in pairs})
+            existing = set()
+            for i in range(0, len(popup_ids), USER_ALERT_CHUNK):
+                chunk = popup_ids[i:i + USER_ALERT_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"SELECT users_id, popup_id FROM user_alert WHERE popup_id IN ({placeholders})", chunk
+                )
+                existing.update((row["users_id"], row["popup_id"]) for row in cursor.fetchall())
+            pairs = [pair for pair in pairs if pair not in existing]
+
+            for i in range(0, len(pairs), USER_ALERT_CHUNK):
+                inserted += cursor.executemany(
+                    "INSERT IGNORE INTO user_alert (users_id, popup_id) VALUES (%s, %s)",
+                    pairs[i:i + USER_ALERT_CHUNK],
+                )
+        conn.commit()
+        metrics.add("alert", "user_alert_rows", inserted)
+        print(f"💾 user_alert INSERT → {inserted}건 (기존 {len(existing)}건 제외)")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ user_alert INSERT 실패: {e}")
+    return inserted
+
+
+# ==============================================
+# 📚 mysql.json 로드
+# ==============================================
+def load_popup_json():
+    json_path = os.path.join(os.getcwd(), "mysql.json")
+    if not os.path.exists(json_path):
+        print("❌ mysql.json 없음")
+        return []
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ==============================================
+# 🎯 Alert 메인
+# ==============================================
+class Alert:
+    log = Logger("AlertAPI", stage="alert")
+
+    @staticmethod
+    def play(local=False, state=None):
+        # mysql.json 로드 → 알림 처리
+        Alert.notify(load_popup_json(), local=local, state=state)
+
+    @staticmethod
+    @metrics.timed("alert")
+    def notify(popups, local=False, state=None):
+        """업로드된 팝업 목록(popup_id 포함)으로 알림 처리 (파일 입출력 없음 → Runner 에서 호출)"""
+        if not popups:
+            return
+
+        # 1) DB 연결
+        conn = get_connection(local)
+
+        try:
+            # 2) 유저별 키워드 가져오기 (그룹 형태)
+            users = fetch_user_keywords_grouped(conn)
+
+            # 3) 이미 알림 처리한 게시물 제외
+            state = state or StateStore()
+            hashes = {
+                popup.get("insta_post_id"): StateStore.content_hash(popup.get("caption"))
+                for popup in popups
+            }
+            popups = [
+                popup for popup in popups
+                if state.lookup("alert", popup.get("insta_post_id"), hashes[popup.get("insta_post_id")]) is None
+            ]
+            if not popups:
+                Alert.log.plain("♻️ 새로 알릴 팝업 없음 (모두 처리 완료)")
+                return
+
+            total_alert_users = 0
+
+            # 4) 키워드 → 유저 역색인 + 전체 키워드 오토마톤 (팝업 텍스트는 한 번만 스캔)
+            keyword_users = {}
+            for user in users:
+                for kw in user["keywords"]:
+                    keyword_users.setdefault(kw, []).append(user["user_id"])
+            matcher = KeywordMatcher(keyword_users)
+
+            # 유저별 매칭 결과 (팝업 순서 유지, 같은 팝업은 한 번만)
+            user_popups = {}
+            user_keywords = {}
+            for popup in popups:
+                for kw in matcher.find_all(popup.get("name", ""), popup.get("caption_summary", "")):
+                    for user_id in keyword_users[kw]:
+                        matched = user_popups.setdefault(user_id, [])
+                        if not matched or matched[-1] is not popup:
+                            matched.append(popup)
+                        user_keywords.setdefault(user_id, set()).add(kw)
+
+            # 5) 유저별 처리 (알림 메시지는 모아서 마지막에 묶음 전송)
+            messages = []
+            alert_pairs = []
+            for user in users:
+                user_id = user["user_id"]
+                nickname = user["nickname"]
+                fcm_token = user["fcm_token"]
+                keywords = user["keywords"]
+
+                matched_popups = user_popups.get(user_id, [])
+                matched_keywords = user_keywords.get(user_id, set())
+
+                # ⚡ 매칭되면 알림 처리
+                if matched_popups:
+                    total_alert_users += 1
+
+                    print("\n==============================")
+                    print(f"📨 알림 대상: {nickname} (user_id={user_id})")
+                    print(f"🔑 키워드: {keywords}")
+                    print(f"🎯 매칭된 팝업 수: {len(matched_popups)}")
+                    print("==============================")
+
+                    # DB 기록 대상 (팝업별 user_alert) → 루프가 끝난 뒤 한 번에 INSERT
+                    alert_pairs.extend((user_id, popup.get("popup_id")) for popup in matched_popups)
+
+                    # 알림은 1회만
+                    hashtag = " ".join([f"#{kw}" for kw in matched_keywords])
+                    first_popup = matched_popups[0]
+
+                    notif_title = f"[팝팡] 새로운 팝업 소식!"
+                    notif_body = (
+                        f"{first_popup['name']} "
+                        f"{first_popup.get('region','')}에서 열렸어요!\n\n"
+                        f"{hashtag}"
+                    )
+
+                    if not fcm_token:
+                        print("⚠️  FCM 토큰 없음 → 스킵")
+                        continue
+                    messages.append(messaging.Message(
+                        token=fcm_token,
+                        notification=messaging.Notification(title="최종 테스트입니다" + notif_title, body=notif_body),
+                    ))
+
+                else:
+                    Alert.log.plain(f"🔍 [{nickname}] 매칭된 팝업 없음")
+
+            # 6) user_alert 묶음 INSERT (커밋 1회)
+            insert_user_alerts(conn, alert_pairs)
+
+            # 7) FCM 묶음 전송 (500개 단위, 묶음끼리 동시 전송)
+            if messages:
+                initialize_firebase()
+                sender = FcmSender(max_workers=int(os.getenv("FCM_MAX_WORKERS", "4")))
+                results = sender.send_messages(messages)
+                for result in results:
+                    if not result.success and not result.dead:
+                        Alert.log.warn(f"❌ FCM 전송 실패 ({result.error_code}): {result.error}")
+                # 만료 토큰은 NULL 처리 → 다음 실행부터 전송 대상에서 빠진다
+                # 이미 보낸 뒤이므로 정리 실패가 8) 완료 기록을 막으면 안 된다 (막히면 다음 실행에서 재전송)
+                try:
+                    sender.prune_dead_tokens(conn, results)
+                except Exception as e:
+                    Alert.log.warn(f"⚠️ 만료 FCM 토큰 정리 실패 (다음 전송 때 다시 정리): {e}")
+                for name, value in sender.metrics.items():
+                    metrics.add("alert", f"fcm_{name.replace('.', '_').lower()}", value)
+                Alert.log.plain(f"📊 FCM 지표: {dict(sender.metrics)}")
+
+            # 8) 게시물별 알림 처리 완료 기록
+            for post_id in {popup.get("insta_post_id") for popup in popups}:
+                if post_id:
+                    state.record("alert", post_id, hashes[post_id])
+
+            metrics.add("alert", "users", total_alert_users)
+            metrics.add("alert", "messages", len(messages))
+            Alert.log.plain(f"✅ Alert 종료 — 총 알림 대상 유저: {total_alert_users}")
+
+        except Exception as e:
+            Alert.log.error(f"❌ Alert 실행 오류: {e}")
+
+        finally:
+            conn.close()
+            Alert.log.info("🔌 DB 연결 종료\n\n\n")
+
+
+
+# ==============================================
+# 실행
+# ==============================================
+if __name__ == "__main__":
+    Alert.play(local=False)
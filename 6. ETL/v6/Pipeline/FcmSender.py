@@ -0,0 +1,182 @@
+import time
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from firebase_admin import messaging
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+except ImportError:
+    # 단독 실행(Pipeline/FcmSender.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        from Logger import Logger
+    except ImportError:
+        # 이 파일을 그대로 복사해 쓰는 앱(3. FCM): 로그는 print
+        class Logger:
+            def __init__(self, name: str):
+                self.name = name
+
+            def plain(self, msg: str):
+                print(f"[{self.name}] {msg}")
+
+
+FCM_BATCH_LIMIT = 500   # send_each / send_each_for_multicast 1회 최대 메시지 수
+PRUNE_CHUNK = 500       # fcm_token NULL 처리 UPDATE 1회당 토큰 수
+
+
+# ==============================
+# 📦 DTO 정의
+# ==============================
+@dataclass
+class SendResult:
+    token: str
+    success: bool
+    message_id: Optional[str] = None
+    error_code: Optional[str] = None     # FirebaseError.code (예: NOT_FOUND, INVALID_ARGUMENT)
+    error: Optional[str] = None
+    dead: bool = False                   # 앱 삭제/만료 등으로 다시 보낼 필요 없는 토큰
+
+
+# ==============================
+# 📨 FCM 묶음 전송
+# ==============================
+class FcmSender:
+    """
+    토큰을 500개 단위로 묶어 전송하고, 묶음들은 스레드 풀에서 동시에 보낸다.
+    - send_messages: 유저마다 내용이 다른 메시지 (Alert)
+    - broadcast: 모든 토큰에 같은 알림 (공지사항)
+    Firebase 앱 초기화는 호출하는 쪽에서 먼저 해둔다.
+    """
+
+    def __init__(self, max_workers: int = 4, dry_run: bool = False, app=None):
+        self.max_workers = max(1, max_workers)
+        self.dry_run = dry_run
+        self.app = app
+        self.lock = threading.Lock()
+        self.metrics = Counter()   # success / error.<코드> / dead / pruned (인스턴스 수명 동안 누적)
+        self.log = Logger("FcmSender")
+
+    # ---------- 묶음 1개 ----------
+    @staticmethod
+    def is_dead(exception, chunk_has_success: bool) -> bool:
+        """
+        - UNREGISTERED (UnregisteredError, code=NOT_FOUND): 앱 삭제/토큰 만료 → 항상 제거 대상
+        - INVALID_ARGUMENT: 메시지 자체가 잘못돼도 나오므로, 같은 묶음에 성공한 토큰이 있을 때만
+          (= 메시지는 정상, 토큰만 잘못됨) 제거 대상으로 본다
+        """
+        if isinstance(exception, messaging.UnregisteredError):
+            return True
+        return getattr(exception, "code", None) == "INVALID_ARGUMENT" and chunk_has_success
+
+    def _collect(self, tokens: List[str], batch: "messaging.BatchResponse") -> List[SendResult]:
+        chunk_has_success = any(res.success for res in batch.responses)
+        results = []
+        for token, res in zip(tokens, batch.responses):
+            if res.success:
+                results.append(SendResult(token, True, message_id=res.message_id))
+            else:
+                results.append(SendResult(
+                    token, False,
+                    error_code=getattr(res.exception, "code", None),
+                    error=str(res.exception),
+                    dead=self.is_dead(res.exception, chunk_has_success),
+                ))
+        self._count(results)
+        return results
+
+    def _failed(self, tokens: List[str], e: Exception) -> List[SendResult]:
+        results = [SendResult(token, False, error_code=getattr(e, "code", None), error=str(e)) for token in tokens]
+        self._count(results)
+        return results
+
+    def _count(self, results: List[SendResult]):
+        with self.lock:
+            for result in results:
+                if result.success:
+                    self.metrics["success"] += 1
+                else:
+                    self.metrics[f"error.{result.error_code or 'UNKNOWN'}"] += 1
+                    self.metrics["dead"] += int(result.dead)
+
+    def _send_chunk(self, messages: List["messaging.Message"]) -> List[SendResult]:
+        tokens = [message.token for message in messages]
+        try:
+            batch = messaging.send_each(messages, dry_run=self.dry_run, app=self.app)
+        except Exception as e:
+            # 묶음 전체 실패 (네트워크/인증 등) → 토큰별 실패로 기록 (토큰 제거 대상 아님)
+            return self._failed(tokens, e)
+        return self._collect(tokens, batch)
+
+    def _multicast_chunk(self, tokens: List[str], notification: "messaging.Notification",
+                         data: Optional[Dict[str, str]]) -> List[SendResult]:
+        try:
+            batch = messaging.send_each_for_multicast(
+                messaging.MulticastMessage(tokens=tokens, notification=notification, data=data),
+                dry_run=self.dry_run, app=self.app,
+            )
+        except Exception as e:
+            return self._failed(tokens, e)
+        return self._collect(tokens, batch)
+
+    # ---------- 진입점 ----------
+    def _run(self, jobs, total: int) -> List[SendResult]:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            chunks = list(pool.map(lambda job: job(), jobs))
+        results = [result for chunk in chunks for result in chunk]
+        elapsed = time.perf_counter() - start
+
+        succeeded = sum(1 for r in results if r.success)
+        dead = sum(1 for r in results if r.dead)
+        rate = total / elapsed if elapsed > 0 else 0.0
+        self.log.plain(
+            f"📨 FCM {total}건 전송: 성공 {succeeded}, 실패 {total - succeeded} (만료 토큰 {dead}) "
+            f"({len(jobs)}개 묶음, {elapsed:.1f}s, {rate:.0f}건/초)"
+        )
+        return results
+
+    def send_messages(self, messages: List["messaging.Message"]) -> List[SendResult]:
+        """토큰이 지정된 Message 목록 → 입력 순서대로 토큰별 결과"""
+        jobs = [
+            (lambda chunk=messages[i:i + FCM_BATCH_LIMIT]: self._send_chunk(chunk))
+            for i in range(0, len(messages), FCM_BATCH_LIMIT)
+        ]
+        return self._run(jobs, len(messages)) if jobs else []
+
+    def broadcast(self, tokens: List[str], title: str, body: str,
+                  data: Optional[Dict[str, str]] = None) -> List[SendResult]:
+        """같은 알림을 모든 토큰에 전송 (빈 토큰 / 중복 토큰 제외)"""
+        tokens = [token for token in dict.fromkeys(tokens) if token]
+        notification = messaging.Notification(title=title, body=body)
+        jobs = [
+            (lambda chunk=tokens[i:i + FCM_BATCH_LIMIT]: self._multicast_chunk(chunk, notification, data))
+            for i in range(0, len(tokens), FCM_BATCH_LIMIT)
+        ]
+        return self._run(jobs, len(tokens)) if jobs else []
+
+    # ---------- 만료 토큰 정리 ----------
+    def prune_dead_tokens(self, conn, results: List[SendResult]) -> int:
+        """만료/잘못된 토큰을 users.fcm_token 에서 NULL 처리 (묶음 UPDATE, 커밋 1회) → 변경 행 수"""
+        dead = list(dict.fromkeys(result.token for result in results if result.dead))
+        if not dead:
+            return 0
+        updated = 0
+        with conn.cursor() as cursor:
+            for i in range(0, len(dead), PRUNE_CHUNK):
+                chunk = dead[i:i + PRUNE_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                updated += cursor.execute(
+                    f"UPDATE users SET fcm_token = NULL WHERE fcm_token IN ({placeholders})", chunk
+                )
+        conn.commit()
+        with self.lock:
+            self.metrics["pruned"] += updated
+        self.log.plain(f"🧹 만료 FCM 토큰 {len(dead)}개 정리 → users {updated}행 NULL 처리")
+        return updated
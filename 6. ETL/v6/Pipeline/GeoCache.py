@@ -0,0 +1,102 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterable, Optional, Tuple
+
+
+DEFAULT_PATH = "geo_cache.db"
+POSITIVE_TTL = 60 * 60 * 24 * 90   # 90일: 건물 좌표는 거의 바뀌지 않는다
+NEGATIVE_TTL = 60 * 60 * 24 * 3    # 3일: 검색 실패는 짧게 기억했다가 다시 시도
+
+# (road_address, longitude, latitude) — 실패 캐시는 (None, None, None)
+Place = Tuple[Optional[str], Optional[float], Optional[float]]
+
+
+# ==============================
+# 🗺 지오코딩 결과 캐시
+# ==============================
+class GeoCache:
+    """
+    정규화된 geocoding_query → 도로명주소/좌표를 SQLite에 저장한다.
+    - 검색 결과가 없던 쿼리도 negative_ttl 동안 기억해 같은 실패 호출을 반복하지 않는다
+    - 키 정규화는 GeoCoding.normalize_query 가 담당한다
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = POSITIVE_TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.path = path or os.getenv("GEO_CACHE_DB", DEFAULT_PATH)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS geo_cache (
+                    query TEXT PRIMARY KEY,
+                    road_address TEXT,
+                    longitude REAL,
+                    latitude REAL,
+                    found INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, query: str) -> Optional[Place]:
+        """캐시된 결과 (실패 캐시 포함), 없거나 만료되면 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT road_address, longitude, latitude, found, created_at FROM geo_cache WHERE query=?",
+                (query,),
+            ).fetchone()
+            ttl = self.ttl if row and row[3] else self.negative_ttl
+            if not row or time.time() - row[4] > ttl:
+                self.misses += 1
+                return None
+            if row[3]:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+        return row[0], row[1], row[2]
+
+    def put(self, query: str, place: Place):
+        found = int(place[1] is not None and place[2] is not None)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO geo_cache (query, road_address, longitude, latitude, found, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (query, place[0], place[1], place[2], found, time.time()),
+            )
+
+    def warm_up(self, rows: Iterable[Tuple[str, Place]]) -> int:
+        """
+        (정규화된 쿼리, 좌표) 목록을 캐시에 채운다.
+        이미 찾은 좌표(found=1)는 덮어쓰지 않고, 실패 캐시(found=0)는 DB 의 좌표로 바꾼다
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                """
+                INSERT INTO geo_cache (query, road_address, longitude, latitude, found, created_at)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (query) DO UPDATE SET
+                    road_address = excluded.road_address, longitude = excluded.longitude,
+                    latitude = excluded.latitude, found = 1, created_at = excluded.created_at
+                WHERE geo_cache.found = 0
+                """,
+                [(query, place[0], place[1], place[2], now) for query, place in rows],
+            )
+            return self.conn.total_changes - before
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.negative_hits + self.misses
+        return (self.hits + self.negative_hits) / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
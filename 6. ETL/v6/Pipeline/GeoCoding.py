@@ -0,0 +1,357 @@
+# GeoCoding.py
+import re
+import urllib.parse
+import os
+import json
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from typing import Optional, List
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .StateStore import StateStore, group_by_post
+    from .GeoCache import GeoCache
+    from .RateLimiter import RateLimiter
+    from . import Database
+    from .Metrics import metrics
+    from .HttpClient import get_client
+except ImportError:
+    # 단독 실행(Pipeline/GeoCoding.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from StateStore import StateStore, group_by_post
+    from GeoCache import GeoCache
+    from RateLimiter import RateLimiter
+    import Database
+    from Metrics import metrics
+    from HttpClient import get_client
+
+
+# ==============================
+# 🪄 지역명 / 쿼리 정규화
+# ==============================
+REGION_ALIASES = {
+    # 공식 17개
+    "서울특별시": "서울",
+    "부산광역시": "부산",
+    "대구광역시": "대구",
+    "인천광역시": "인천",
+    "광주광역시": "광주",
+    "대전광역시": "대전",
+    "울산광역시": "울산",
+    "경기도": "경기",
+    "충청북도": "충북",
+    "충청남도": "충남",
+    "전라북도": "전북",
+    "전라남도": "전남",
+    "경상북도": "경북",
+    "경상남도": "경남",
+    "세종특별자치시": "세종",
+    "전북특별자치도": "전북",
+    "제주특별자치도": "제주",
+    "강원특별자치도": "강원",
+}
+
+# Naver 검색 API 한도 (초당 10회) 및 재시도 설정
+NAVER_QPS = 10
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# 층수 / 방향 표현 (geocoding_query 규칙에서 제거 대상)
+FLOOR_PATTERN = re.compile(r"지하\s*\d+\s*층|\d+\s*층|(?<![A-Za-z0-9])(B\d+F?|\d+F)(?![A-Za-z0-9])", re.IGNORECASE)
+DIRECTION_WORDS = {"앞", "근처", "맞은편", "옆", "뒷편", "앞쪽", "뒤편"}
+
+
+def normalize_query(query: str) -> str:
+    """
+    캐시 키용 쿼리 정규화
+    "서울특별시  더현대 서울 B1 앞" → "서울 더현대 서울"
+    """
+    query = FLOOR_PATTERN.sub(" ", query or "")
+    for old, new in REGION_ALIASES.items():
+        query = query.replace(old, new)
+    parts = [part for part in query.split() if part not in DIRECTION_WORDS]
+    if parts and parts[0].endswith("시") and len(parts[0]) > 2:
+        parts[0] = parts[0].removesuffix("시")
+    return " ".join(parts).lower()
+
+
+# ==============================
+# 📦 DTO 정의
+# ==============================
+
+@dataclass
+class PlaceInfoDTO:
+    road_address: Optional[str]
+    longitude: Optional[float]
+    latitude: Optional[float]
+
+
+# ==============================
+# 🧭 GeoCoding 로직
+# ==============================
+
+class GeoCoding:
+    """
+    GPT 결과 JSON에 도로명주소 및 좌표(경도/위도)를 추가하는 클래스.
+    - Naver Local Search API를 사용 (장소명 기반)
+    - 결과를 popup_with_geo.json으로 저장
+    """
+
+    def __init__(self, cache: Optional[GeoCache] = None, max_workers: int = 8, qps: float = NAVER_QPS, retries: int = 3):
+        load_dotenv()
+        self.cache = cache
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.limiter = RateLimiter(qps, per=1.0)
+        # keep-alive 커넥션 풀 / 재시도 / 서킷 브레이커는 공용 클라이언트가 담당
+        self.http = get_client()
+        self.client_id = os.getenv("CLIENT_ID")
+        self.client_secret = os.getenv("CLIENT_SECRET")
+        if not self.client_id or not self.client_secret:
+            raise ValueError("❌ CLIENT_ID / CLIENT_SECRET 환경 변수가 누락되었습니다.")
+        self.log = Logger("GeoCodingAPI", stage="geocoding")
+
+    # -----------------------------------
+    # 📍 1. 장소 검색 (Naver Local API)
+    # -----------------------------------
+    def get_place_info(self, query: str) -> PlaceInfoDTO:
+        """장소명으로 검색 후 주소와 좌표 반환 (캐시 우선)"""
+        key = normalize_query(query)
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.add("geocoding", "cache_hits")
+                return PlaceInfoDTO(*cached)
+            metrics.add("geocoding", "cache_misses")
+
+        try:
+            place = self.search_place(query)
+        except Exception as e:
+            # 네트워크/응답 오류는 캐시하지 않음 → 다음 실행에서 재시도
+            self.log.warn(f"⚠️ Geocoding 실패 ({query}): {e}")
+            return PlaceInfoDTO(road_address=None, longitude=None, latitude=None)
+
+        if self.cache:
+            self.cache.put(key, (place.road_address, place.longitude, place.latitude))
+        return place
+
+    def search_place(self, query: str) -> PlaceInfoDTO:
+        """Naver Local API 호출 (검색 결과가 없으면 좌표 None, 요청 오류는 예외)"""
+        encoded_query = urllib.parse.quote(query)
+        url = f"https://openapi.naver.com/v1/search/local.json?query={encoded_query}&display=1"
+        headers = {
+            "X-Naver-Client-Id": self.client_id,
+            "X-Naver-Client-Secret": self.client_secret
+        }
+
+        response = self.http.get(
+            url, headers=headers, timeout=10, retries=self.retries, retry_status=RETRYABLE_STATUS,
+            throttle=self.limiter.acquire, stage="geocoding",
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        if 'items' in data and data['items']:
+            item = data['items'][0]
+            road_address = item.get('roadAddress') or item.get('address')
+
+            # 좌표값이 비어있는 경우도 대비
+            try:
+                longitude = float(item['mapx']) / 10_000_000 if item.get('mapx') else None
+                latitude = float(item['mapy']) / 10_000_000 if item.get('mapy') else None
+            except Exception:
+                longitude, latitude = None, None
+
+            road_address = self.normalize_address(road_address)
+
+            return PlaceInfoDTO(
+                road_address=road_address,
+                longitude=longitude,
+                latitude=latitude
+            )
+
+        return PlaceInfoDTO(
+            road_address=None,
+            longitude=None,
+            latitude=None
+        )
+
+    # -----------------------------------
+    # 🪄 주소 변환 로직
+    # -----------------------------------
+    def normalize_address(self, address: Optional[str]) -> Optional[str]:
+        if not address:
+            return address
+
+        original = address
+        for old, new in REGION_ALIASES.items():
+            if old in address:
+                address = address.replace(old, new)
+
+        parts = address.split(" ", 1)
+        if parts and parts[0].endswith("시"):
+            parts[0] = parts[0].removesuffix("시")
+        address = " ".join(parts)
+
+        if address == original:
+            self.log.warn(f"⚠️ 치환 대상 아님: {original}")
+
+        return address
+
+    # -----------------------------------
+    # 🗺 2. popup_refined.json → 좌표추가
+    # -----------------------------------
+    def add_geocoding_to_json(
+        self,
+        input_file: str = "gpt.json",
+        output_file: str = "geo.json",
+        state: Optional[StateStore] = None
+    ):
+        """입력 JSON에 road_address / longitude / latitude 추가 후 저장"""
+        if not os.path.exists(input_file):
+            self.log.error(f"❌ 입력 파일 없음: {input_file}")
+            return
+
+        with open(input_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.file_save(self.enrich(data, state), output_file)
+
+    @metrics.timed("geocoding")
+    def enrich(self, data: List[dict], state: Optional[StateStore] = None) -> List[dict]:
+        """
+        이벤트 목록에 road_address / longitude / latitude 추가 (파일 입출력 없음 → Runner 에서 배치 단위로 호출)
+        geocoding_query 필드를 우선 사용하고, 없으면 address 사용
+        위경도 값이 없을 경우 필터링
+        state가 주어지면 모든 이벤트의 좌표를 얻었던 게시물은 저장된 결과를 재사용
+        """
+        enriched = []
+        skipped = 0
+        reused = 0
+
+        # 1️⃣ 재사용할 게시물 / 새로 조회할 쿼리 분리
+        posts = group_by_post(data)
+        saved_posts = {}
+        queries = {}
+        for post_id, events in posts.items():
+            if state:
+                saved = state.lookup("geocoding", post_id, StateStore.content_hash(events[0].get("caption")))
+                if saved is not None:
+                    saved_posts[post_id] = saved
+                    continue
+            for event in events:
+                query = event.get("geocoding_query") or event.get("address")
+                if query:
+                    queries.setdefault(normalize_query(query), query)
+
+        # 2️⃣ 정규화 키 기준 중복 제거 후 동시 조회 (순서는 아래에서 입력 순서대로 재조립)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            places = dict(zip(queries, pool.map(self.get_place_info, queries.values())))
+
+        for post_id, events in posts.items():
+            content_hash = StateStore.content_hash(events[0].get("caption"))
+            if post_id in saved_posts:
+                enriched.extend(saved_posts[post_id])
+                reused += len(saved_posts[post_id])
+                metrics.add("geocoding", "reused", post_id=post_id)
+                continue
+
+            post_enriched = []
+            for event in events:
+                query = event.get("geocoding_query") or event.get("address")
+                if not query:
+                    self.log.warn(f"⚠️ 지오코딩 대상 없음: {event.get('name')}", every=Logger.item_every, post_id=post_id)
+                    skipped += 1
+                    continue
+
+                place_info = places[normalize_query(query)]
+
+                # 📌 위경도 값 없는 경우 제외
+                if place_info.longitude is None or place_info.latitude is None:
+                    self.log.warn(f"🚫 위경도 없음 → 스킵: {event.get('name')} ({query})", every=Logger.item_every, post_id=post_id)
+                    skipped += 1
+                    continue
+
+                # ✅ 정상 데이터만 추가
+                new_event = {**event}
+                new_event["road_address"] = place_info.road_address
+                new_event["longitude"] = place_info.longitude
+                new_event["latitude"] = place_info.latitude
+
+                post_enriched.append(new_event)
+
+            enriched.extend(post_enriched)
+            metrics.add("geocoding", "items", len(post_enriched), post_id=post_id)
+            metrics.add("geocoding", "skipped", len(events) - len(post_enriched), post_id=post_id)
+            # 실패한 이벤트가 없을 때만 완료 기록 (일시적 실패는 다음 실행에서 재시도)
+            if state and post_id and len(post_enriched) == len(events):
+                state.record("geocoding", post_id, content_hash, post_enriched)
+
+        if reused:
+            self.log.plain(f"♻️ 이전 실행 결과 재사용: {reused}건")
+        if self.cache:
+            self.log.plain(
+                f"🗺 지오코딩 캐시: 적중 {self.cache.hits}건, 실패 캐시 {self.cache.negative_hits}건, "
+                f"API 호출 {self.cache.misses}건 ({self.cache.hit_rate:.0%})"
+            )
+
+        # self.log.info(f"Geocoding 완료: {output_file} (총 {len(enriched)}건, 스킵 {skipped}건)")
+        return enriched
+
+    # -----------------------------------
+    # 💾 JSON 저장 함수 
+    # -----------------------------------
+    def file_save(self, data: List[dict], filename: str = "geo.json"):
+        """지오코딩 결과를 파일로 저장"""
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        abs_path = os.path.abspath(filename)
+        self.log.info(f"📁 저장 완료: {abs_path}")
+        return abs_path
+
+    # -----------------------------------
+    # 🔥 캐시 예열 (MySQL popup 테이블 기준, 네트워크 호출 없음)
+    # -----------------------------------
+    def warm_up_cache(self, local: bool = False) -> int:
+        """이미 좌표가 있는 popup 행으로 캐시를 채운다"""
+        if not self.cache:
+            return 0
+        conn = Database.get_connection("127.0.0.1" if local else os.getenv("DB_HOST"))
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT geocoding_query, road_address, longitude, latitude
+                    FROM popup
+                    WHERE geocoding_query IS NOT NULL
+                      AND longitude IS NOT NULL
+                      AND latitude IS NOT NULL
+                """)
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        added = self.cache.warm_up(
+            (normalize_query(row["geocoding_query"]),
+             (row["road_address"], float(row["longitude"]), float(row["latitude"])))
+            for row in rows
+        )
+        self.log.info(f"🔥 지오코딩 캐시 예열: popup {len(rows)}행 → 신규 {added}건")
+        return added
+
+    # -----------------------------------
+    # 🚀 3. 실행 메서드
+    # -----------------------------------
+    @staticmethod
+    def play(state: Optional[StateStore] = None, warm_up: bool = False, local: bool = False):
+        geo = GeoCoding(cache=GeoCache(), max_workers=int(os.getenv("GEO_MAX_WORKERS", 8)))
+        if warm_up:
+            geo.warm_up_cache(local)
+        geo.add_geocoding_to_json(state=state or StateStore())
+
+if __name__ == "__main__":
+    GeoCoding.play()
\ No newline at end of file
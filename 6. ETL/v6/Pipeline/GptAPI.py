@@ -2,23 +2,44 @@ import os
 import re
 import json
 import time
+import hashlib
+import threading
 import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime
-from urllib.parse import urlparse
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 # -------------------------------------------------
 # Logger import: main 실행 + 단독 실행 모두 지원
 # -------------------------------------------------
 try:
     # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
     from .Logger import Logger
+    from .StateStore import StateStore, group_by_post
+    from .RateLimiter import RateLimiter
+    from .GptCache import GptCache
+    from .ImageStore import ImageStore
+    from .Metrics import metrics
+    from .HttpClient import get_client
 except ImportError:
     # 단독 실행(Pipeline/InstagramAPI.py) 시: sys.path로 상위 폴더 추가
     import sys, os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from Logger import Logger
+    from StateStore import StateStore, group_by_post
+    from RateLimiter import RateLimiter
+    from GptCache import GptCache
+    from ImageStore import ImageStore
+    from Metrics import metrics
+    from HttpClient import get_client
+
+# 로컬 토크나이저 (없으면 바이트 수 기반 추정으로 대체)
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 
 # ==============================
@@ -48,6 +69,189 @@ CATEGORY_MAP = {
     "키즈": 20
 }
 
+# ==============================
+# 🧾 프롬프트 (정적 지시문 = 시스템 프롬프트)
+# ==============================
+# 필수 필드 (하나라도 비면 이벤트 제외)
+REQUIRED_FIELDS = ["name", "start_date", "end_date", "address", "region", "caption_summary", "recommend"]
+
+# 지시문은 요청마다 바이트 단위로 동일해야 OpenAI 프롬프트 캐싱(1024 토큰 이상 동일 prefix)이 적용된다
+# → 실행 시점에 따라 바뀌는 값(날짜 등)은 넣지 않는다
+# → 지시문만으로 1024 토큰을 넘도록 예시를 prefix 에 둔다 (GptAPI 생성 시 토큰 수를 확인해서 경고)
+CACHE_MIN_PREFIX_TOKENS = 1024
+SYSTEM_PROMPT = f"""너는 인스타그램 게시글에서 팝업 이벤트 정보를 구조화해서 추출하는 전문가야.
+사용자가 여러 개의 '섹션' 텍스트를 준다. 각 섹션에는 하나 이상의 팝업 이벤트가 있을 수 있다.
+각 팝업 이벤트마다 객체 1개를 만들어 events 배열에 담아라.
+
+[필드 규칙]
+- section: 이벤트가 추출된 섹션 번호(정수)
+- name: 팝업 이름 또는 행사명
+- start_date / end_date: YYYY-MM-DD
+- open_time / close_time: HH:MM, 명시 없으면 ""
+- address: 도로명 주소 또는 건물명
+- region: 지역명 (예: 서울, 부산, 도쿄)
+- geocoding_query: 지오코딩 검색용 짧은 명사구
+  1) region을 맨 앞에, 이어서 address/name의 건물명·공간명만 (예: "성남 현대백화점 판교")
+  2) 층수(B1, 2F, 지하 1층), 방향(앞, 근처, 맞은편, 옆), 조사(~에서) 제거
+  3) 도로명주소의 번지·번길 숫자는 유지 (예: "대전 중구 선화로 97번길 59-1", "서울 강남구 테헤란로 152")
+     "대전 중구 선화로"처럼 주소 숫자를 지우는 것은 금지
+  4) 브랜드명·팝업명·아티스트명·제품명 제거
+     - "서울 신촌유플렉스 후르츠바스켓" → "서울 신촌유플렉스"
+     - "서울 현대백화점 압구정본점 김재중" → "서울 현대백화점 압구정본점"
+     - "부산 신세계백화점 스타필드 팝업스토어" → "부산 신세계백화점 스타필드"
+  5) address가 없으면 name에서 지명·건물명만 가져온다 (브랜드명 제외)
+  6) 지역명만 쓰는 것은 금지 (예: "성남" ❌ → "성남 현대백화점 판교" ✅)
+- caption_summary: 팝업의 분위기, 전시·체험 내용, 운영 특징을 2~3문장으로. 문장 사이는 \\n.
+  이름·위치·일정·운영시간은 다른 필드에 있으므로 반복하지 말 것. 과장·홍보성 어투 금지.
+- recommend: 아래 카테고리 중 관련 있는 것 1~3개
+  [{", ".join(CATEGORY_MAP.keys())}]
+  - 핵심 키워드 기준 (예: 커피·음료→카페, 신발·의류·가방→패션, 화장품·향수→뷰티, 케이크·쿠키→디저트,
+    맥주·위스키→주류, 상영·영화관→영화, 애니·만화→애니메이션, 가수·아이돌·팬미팅→연예인,
+    전시회·아트·체험→문화/예술, 강아지·고양이→반려동물, 리빙·가구→생활용품, 러닝·운동→스포츠,
+    스마트폰·전자기기→IT, 은행·카드→금융, 에코·제로웨이스트→친환경, 어린이·유아→키즈)
+  - 여행·관광·숙소·항공→여행, 게임·콘솔·PC방→게임, 책·북카페·서점→책, 웹툰·작가전→웹툰
+  - 두 가지 이상 관련되면 복수 선택 (예: "디저트 카페" → ["디저트", "카페"])
+  - 브랜드명·제품군·테마로 적극 판단하고, 정말 없을 때만 "기타"
+
+[포함 기준]
+- {", ".join(REQUIRED_FIELDS)} 중 하나라도 알 수 없으면 그 이벤트는 제외
+- 주소/날짜가 불명확한 이벤트는 제외
+
+[날짜 규칙]
+- '10/7~10/23'처럼 월/일만 있으면 2025년으로 보완, 과거 연도가 명시되면 그대로 사용
+- '10:00~20:00'은 open_time / close_time으로 분리
+- '10.7(월)~10.13(일)', '10월 7일부터 13일까지'도 같은 방식으로 YYYY-MM-DD로 변환
+- '상시 운영', '종료 시 공지'처럼 종료일을 알 수 없으면 그 이벤트는 제외
+
+[예시]
+입력:
+[section 3]
+🥐 Jam in Bread 팝업스토어 오픈
+📍 신세계백화점 강남점 B1 이벤트홀
+📅 10.7(월) ~ 10.13(일) / 🕥 10:30 ~ 20:00
+따뜻한 빵 냄새와 함께 수제잼 20종을 시식할 수 있어요. 잼 만들기 클래스는 현장 예약제로 운영합니다.
+#팝업스토어 #디저트 #강남팝업
+
+출력:
+{{"events": [{{"section": 3, "name": "Jam in Bread 팝업스토어", "start_date": "2025-10-07", "end_date": "2025-10-13",
+"open_time": "10:30", "close_time": "20:00", "address": "신세계백화점 강남점", "region": "서울",
+"geocoding_query": "서울 신세계백화점 강남점",
+"caption_summary": "수제잼 20종을 빵과 함께 시식할 수 있는 팝업입니다.\\n잼 만들기 클래스가 현장 예약제로 열립니다.",
+"recommend": ["디저트"]}}]}}
+"""
+
+# 출력 토큰을 줄이기 위한 strict JSON 스키마 (설명/코드블록 없이 객체 1개만 반환)
+EVENT_FIELDS = [
+    "section", "name", "start_date", "end_date", "open_time", "close_time",
+    "address", "region", "geocoding_query", "caption_summary", "recommend",
+]
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "popup_events",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "events": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            **{field: {"type": "string"} for field in EVENT_FIELDS},
+                            "section": {"type": "integer"},
+                            "recommend": {
+                                "type": "array",
+                                "items": {"type": "string", "enum": list(CATEGORY_MAP.keys())},
+                            },
+                        },
+                        "required": EVENT_FIELDS,
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["events"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# 파싱/정규화 로직처럼 템플릿 밖의 동작이 바뀌면 올려서 캐시를 무효화한다
+PROMPT_VERSION = "2"
+
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def format_date(value: str) -> str:
+    """2025-10-07 → 10.7(화)"""
+    try:
+        d = datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return value or ""
+    return f"{d.month}.{d.day}({WEEKDAYS[d.weekday()]})"
+
+
+def compose_caption_summary(obj: dict) -> str:
+    """
+    GPT가 만든 본문 앞에 이름/위치/일정/운영시간 머리말을 로컬에서 붙인다.
+    (예전에는 GPT가 머리말까지 생성해 출력 토큰을 낭비했다)
+    """
+    body = (obj.get("caption_summary") or "").strip()
+    if not body:
+        return ""
+    header = [f"✨ {obj.get('name', '').strip()}"]
+    if obj.get("address"):
+        header.append(f"📍 {obj['address'].strip()}")
+    if obj.get("start_date"):
+        header.append(f"📅 {format_date(obj['start_date'])} ~ {format_date(obj.get('end_date', ''))}")
+    if obj.get("open_time") and obj.get("close_time"):
+        header.append(f"🕥 {obj['open_time']} ~ {obj['close_time']}")
+    return "\n".join(header) + "\n\n" + body
+
+
+# ==============================
+# 🚦 동시 호출 / 재시도 설정
+# ==============================
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}   # 백오프는 HttpClient 공통 설정
+
+
+# ==============================
+# 📏 토큰 예산
+# ==============================
+PROMPT_TOKEN_BUDGET = 12_000       # 요청 1건의 프롬프트(지시문 + 섹션) 목표치
+COMPLETION_TOKEN_BUDGET = 6_000    # 요청 1건의 예상 출력 목표치 (= max_tokens)
+MAX_COMPLETION_TOKENS = 16_384     # gpt-4o-mini 출력 상한
+COMPLETION_PER_CAPTION = 180       # 캡션 1개당 기본 예상 출력 토큰
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 쓰는 대략적인 토큰 수 (한글 1자 ≈ 1토큰, 영문 4바이트 ≈ 1토큰)"""
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """모델의 tiktoken 인코딩 (없으면 None) — 실패도 캐시해서 매 호출마다 다운로드를 다시 시도하지 않는다"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # 인코딩 파일은 처음 쓸 때 내려받는다 → 네트워크가 막힌 서버에서는 추정치로 대신한다
+        Logger("GptAPI").warn(f"⚠️ tiktoken 인코딩 로드 실패 ({model}) → 토큰 수를 추정치로 계산: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+
 def convert_recommend_to_ids(recommend_list: List[str]) -> List[int]:
     ids = [CATEGORY_MAP[name] for name in recommend_list if name in CATEGORY_MAP]
     if not ids:
@@ -107,17 +311,61 @@ class PopupEventDTO:
 # 🧠 GPT 파이프라인
 # ==============================
 class GptAPI:
-    REQUIRED_FIELDS = ["name", "start_date", "end_date", "address", "region", "caption_summary", "recommend"]  # ✅ 추가
-    def __init__(self, access_token, model="gpt-4o-mini"):
+    REQUIRED_FIELDS = REQUIRED_FIELDS
+    def __init__(self, access_token, model="gpt-4o-mini", max_in_flight=4, rpm=500, tpm=200_000,
+                 prompt_budget=PROMPT_TOKEN_BUDGET, completion_budget=COMPLETION_TOKEN_BUDGET):
+        """
+        Args:
+            max_in_flight (int): 동시에 보낼 수 있는 최대 GPT 요청 수 (1이면 순차 처리)
+            rpm (int): 분당 요청 수 한도
+            tpm (int): 분당 토큰 수 한도 (프롬프트 + max_tokens 기준)
+            prompt_budget (int): 배치 1건의 프롬프트 토큰 목표치
+            completion_budget (int): 배치 1건의 예상 출력 토큰 목표치
+        """
+        self.prompt_budget = prompt_budget
+        self.completion_budget = completion_budget
         self.access_token = access_token
         self.model = model
         self.endpoint = "https://api.openai.com/v1/chat/completions"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.max_in_flight = max(1, max_in_flight)
+        # keep-alive 커넥션 풀 / 재시도 / 서킷 브레이커는 공용 클라이언트가 담당 (인증 헤더는 요청마다 전달)
+        self.http = get_client()
+        self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
-        })
-        self.log = Logger("GptAPI") 
+        }
+        self.request_limiter = RateLimiter(rpm, per=60)
+        self.token_limiter = RateLimiter(tpm, per=60)
+        self._image_store: Optional[ImageStore] = None
+        self.usage_lock = threading.Lock()
+        self.reset_usage()
+        self.log = Logger("GptAPI", stage="gpt")
+        # 추정치(estimate_tokens)로는 판단하지 않는다 — 인코딩을 못 받으면 확인 생략
+        prefix_tokens = count_tokens(SYSTEM_PROMPT, self.model) if _encoding(self.model) is not None else None
+        if prefix_tokens is not None and prefix_tokens < CACHE_MIN_PREFIX_TOKENS:
+            self.log.warn(
+                f"⚠️ 시스템 프롬프트 {prefix_tokens}토큰 < {CACHE_MIN_PREFIX_TOKENS} → 프롬프트 캐싱이 적용되지 않음"
+            )
+
+    @property
+    def prompt_version(self) -> str:
+        """PROMPT_VERSION + 출력 스키마 지문 → 스키마가 바뀌면 캐시 키도 자동으로 바뀐다"""
+        template = json.dumps(RESPONSE_FORMAT, ensure_ascii=False, sort_keys=True)
+        return f"{PROMPT_VERSION}:{hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]}"
+
+    def reset_usage(self):
+        with self.usage_lock:
+            self.usage = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    def _add_usage(self, usage: dict):
+        with self.usage_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self.usage["completion_tokens"] += usage.get("completion_tokens", 0)
+            self.usage["cached_tokens"] += (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        metrics.add("gpt", "prompt_tokens", usage.get("prompt_tokens", 0))
+        metrics.add("gpt", "completion_tokens", usage.get("completion_tokens", 0))
+        metrics.add("gpt", "cached_tokens", (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0))
 
     # ---------- 문자열 정제 ----------
     @staticmethod
@@ -155,198 +403,72 @@ class GptAPI:
         self.log.info(f"📁 저장 완료: {os.path.abspath(path)}")
         return os.path.abspath(path)
 
-    # ---------- GPT 프롬프트 (원문 유지) ----------
+    # ---------- GPT 프롬프트 (섹션만 전송, 지시문은 SYSTEM_PROMPT) ----------
     def build_prompt(self, sections):
         lines = []
         for idx, cap in sections:
             lines.append(f"[section {idx}]\n{cap}")
-        body = "\n\n---\n\n".join(lines)
-
-        # ✅ 여기서 required_fields 문자열화
-        required_list_str = ", ".join(self.REQUIRED_FIELDS)
-        categories_str = ", ".join(CATEGORY_MAP.keys())
-
-        return f"""
-        아래에는 여러 개의 '섹션' 텍스트가 주어집니다.
-        각 섹션에는 하나 이상의 팝업 이벤트 정보가 포함될 수 있습니다.
-
-        각 팝업 이벤트에 대해 다음 **소문자 키**만 포함된 객체를 생성하고,
-        모든 객체를 **JSON 배열**로 반환하세요.
-
-        ─────────────────────────────
-        📌 필드별 작성 규칙
-        ─────────────────────────────
-
-        - name: 팝업 이름 또는 행사명
-
-        - start_date: 시작 날짜 (YYYY-MM-DD 형식)
-
-        - end_date: 종료 날짜 (YYYY-MM-DD 형식)
-
-        - open_time: 운영 시작 시간 (HH:MM)
-
-        - close_time: 운영 종료 시간 (HH:MM)
-
-        - address: 도로명 주소 또는 건물명
-            - ⚠️ address가 추출되지 않는 경우, 이 이벤트는 JSON에 포함하지 마세요.
-
-        - region: 지역명 (예: 서울, 부산, 도쿄)
-            - ⚠️ region이 누락되면 이 이벤트는 JSON에 포함하지 마세요.
-
-        - geocoding_query: address와 region, name을 기반으로 지오코딩 API 검색에 최적화된 문자열
-            1) 지역(region)을 반드시 가장 앞에 붙이세요. (예: '부산', '서울', '성남')
-            2) address 또는 name에서 건물명, 공간명 등의 핵심 지명 요소만 붙이세요.
-            - 예: "성남 현대백화점 판교" ✅
-            - 예: "성남 현대백화점 판교 도씨" ❌ (브랜드명 제거)
-            3) 층수, 방향, 조사 등 불필요한 단어는 제거하세요:
-            - 'B1', '1층', '2F', 'B2F', '지하 1층'
-            - '앞', '근처', '맞은편', '옆', '뒷편', '앞쪽', '뒤편'
-            - '~에서', '~앞', '~근처', '~맞은편'
-            3-1) 단, **도로명주소와 관련된 숫자나 구조는 반드시 유지**해야 합니다.
-            - 예: "대전 중구 선화로 97번길 59-1" ✅
-            - 예: "서울 강남구 테헤란로 152" ✅
-            - ❌ 제거 대상이 아닌 숫자: '로', '길', '번길' 뒤의 숫자, 혹은 '-'로 이어진 번지번호 등은 모두 유지
-            - ❌ 잘못된 예시: "대전 중구 선화로" (주소의 숫자 제거 금지)
-            4) 브랜드명, 팝업 이름, 아티스트 이름, 제품 이름 등은 반드시 제거하세요.
-            - 예: "서울 신촌유플렉스 후르츠바스켓" → "서울 신촌유플렉스"
-            - 예: "서울 현대백화점 압구정본점 김재중" → "서울 현대백화점 압구정본점"
-            - 예: "부산 신세계백화점 스타필드 팝업스토어" → "부산 신세계백화점 스타필드"
-            5) 팝업명과 address가 동일하더라도 브랜드명은 제거해야 합니다.
-            6) 브랜드명이 제거된 후에도 최소한 지역 + 건물명/지명은 반드시 포함되어야 합니다.
-            7) address가 없는 경우 name에서 지명/건물명만 추출하세요. 브랜드명은 포함하지 마세요.
-            8) 단순히 지역명만 쓰는 것은 금지입니다. (예: "성남" ❌)
-            반드시 "성남 현대백화점 판교"처럼 구체적인 지명까지 포함하세요.
-            9) 문장형이 아니라 짧고 검색 최적화된 명사구로 작성하세요.
-
-        - section: 이 이벤트가 추출된 섹션 번호(정수)
-
-        - caption_summary: "caption_summary는 단순 요약이 아니라, 인스타 원문을 기반으로 한 완성된 게시글형 문단입니다. \
-            ✨ 구성 규칙:\n
-            - 전체는 약 6~10줄로 구성하세요.
-            - 상단에는 팝업 이름, 위치, 일정, 운영시간을 간결히 표시하세요.
-            - 하단에는 팝업의 분위기, 전시·체험 내용, 운영 특징 등을 자연스럽게 3줄 이상으로 설명하세요.
-            - 문장은 짧고 자연스럽게, 말하듯이 표현하세요.
-            - 감성적인 표현은 허용하지만, 과장되거나 홍보성 어투는 피하세요.
-            - 문장 사이에는 줄바꿈(\\n)을 포함하세요.
-            예시:\\n
-            🥐 Jam in Bread 팝업스토어 오픈\\n
-            📍 신세계백화점 강남점 B1\\n
-            📅 10.7(월) ~ 10.13(일)\\n
-            🕥 10:30AM ~ 8:00PM\\n
-            \\n
-            따뜻한 향이 퍼지는 공간에서 잼과 빵을 함께 즐길 수 있습니다.\\n
-            다양한 수제잼과 베이커리 굿즈가 전시되어 있고, 일부 상품은 현장 구매도 가능합니다.\\n
-            하루의 시작을 부드럽게 채워주는 작은 휴식 같은 팝업입니다.\\n"
-
-        - recommend : 아래 목록 중에서 관련된 팝업 카테고리를 **1개 이상, 최대 3개까지** 선택하여 배열로 반환하세요.
-            - [{categories_str}]
-            📌 **선택 기준**:
-                1) 캡션 또는 팝업 이름에서 핵심 키워드를 추출하여 가장 연관성이 높은 카테고리를 우선 선택하세요.
-                - 예: "스타벅스", "카페", "커피", "음료" → "카페"
-                - 예: "한정판 스니커즈", "신발", "옷", "패션쇼" → "패션"
-                - 예: "맥주", "위스키", "칵테일" → "주류"
-                - 예: "팝콘", "상영", "영화관" → "영화"
-                - 예: "애니", "만화", "코스프레" → "애니메이션"
-                - 예: "웹툰", "네이버웹툰", "작가전" → "웹툰"
-                - 예: "팬사인회", "가수", "아이돌", "팬미팅" → "연예인"
-                - 예: "여행", "관광", "숙소", "항공", "해외" → "여행"
-                - 예: "강아지", "고양이", "반려동물" → "반려동물"
-                - 예: "게임", "콘솔", "PC방", "플레이" → "게임"
-                - 예: "책", "북카페", "서점" → "책"
-                - 예: "금융", "은행", "카드", "투자" → "금융"
-                - 예: "에코", "환경", "제로웨이스트" → "친환경"
-                - 예: "키즈", "어린이", "유아" → "키즈"
-                - 예: "의류", "가방", "악세서리" → "패션"
-                - 예: "화장품", "향수", "메이크업" → "뷰티"
-                - 예: "케이크", "쿠키", "초콜릿" → "디저트"
-                - 예: "커피", "음료", "티룸" → "카페"
-                - 예: "테크", "스마트폰", "전자기기" → "IT"
-                - 예: "리빙", "인테리어", "가구" → "생활용품"
-                - 예: "운동", "러닝", "스포츠브랜드" → "스포츠"
-                - 예: "전시회", "아트", "페어", "체험" → "문화/예술"
-
-                2) 키워드가 두 가지 이상 관련될 경우 복수 선택 가능 (최대 3개).
-                - 예: “디저트 카페” → ["디저트", "카페"]
-
-                3) 관련 카테고리를 찾을 수 없을 경우에만 "기타"를 선택하세요.
-                - 단순히 아무 키워드를 찾지 못했다고 해서 무조건 "기타"를 넣지 마세요.
-                - 브랜드명, 제품군, 팝업 테마를 근거로 적극적으로 판단하세요.
-
-            📌 **반환 형식 예시**:
-                - recommend: ["패션"]
-                - recommend: ["카페", "디저트"]
-                - recommend: ["친환경", "패션", "카페"]
-                - recommend: ["기타"]
-
-
-        ─────────────────────────────
-        ❗ 포함 기준
-        ─────────────────────────────
-        - 반드시 다음 필드들이 모두 존재해야 합니다:
-        {required_list_str}
-        - 위 필드 중 하나라도 누락된 이벤트는 JSON에 포함하지 마세요.
-        → 불명확하거나 주소/날짜가 없는 이벤트는 제외하세요.
-
-        ─────────────────────────────
-        📅 날짜 규칙
-        ─────────────────────────────
-        - '10/7~10/23'처럼 월/일만 있으면 2025년으로 보완하세요.
-        - 과거년도(2023, 2024 등)가 명시되어 있으면 그대로 사용하세요.
-        - 모호한 날짜는 제외하세요.
-
-        ─────────────────────────────
-        🕒 시간 규칙
-        ─────────────────────────────
-        - '10:00~20:00' 형태는 open_time / close_time으로 나누세요.
-        - 명시 없으면 빈 문자열로 둡니다.
-
-        ─────────────────────────────
-        🖼 이미지 규칙
-        ─────────────────────────────
-        - 이미지가 여러 장이면 배열 형태로 반환하세요.
-        - 단일 이미지도 배열로 감싸서 반환하세요.
-
-        ─────────────────────────────
-        ⚠️ 출력 형식
-        ─────────────────────────────
-        - 반드시 JSON 배열([])만. 설명/주석/코드블록 금지.
-
-        {body}
-        """
-
+        return "\n\n---\n\n".join(lines)
 
     # ---------- GPT 호출 ----------
-    def call_gpt(self, prompt, max_tokens=1500, retries=2):
+    def call_gpt(self, prompt, max_tokens=1500, retries=4):
+        return self.complete(prompt, max_tokens=max_tokens, retries=retries)[0]
+
+    def complete(self, prompt, max_tokens=1500, retries=4) -> Tuple[str, str]:
+        """(응답 본문, finish_reason) 반환 — finish_reason이 'length'면 max_tokens에서 잘린 응답"""
         payload = {
             "model": self.model,
             "temperature": 0,
             "messages": [
-                {"role": "system", "content": "너는 텍스트에서 구조화된 정보를 추출하는 전문가야."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt},
             ],
-            "max_tokens": max_tokens
+            "max_tokens": max_tokens,
+            "response_format": RESPONSE_FORMAT,
         }
-        for attempt in range(retries + 1):
-            try:
-                resp = self.session.post(self.endpoint, json=payload, timeout=60)
-                if resp.status_code == 200:
-                    return resp.json()["choices"][0]["message"]["content"]
-                else:
-                    print(f"⚠️ 응답 오류: {resp.status_code}")
-                time.sleep(1)
-            except requests.RequestException as e:
-                print(f"⚠️ 요청 실패: {e}")
-                time.sleep(1)
-        raise RuntimeError("❌ GPT 응답 실패")
+        prompt_tokens = count_tokens(SYSTEM_PROMPT + prompt, self.model)
+
+        def throttle():
+            # 재시도마다 요청 / 토큰 예산을 다시 차감
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(prompt_tokens + max_tokens)
+
+        try:
+            resp = self.http.post(
+                self.endpoint, json=payload, headers=self.headers, timeout=60, retries=retries,
+                retry_status=RETRYABLE_STATUS, idempotent=True, throttle=throttle, stage="gpt",
+            )
+        except requests.RequestException as e:
+            raise RuntimeError(f"❌ GPT 응답 실패: {e}") from e
+        if resp.status_code != 200:
+            raise RuntimeError(f"❌ GPT 응답 오류: {resp.status_code} {resp.text[:200]}")
+        body = resp.json()
+        self._add_usage(body.get("usage") or {})
+        choice = body["choices"][0]
+        return choice["message"]["content"], choice.get("finish_reason", "stop")
 
     # ---------- GPT 결과 파싱 ----------
-    def extract_json_array(self, text) -> List[GptParsedEventDTO]:
+    def extract_json_array(self, text, strict=False) -> List[GptParsedEventDTO]:
+        """
+        {"events": [...]} (json_schema 응답) 또는 JSON 배열을 파싱한다.
+        strict=True 이면 파싱 실패를 빈 결과와 구분할 수 있도록 ValueError를 던진다
+        """
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict) and isinstance(data.get("events"), list):
+                return self._normalize_schema(data["events"])
+        except json.JSONDecodeError:
+            pass
+        if strict and "[" not in text:
+            raise ValueError("GPT 응답에 JSON 배열이 없음")
         code_match = re.search(r"```(?:json)?\s*(\[[\s\S]*?\])\s*```", text)
         candidate = code_match.group(1) if code_match else self._greedy_bracket_slice(text)
         try:
             data = json.loads(candidate)
             return self._normalize_schema(data)
         except json.JSONDecodeError:
+            if strict:
+                raise ValueError("GPT 응답 JSON 파싱 실패")
             return []
 
     def _normalize_schema(self, data) -> List[GptParsedEventDTO]:
@@ -367,7 +489,7 @@ class GptAPI:
                     address=(obj.get("address") or "").strip(),
                     region=(obj.get("region") or "").strip(),
                     geocoding_query=(obj.get("geocoding_query") or "").strip(),
-                    caption_summary=(obj.get("caption_summary") or "").strip(),
+                    caption_summary=compose_caption_summary(obj),
                     recommend=recommend_list,
                     section=int(obj["section"]) if obj.get("section") is not None else None
                 )
@@ -400,7 +522,7 @@ class GptAPI:
         return valid
 
     # ---------- 원본 데이터 병합 ----------
-    def _enrich_with_original(self, posts: List[InstagramPostDTO], extracted: List[GptParsedEventDTO], section_to_post):
+    def _enrich_with_original(self, extracted: List[GptParsedEventDTO], section_to_post):
         results: List[PopupEventDTO] = []
         for event in extracted:
             orig = section_to_post.get(event.section, InstagramPostDTO("", "", "", "", []))
@@ -430,98 +552,143 @@ class GptAPI:
         return results
 
     # ---------- 이미지 다운로드 ----------
+    @property
+    def image_store(self) -> ImageStore:
+        if self._image_store is None:
+            self._image_store = ImageStore(max_workers=int(os.getenv("IMAGE_DOWNLOAD_WORKERS", 8)))
+        return self._image_store
+
     def download_images(self, event: PopupEventDTO, base_dir="images"):
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        name_slug = self.slugify(event.name) or "no_name"
-        folder_name = f"{timestamp}_{event.insta_post_id}"
-        folder_path = os.path.join(base_dir, folder_name)
+        store = self.image_store if base_dir == "images" else ImageStore(base_dir)
+        store.download_all([event], self.slugify)
+
+    # ---------- 토큰 예산 기반 배치 ----------
+    def section_cost(self, idx, caption) -> Tuple[int, int]:
+        """섹션 1개의 (프롬프트 토큰, 예상 출력 토큰)"""
+        prompt_tokens = count_tokens(f"[section {idx}]\n{caption}\n\n---\n\n", self.model)
+        return prompt_tokens, COMPLETION_PER_CAPTION + prompt_tokens // 4
 
+    def extract_batch(self, chunk, max_tokens=None) -> List[Tuple[list, List[GptParsedEventDTO]]]:
+        """
+        배치 1건 추출. 응답이 잘리거나(finish_reason=length) JSON 파싱에 실패하면
+        배치를 반으로 나눠 재시도하고, 캡션 1개까지 줄어들면 max_tokens를 늘려 한 번 더 시도한다.
+        성공한 (부분 배치, 이벤트 목록)만 반환하므로 실패한 캡션은 완료/캐시 기록에서 빠진다.
+        """
+        max_tokens = max_tokens or self.completion_budget
         try:
-            os.makedirs(folder_path, exist_ok=True)
+            resp_text, finish_reason = self.complete(self.build_prompt(chunk), max_tokens=max_tokens)
+            # print("==== GPT RAW RESPONSE ====")
+            # print(resp_text)
+            if finish_reason == "length":
+                raise ValueError(f"응답이 max_tokens({max_tokens})에서 잘림")
+            return [(chunk, self.extract_json_array(resp_text, strict=True))]
+        except ValueError as e:
+            if len(chunk) > 1:
+                mid = len(chunk) // 2
+                self.log.warn(f"✂️ {e} → 배치 분할 재시도 ({len(chunk)} → {mid} + {len(chunk) - mid})")
+                return self.extract_batch(chunk[:mid], max_tokens) + self.extract_batch(chunk[mid:], max_tokens)
+            if max_tokens < MAX_COMPLETION_TOKENS:
+                return self.extract_batch(chunk, min(MAX_COMPLETION_TOKENS, max_tokens * 2))
+            self.log.error(f"❌ section {chunk[0][0]} 추출 실패: {e}")
         except Exception as e:
-            print(f"❌ 폴더 생성 실패 ({folder_path}): {e}")
-            return
-
-        image_paths = []
-        valid_image_urls = []  # ✅ webp 제거 후 다시 담을 리스트
-
-        for idx, url in enumerate(event.image_url, start=1):
-            try:
-                if not url or not url.startswith("http"):
-                    print(f"⚠️ 잘못된 URL → 스킵: {url}")
-                    continue
-
-                parsed = urlparse(url)
-                ext = os.path.splitext(parsed.path)[1].lower().split("?")[0]
-
-                # 🚫 webp 제외 — 아예 URL 리스트에서도 제거
-                if ext == ".webp":
-                    print(f"🚫 webp 파일 스킵 및 URL 제거: {url}")
-                    continue
-
-                if ext in ("", ".heic"):
-                    ext = ".jpg"
-
-                filename = f"{name_slug}_{idx}{ext}"
-                filepath = os.path.join(folder_path, filename)
-
-                resp = requests.get(url, timeout=20)
-                if resp.status_code != 200:
-                    print(f"⚠️ 다운로드 실패 (status={resp.status_code}): {url}")
-                    continue
-
-                content_type = resp.headers.get("Content-Type", "").lower()
-                if not content_type.startswith("image/"):
-                    print(f"⚠️ 이미지 아님 (Content-Type={content_type}): {url}")
-                    continue
-
-                with open(filepath, "wb") as f:
-                    f.write(resp.content)
-
-                image_paths.append(os.path.abspath(filepath))
-                valid_image_urls.append(url)  # ✅ 실제로 성공한 URL만 유지
-                self.log.plain(f"이미지 저장 완료: {filepath}")
-
-            except Exception as e:
-                print(f"❌ 이미지 다운로드 처리 중 오류 ({url}): {e}")
-
-        event.image_paths = image_paths
-        event.image_url = valid_image_urls  # ✅ webp 제거 반영
-
-
+            print(f"⚠️ GPT 처리 실패: {e}")
+        return []
 
     # ---------- 전체 파이프라인 ----------
-    def process_file(self, filename, batch_size=10, download=False):
-        posts = self.file_open(filename)
+    def process_file(self, filename, batch_size=None, download=False, state: Optional[StateStore] = None):
+        return self.process_posts(self.file_open(filename), batch_size=batch_size, download=download, state=state)
+
+    @metrics.timed("gpt")
+    def process_posts(self, posts: Iterable[InstagramPostDTO], batch_size=None, download=False,
+                      state: Optional[StateStore] = None, max_in_flight: Optional[int] = None,
+                      cache: Optional[GptCache] = None):
+        """
+        posts는 리스트뿐 아니라 InstagramAPI.stream() 같은 제너레이터도 받는다.
+        캡션을 프롬프트/출력 토큰 예산이 찰 때까지 모은 뒤 GPT 요청을 스레드 풀에 넣으므로
+        수집과 추출이 겹쳐서 진행된다. batch_size를 주면 배치당 캡션 수 상한으로도 쓴다.
+        결과는 배치 제출 순서대로 합쳐지므로 section → 게시물 매핑이 그대로 유지된다.
+        state가 주어지면 이미 처리한 게시물(캡션 동일)은 GPT/다운로드 없이 저장된 결과를 재사용한다.
+        cache가 주어지면 같은 캡션의 이전 GPT 응답을 재사용한다 (다른 게시물이어도 적용).
+        """
         sections = []
         section_to_post = {}
-        for idx, post in enumerate(posts):
-            if post.caption:
+        all_extracted: List[GptParsedEventDTO] = []
+        reused: List[PopupEventDTO] = []
+        answered: List[InstagramPostDTO] = []  # GPT 응답을 정상 파싱한 게시물 → 완료 기록 대상
+        pending = []
+        futures = []
+        prompt_version = self.prompt_version
+        base_tokens = count_tokens(self.build_prompt([]) + SYSTEM_PROMPT, self.model)
+        pending_prompt = pending_completion = 0
+        self.reset_usage()
+
+        with ThreadPoolExecutor(max_workers=max_in_flight or self.max_in_flight) as pool:
+            for idx, post in enumerate(posts):
+                if not post.caption:
+                    continue
+                if state:
+                    saved = state.lookup("gpt", post.id, StateStore.content_hash(post.caption))
+                    if saved is not None:
+                        reused.extend(PopupEventDTO(**event) for event in saved)
+                        metrics.add("gpt", "reused", post_id=post.id)
+                        continue
                 sections.append((idx, post.caption))
                 section_to_post[idx] = post
-
-        if not sections:
+                if cache:
+                    cached = cache.get(GptCache.make_key(self.model, SYSTEM_PROMPT, prompt_version, post.caption))
+                    if cached is not None:
+                        all_extracted.extend(GptParsedEventDTO(**event, section=idx) for event in cached)
+                        answered.append(post)
+                        metrics.add("gpt", "cache_hits", post_id=post.id)
+                        continue
+                    metrics.add("gpt", "cache_misses", post_id=post.id)
+
+                prompt_tokens, completion_tokens = self.section_cost(idx, post.caption)
+                # 배치 응답의 토큰은 게시물별로 나눌 수 없어 캡션 기준 추정치를 게시물에 남긴다
+                metrics.add_post("gpt", "estimated_tokens", prompt_tokens + completion_tokens, post.id)
+                over_budget = (
+                    base_tokens + pending_prompt + prompt_tokens > self.prompt_budget
+                    or pending_completion + completion_tokens > self.completion_budget
+                    or (batch_size and len(pending) >= batch_size)
+                )
+                if pending and over_budget:
+                    futures.append(pool.submit(self.extract_batch, pending))
+                    pending, pending_prompt, pending_completion = [], 0, 0
+                pending.append((idx, post.caption))
+                pending_prompt += prompt_tokens
+                pending_completion += completion_tokens
+
+            if pending:
+                futures.append(pool.submit(self.extract_batch, pending))
+
+            # 제출 순서대로 병합
+            for future in futures:
+                for chunk, extracted in future.result():
+                    all_extracted.extend(extracted)
+                    answered.extend(section_to_post[idx] for idx, _ in chunk)
+                    if cache:
+                        self._cache_chunk(cache, prompt_version, chunk, extracted)
+
+        # 캐시 적중분이 먼저 들어가므로 section 순서로 정렬
+        all_extracted.sort(key=lambda event: event.section if event.section is not None else -1)
+        if cache:
+            self.log.plain(f"🧠 GPT 캐시: 적중 {cache.hits}건 / 미적중 {cache.misses}건 ({cache.hit_rate:.0%})")
+        self.log.plain(f"📦 GPT 배치 {len(futures)}건으로 캡션 {len(sections)}개 처리")
+        usage = self.usage
+        self.log.plain(
+            f"💰 토큰 사용: 요청 {usage['requests']}건, 입력 {usage['prompt_tokens']} "
+            f"(캐시 {usage['cached_tokens']}), 출력 {usage['completion_tokens']}, "
+            f"이벤트당 {(usage['prompt_tokens'] + usage['completion_tokens']) / max(1, len(all_extracted)):.0f}"
+        )
+
+        if not sections and not reused:
             print("⚠️ 캡션 텍스트가 없습니다.")
             return []
 
-        all_extracted: List[GptParsedEventDTO] = []
-        for i in range(0, len(sections), batch_size):
-            chunk = sections[i:i + batch_size]
-            prompt = self.build_prompt(chunk)
-            try:
-                resp_text = self.call_gpt(prompt)
-                # print("==== GPT RAW RESPONSE ====")
-                # print(resp_text)
-                extracted = self.extract_json_array(resp_text)
-                all_extracted.extend(extracted)
-            except Exception as e:
-                print(f"⚠️ GPT 처리 실패: {e}")
-
-        results = self._enrich_with_original(posts, all_extracted, section_to_post)
+        results = self._enrich_with_original(all_extracted, section_to_post)
 
         if download:
-            for event in results:
-                self.download_images(event)
+            self.image_store.download_all(results, self.slugify)
 
         # ✅ 필수 필드 필터링 추가
         before_len = len(results)
@@ -536,19 +703,55 @@ class GptAPI:
 
         self.log.plain(f"🧾 총 {before_len}건 중 {before_len - after_len}건은 이미지 없음으로 제외됨")
 
-        return results
+        # ✅ 게시물별 완료 기록 (이벤트가 없던 게시물도 기록해 다음 실행에서 재전송하지 않음)
+        if state:
+            by_post = group_by_post(event.__dict__ for event in results)
+            for post in answered:
+                state.record("gpt", post.id, StateStore.content_hash(post.caption), by_post.get(post.id, []))
+            self.log.plain(f"♻️ 이전 실행 결과 재사용: {len(reused)}건")
 
+        return reused + results
+
+
+    def _cache_chunk(self, cache: GptCache, prompt_version: str, chunk, extracted: List[GptParsedEventDTO]):
+        """배치 응답을 캡션 단위로 나눠 저장 (이벤트가 없는 캡션도 빈 목록으로 저장)"""
+        by_section = {}
+        for event in extracted:
+            fields = {k: v for k, v in event.__dict__.items() if k != "section"}
+            by_section.setdefault(event.section, []).append(fields)
+        for idx, caption in chunk:
+            key = GptCache.make_key(self.model, SYSTEM_PROMPT, prompt_version, caption)
+            cache.put(key, by_section.get(idx, []))
 
     # ---------- 실행 ----------
     @staticmethod
-    def play(download=False):
+    def from_env() -> Optional["GptAPI"]:
+        """.env 기반 인스턴스 (토큰이 없으면 None)"""
         load_dotenv()
         token = os.getenv("GPT_ACCESS_TOKEN")
         if not token:
             print("❌ 환경 변수 누락: GPT_ACCESS_TOKEN")
+            return None
+        return GptAPI(
+            token,
+            max_in_flight=int(os.getenv("GPT_MAX_IN_FLIGHT", 4)),
+            rpm=int(os.getenv("GPT_RPM", 500)),
+            tpm=int(os.getenv("GPT_TPM", 200_000)),
+        )
+
+    @staticmethod
+    def play(download=False, posts: Optional[Iterable[InstagramPostDTO]] = None,
+             state: Optional[StateStore] = None):
+        """posts가 주어지면 popup.json 대신 해당 스트림을 바로 처리"""
+        api = GptAPI.from_env()
+        if api is None:
             return
-        api = GptAPI(token)
-        results = api.process_file("popup.json", batch_size=10, download=download)
+        state = state or StateStore()
+        cache = GptCache()
+        cache.evict()
+        if posts is None:
+            posts = api.file_open("popup.json")
+        results = api.process_posts(posts, download=download, state=state, cache=cache)
         api.file_save(results)
 
 
@@ -0,0 +1,99 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_PATH = "gpt_cache.db"
+DEFAULT_TTL = 60 * 60 * 24 * 30   # 30일
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+# ==============================
+# 🧠 캡션 단위 GPT 응답 캐시
+# ==============================
+class GptCache:
+    """
+    (모델, 시스템 프롬프트, 프롬프트 버전, 캡션) 해시 → 파싱된 이벤트 목록(dict, section 제외)
+    - ttl 이 지난 항목은 조회 시 무시되고 evict 때 삭제된다
+    - max_entries 를 넘으면 가장 오래 조회되지 않은 항목부터 삭제 (LRU)
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or os.getenv("GPT_CACHE_DB", DEFAULT_PATH)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS gpt_cache (
+                    key TEXT PRIMARY KEY,
+                    events TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_gpt_cache_accessed ON gpt_cache (accessed_at)")
+
+    # ---------- 키 ----------
+    @staticmethod
+    def normalize_caption(caption: str) -> str:
+        """공백/줄바꿈 차이만 있는 캡션은 같은 키로 취급"""
+        return re.sub(r"\s+", " ", caption or "").strip()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt_version: str, caption: str) -> str:
+        raw = "\x1f".join([model, system_prompt, prompt_version, GptCache.normalize_caption(caption)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---------- 조회/저장 ----------
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT events, created_at FROM gpt_cache WHERE key=?", (key,)).fetchone()
+            if not row or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE gpt_cache SET accessed_at=? WHERE key=?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, events: List[Dict[str, Any]]):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO gpt_cache (key, events, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(events, ensure_ascii=False), now, now),
+            )
+
+    def evict(self) -> int:
+        """만료 항목 삭제 후 max_entries 초과분을 LRU 순서로 삭제"""
+        with self.lock, self.conn:
+            removed = self.conn.execute(
+                "DELETE FROM gpt_cache WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            removed += self.conn.execute(
+                """
+                DELETE FROM gpt_cache WHERE key IN (
+                    SELECT key FROM gpt_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        return removed
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
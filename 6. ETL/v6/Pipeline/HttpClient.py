@@ -0,0 +1,328 @@
+import os
+import time
+import random
+import asyncio
+import functools
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from typing import Callable, Dict, Iterable, List, Optional, Union
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .Metrics import metrics
+except ImportError:
+    # 단독 실행(Pipeline/HttpClient.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from Metrics import metrics
+
+
+DEFAULT_TIMEOUT = (5.0, 30.0)     # (연결, 응답) 초 — 호출마다 timeout= 으로 덮어쓸 수 있다
+DEFAULT_RETRIES = 3
+DEFAULT_POOL_SIZE = 16            # 호스트당 keep-alive 커넥션 수 (= 비동기 호출 동시 실행 수)
+MAX_HOSTS = 16                    # 커넥션 풀을 유지할 호스트 수
+RETRY_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+UNSAFE_RETRY_STATUS = frozenset({429, 503})   # POST 등: 서버가 요청을 처리하지 않았다고 볼 수 있는 응답만
+BACKOFF_BASE = 0.5                # 초
+BACKOFF_CAP = 30.0                # 초
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+FAILURE_THRESHOLD = 5             # 연속 실패가 이만큼 쌓이면 회로 차단
+RESET_TIMEOUT = 30.0              # 차단 후 시험 요청을 다시 보내기까지 대기 (초)
+
+
+class CircuitOpenError(requests.RequestException):
+    """회로가 열린 호스트로의 요청 (네트워크로 보내지 않고 바로 실패)"""
+
+
+# ==============================
+# 🔌 호스트별 서킷 브레이커
+# ==============================
+class CircuitBreaker:
+    """
+    closed → 연속 실패 failure_threshold 회 → open (reset_timeout 동안 즉시 실패)
+    → half-open (시험 요청 1개만 통과) → 성공하면 closed, 실패하면 다시 open
+    실패 = 연결/타임아웃 예외 또는 5xx 응답 (429 등 4xx 는 호스트 장애가 아니므로 세지 않음)
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release(self):
+        """시험 요청이 성공/실패 판정 없이 끝남 (요청 외 예외) → 다음 시험 요청을 허용"""
+        with self.lock:
+            self.probing = False
+
+    def failure(self) -> bool:
+        """실패 기록 → 이번 실패로 회로가 열렸으면 True"""
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return True
+            return False
+
+
+# ==============================
+# 🌐 공용 HTTP 클라이언트
+# ==============================
+class HttpClient:
+    """
+    모든 API 래퍼가 공유하는 HTTP 계층 (스레드 안전).
+    - requests.Session 하나 + HTTPAdapter: 호스트별 커넥션 풀, keep-alive 재사용
+    - 공통 타임아웃 / 재시도(지수 백오프 + full jitter, Retry-After 우선) / 호스트별 서킷 브레이커
+    - stage 를 주면 calls / api_seconds / bytes_in / retries / errors 지표를 해당 단계에 기록
+    - 동기: request / get / post / get_many, 비동기(asyncio): arequest / aget / apost / aget_many
+      (비동기 호출은 pool_size 크기의 전용 스레드 풀에서 같은 세션으로 실행)
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES, pool_size: int = DEFAULT_POOL_SIZE,
+                 retry_status: Iterable[int] = RETRY_STATUS, backoff_base: float = BACKOFF_BASE,
+                 backoff_cap: float = BACKOFF_CAP, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT):
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = max(1, pool_size)
+        self.retry_status = frozenset(retry_status)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.log = Logger("HttpClient")
+
+    # ---------- 서킷 브레이커 ----------
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    # ---------- 재시도 ----------
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """지수 백오프 + full jitter (Retry-After 헤더가 있으면 우선)"""
+        if retry_after:
+            try:
+                return min(self.backoff_cap, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _warn(self, msg: str, stage: Optional[str]):
+        if stage:
+            self.log.warn(msg, stage=stage)
+        else:
+            self.log.warn(msg)
+
+    @staticmethod
+    def _bytes_in(response: requests.Response, stream: bool) -> int:
+        if stream:
+            # 본문을 아직 읽지 않았으므로 헤더 기준
+            return int(response.headers.get("Content-Length") or 0)
+        return len(response.content)
+
+    # ---------- 동기 ----------
+    def request(self, method: str, url: str, *, retries: Optional[int] = None,
+                retry_status: Optional[Iterable[int]] = None, idempotent: Optional[bool] = None,
+                timeout=None, throttle: Optional[Callable[[], None]] = None, stage: Optional[str] = None,
+                **kwargs) -> requests.Response:
+        """
+        요청 1건 (재시도 포함) → 마지막 응답. 상태 코드 확인(raise_for_status 등)은 호출하는 쪽에서 한다.
+
+        Args:
+            retries (int): 최대 재시도 횟수 (기본: 클라이언트 설정)
+            retry_status: 재시도할 상태 코드 (기본: 멱등 요청은 클라이언트 설정(408/429/5xx), 아니면 429/503)
+            idempotent (bool): 응답 대기 중 타임아웃 / 408·5xx 응답도 재시도할지 (기본: GET/PUT/DELETE 등만 True)
+                POST 는 서버가 이미 처리했을 수 있어 연결 실패와 429/503 만 재시도한다
+            throttle: 매 시도 직전에 호출 (예: RateLimiter.acquire)
+            stage (str): 지표를 기록할 단계 이름
+            kwargs: requests.Session.request 인자 (params, json, headers, stream ...)
+        Raises:
+            CircuitOpenError: 호스트 회로가 열려 있음
+            requests.RequestException: 재시도 후에도 연결/타임아웃 실패
+        """
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if retry_status is None:
+            retry_status = self.retry_status if idempotent else self.retry_status & UNSAFE_RETRY_STATUS
+        retry_status = frozenset(retry_status)
+        retry_errors = (requests.ConnectionError, requests.Timeout) if idempotent else (requests.ConnectionError,)
+        stream = kwargs.get("stream", False)
+        breaker = self.breaker(url)
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                if stage:
+                    metrics.add(stage, "circuit_open")
+                raise CircuitOpenError(f"회로 차단 중: {urlparse(url).netloc}")
+            try:
+                if throttle:
+                    throttle()
+                if attempt and stage:
+                    metrics.add(stage, "retries")
+                start = time.perf_counter()
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as e:
+                if stage:
+                    metrics.add(stage, "api_seconds", time.perf_counter() - start)
+                    metrics.add(stage, "errors")
+                if breaker.failure():
+                    self._warn(f"🔌 회로 차단: {urlparse(url).netloc} ({self.reset_timeout:g}s)", stage)
+                if not isinstance(e, retry_errors) or attempt == retries:
+                    raise
+                delay = self.backoff(attempt)
+                self._warn(f"⚠️ 요청 실패: {e} → {delay:.1f}s 후 재시도 ({attempt + 1}/{retries})", stage)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # 인자 오류 / KeyboardInterrupt 등: 호스트 상태와 무관하므로 판정 없이 시험 요청 자리만 풀어준다
+                # (풀지 않으면 half-open 의 probing 이 남아 회로가 영영 열린 채가 된다)
+                breaker.release()
+                raise
+
+            if stage:
+                metrics.add(stage, "calls")
+                metrics.add(stage, "api_seconds", time.perf_counter() - start)
+                metrics.add(stage, "bytes_in", self._bytes_in(response, stream))
+            if response.status_code >= 500:
+                if breaker.failure():
+                    self._warn(f"🔌 회로 차단: {urlparse(url).netloc} ({self.reset_timeout:g}s)", stage)
+            else:
+                breaker.success()
+            if response.status_code not in retry_status or attempt == retries:
+                return response
+
+            delay = self.backoff(attempt, response.headers.get("Retry-After"))
+            self._warn(f"⚠️ 응답 오류: {response.status_code} → {delay:.1f}s 후 재시도 ({attempt + 1}/{retries})", stage)
+            response.close()
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_many(self, urls: List[str], **kwargs) -> List[Union[requests.Response, Exception]]:
+        """여러 URL 을 동시에 GET → 입력 순서대로 응답 (실패한 URL 은 예외 객체)"""
+        def run(url):
+            try:
+                return self.get(url, **kwargs)
+            except Exception as e:
+                return e
+        return list(self.executor.map(run, urls))
+
+    # ---------- 비동기 ----------
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="HttpClient")
+            return self._executor
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """request 의 asyncio 버전 (같은 커넥션 풀 / 재시도 / 서킷 브레이커 사용)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.request, method, url, **kwargs))
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    async def aget_many(self, urls: List[str], **kwargs) -> List[Union[requests.Response, Exception]]:
+        return await asyncio.gather(*(self.aget(url, **kwargs) for url in urls), return_exceptions=True)
+
+    def close(self):
+        with self.lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
+
+
+# ==============================
+# 🧭 공용 클라이언트 (프로세스당 1개)
+# ==============================
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """
+    공용 클라이언트를 돌려준다 (처음 호출할 때 생성).
+    - HTTP_POOL_SIZE: 호스트당 커넥션 수 (기본 16)
+    - HTTP_TIMEOUT: 응답 대기 기본값 (초, 기본 30)
+    - HTTP_RETRIES: 기본 재시도 횟수 (기본 3)
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                timeout=(DEFAULT_TIMEOUT[0], float(os.getenv("HTTP_TIMEOUT", DEFAULT_TIMEOUT[1]))),
+                retries=int(os.getenv("HTTP_RETRIES", DEFAULT_RETRIES)),
+                pool_size=int(os.getenv("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)),
+            )
+        return _client
+
+
+if __name__ == "__main__":
+    http = get_client()
+    response = http.get("https://httpbin.org/status/200", timeout=10, stage="demo")
+    print(response.status_code, http.breaker("https://httpbin.org").state)
+
+    async def demo():
+        responses = await http.aget_many(["https://httpbin.org/get"] * 4, timeout=10, stage="demo")
+        print([getattr(r, "status_code", r) for r in responses])
+
+    asyncio.run(demo())
+    metrics.report()
@@ -0,0 +1,320 @@
+import os
+import time
+import atexit
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+except ImportError:
+    # 단독 실행(Pipeline/HumanDetector.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+
+# 로컬 검출기 (opencv-python 이 없으면 로컬 검사 없이 Vision 만 사용)
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+HUMAN_THRESHOLD = 0.8   # 이 이상이면 Vision 없이 "사람 있음"
+CLEAR_THRESHOLD = 0.1   # 이 이하면 Vision 없이 "사람 없음" (음성 판정을 믿을 수 있는 검출기만)
+MAX_SIDE = 800          # 로컬 검출용 축소 크기 (긴 변)
+
+
+# ==============================
+# 🧍 사람 검출기 인터페이스
+# ==============================
+class HumanDetector(ABC):
+    """
+    이미지 1장 → 사람이 있을 확신도(0~1).
+    프로세스 풀에서 쓰이므로 __init__ 인자는 pickle 가능한 값만 받는다.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def score(self, path: str) -> float:
+        ...
+
+    @classmethod
+    def trusts_negative(cls, **kwargs) -> bool:
+        """
+        낮은 점수를 "사람 없음"으로 믿어도 되는지 (__init__ 과 같은 인자).
+        False 면 HumanScreen 은 확실한 "사람 있음"만 로컬에서 판정하고 나머지는 Vision 으로 넘긴다.
+        """
+        return False
+
+
+class OpenCvHumanDetector(HumanDetector):
+    """
+    CPU 전용 OpenCV 검출기
+    - DNN 얼굴 검출 모델(res10 SSD: deploy.prototxt + .caffemodel)이 주어지면 그 신뢰도를 그대로 사용
+    - 없으면 OpenCV 내장 Haar 얼굴 cascade + HOG 보행자 검출의 가중치를 0~1로 환산
+      (정면 얼굴 / 서 있는 전신만 잡으므로 0점이어도 옆모습·군중·상반신·마네킹일 수 있다 → 음성 판정 안 함)
+    """
+
+    name = "opencv"
+    FACE_WEIGHT_SCALE = 5.0     # Haar levelWeight 이 정도면 확실한 얼굴
+    PERSON_WEIGHT_SCALE = 1.5   # HOG SVM 가중치 이 정도면 확실한 사람
+
+    def __init__(self, dnn_proto: Optional[str] = None, dnn_model: Optional[str] = None, max_side: int = MAX_SIDE):
+        if cv2 is None:
+            raise RuntimeError("opencv-python 이 설치되어 있지 않음")
+        self.max_side = max_side
+        self.net = None
+        if dnn_proto and dnn_model:
+            self.net = cv2.dnn.readNetFromCaffe(dnn_proto, dnn_model)
+        else:
+            self.face = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+            self.hog = cv2.HOGDescriptor()
+            self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    @classmethod
+    def trusts_negative(cls, dnn_proto: Optional[str] = None, dnn_model: Optional[str] = None, **kwargs) -> bool:
+        return bool(dnn_proto and dnn_model)
+
+    def _load(self, path: str):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)   # EXIF 회전 반영
+        if image is None:
+            raise ValueError(f"이미지 디코딩 실패: {path}")
+        height, width = image.shape[:2]
+        ratio = self.max_side / max(height, width)
+        if ratio < 1:
+            image = cv2.resize(image, (int(width * ratio), int(height * ratio)), interpolation=cv2.INTER_AREA)
+        return image
+
+    def score(self, path: str) -> float:
+        image = self._load(path)
+
+        if self.net is not None:
+            blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+            self.net.setInput(blob)
+            detections = self.net.forward()
+            return float(detections[0, 0, :, 2].max()) if detections.shape[2] else 0.0
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, _, weights = self.face.detectMultiScale3(gray, scaleFactor=1.1, minNeighbors=5, outputRejectLevels=True)
+        face_score = min(1.0, max(map(float, weights), default=0.0) / self.FACE_WEIGHT_SCALE)
+        # HOG 창(64x128)보다 작은 이미지는 보행자 검출 생략 (OpenCV 내부에서 프로세스가 죽는다)
+        person_score = 0.0
+        win_width, win_height = self.hog.winSize
+        if image.shape[1] >= win_width and image.shape[0] >= win_height:
+            _, person_weights = self.hog.detectMultiScale(image, winStride=(8, 8))
+            person_score = min(1.0, max(map(float, person_weights), default=0.0) / self.PERSON_WEIGHT_SCALE)
+        return max(face_score, person_score)
+
+
+DETECTORS = {OpenCvHumanDetector.name: OpenCvHumanDetector}
+
+
+# ==============================
+# ⚙️ 프로세스 풀 워커
+# ==============================
+_worker_detector: Optional[HumanDetector] = None
+
+
+def _init_worker(name: str, kwargs: dict):
+    global _worker_detector
+    if cv2 is not None:
+        cv2.setNumThreads(1)   # 프로세스 수만큼 이미 병렬
+    _worker_detector = DETECTORS[name](**kwargs)
+
+
+def _score_path(path: str) -> Tuple[str, Optional[float]]:
+    try:
+        return path, _worker_detector.score(path)
+    except Exception as e:
+        print(f"⚠️ 로컬 검출 실패 (Vision으로 넘김): {path}, {e}")
+        return path, None
+
+
+# ==============================
+# 🧪 로컬 1차 판정 (애매한 이미지만 Vision 으로)
+# ==============================
+class HumanScreen:
+    """
+    검출기 점수로 이미지를 세 갈래로 나눈다.
+    - score >= human_threshold → True  (사람 있음, Vision 생략)
+    - score <= clear_threshold → False (사람 없음, Vision 생략) — 검출기가 trusts_negative 일 때만
+    - 그 사이 / 검출 실패        → None  (Vision 으로 넘김)
+    검출 프로세스 풀은 인스턴스 수명 동안 재사용한다 (close() 또는 프로세스 종료 시 정리).
+    """
+
+    def __init__(self, name: str = OpenCvHumanDetector.name, detector_kwargs: Optional[dict] = None,
+                 human_threshold: float = HUMAN_THRESHOLD, clear_threshold: float = CLEAR_THRESHOLD,
+                 processes: Optional[int] = None):
+        self.name = name
+        self.detector_kwargs = detector_kwargs or {}
+        self.human_threshold = human_threshold
+        # Haar/HOG 처럼 못 찾은 것과 없는 것을 구분하지 못하는 검출기는 음성 판정을 하지 않는다
+        trusted = DETECTORS[name].trusts_negative(**self.detector_kwargs)
+        self.clear_threshold = clear_threshold if trusted else None
+        self.processes = processes or os.cpu_count() or 1
+        self.decided_human = 0
+        self.decided_clear = 0
+        self.escalated = 0
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.pool_lock = threading.Lock()
+        self.log = Logger("HumanScreen")
+        if not trusted:
+            self.log.info(f"🧍 {name} 검출기는 '사람 없음'을 판정하지 않음 (사람 확실한 이미지만 Vision 생략)")
+
+    @staticmethod
+    def from_env() -> Optional["HumanScreen"]:
+        """
+        HUMAN_DETECTOR=opencv 일 때만 활성화 (opencv 미설치 시 None).
+        업로드 배치마다 불려도 같은 설정이면 프로세스 공용 인스턴스(= 같은 프로세스 풀)를 돌려준다.
+        """
+        name = os.getenv("HUMAN_DETECTOR", "").strip().lower()
+        if not name:
+            return None
+        if name not in DETECTORS or cv2 is None:
+            print(f"⚠️ 로컬 사람 검출기 사용 불가 ({name}) → Vision 만 사용")
+            return None
+        kwargs = {}
+        if os.getenv("HUMAN_DNN_PROTO") and os.getenv("HUMAN_DNN_MODEL"):
+            kwargs = {"dnn_proto": os.getenv("HUMAN_DNN_PROTO"), "dnn_model": os.getenv("HUMAN_DNN_MODEL")}
+        config = dict(
+            name=name,
+            detector_kwargs=kwargs,
+            human_threshold=float(os.getenv("HUMAN_THRESHOLD", HUMAN_THRESHOLD)),
+            clear_threshold=float(os.getenv("HUMAN_CLEAR_THRESHOLD", CLEAR_THRESHOLD)),
+            processes=int(os.getenv("HUMAN_DETECTOR_PROCESSES", "0")) or None,
+        )
+        key = repr(sorted(config.items()))
+        with _screens_lock:
+            screen = _screens.get(key)
+            if screen is None:
+                screen = _screens[key] = HumanScreen(**config)
+            return screen
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_worker,
+                    initargs=(self.name, self.detector_kwargs),
+                )
+            return self.pool
+
+    def close(self):
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def scores(self, paths: List[str]) -> Dict[str, Optional[float]]:
+        """경로별 점수 (검출 실패는 None)"""
+        unique = list(dict.fromkeys(paths))
+        if not unique:
+            return {}
+        pool = self._pool()
+        try:
+            return dict(pool.map(_score_path, unique, chunksize=4))
+        except BrokenProcessPool as e:
+            # 검출기 프로세스가 죽으면 전부 Vision 으로 넘기고, 다음 호출에서 풀을 새로 만든다
+            self.log.error(f"로컬 검출 프로세스 비정상 종료 → 전체 Vision 처리: {e}")
+            with self.pool_lock:
+                if self.pool is pool:
+                    self.pool = None
+            pool.shutdown(wait=False)
+            return {path: None for path in unique}
+
+    def classify(self, score: Optional[float]) -> Optional[bool]:
+        if score is None:
+            return None
+        if score >= self.human_threshold:
+            return True
+        if self.clear_threshold is not None and score <= self.clear_threshold:
+            return False
+        return None
+
+    def screen(self, paths: List[str]) -> Dict[str, Optional[bool]]:
+        """경로별 판정 True / False / None(Vision 필요)"""
+        verdicts = {path: self.classify(score) for path, score in self.scores(paths).items()}
+        self.decided_human = sum(1 for v in verdicts.values() if v is True)
+        self.decided_clear = sum(1 for v in verdicts.values() if v is False)
+        self.escalated = sum(1 for v in verdicts.values() if v is None)
+        self.log.plain(
+            f"🧍 로컬 검출 {len(verdicts)}장: 사람 {self.decided_human}, 없음 {self.decided_clear}, "
+            f"Vision 으로 넘김 {self.escalated}"
+        )
+        return verdicts
+
+
+# 설정별 공용 인스턴스 (from_env)
+_screens: Dict[str, HumanScreen] = {}
+_screens_lock = threading.Lock()
+
+
+@atexit.register
+def _close_screens():
+    with _screens_lock:
+        screens = list(_screens.values())
+    for screen in screens:
+        screen.close()
+
+
+# ==============================
+# 📊 벤치마크: 로컬 검출 vs Vision
+# ==============================
+def benchmark(paths: List[str], screen: HumanScreen, with_vision: bool = True):
+    """
+    - 처리량: 로컬 검출 이미지/초
+    - 절약: Vision 없이 판정한 이미지 수
+    - 일치율: 로컬이 판정한 이미지 중 Vision 판정과 같은 비율
+    """
+    start = time.perf_counter()
+    scores = screen.scores(paths)
+    elapsed = time.perf_counter() - start
+    local = {path: screen.classify(score) for path, score in scores.items()}
+    decided = {path: v for path, v in local.items() if v is not None}
+
+    print(f"📊 이미지 {len(scores)}장, 로컬 검출 {elapsed:.1f}s ({len(scores) / elapsed:.1f}장/초, 프로세스 {screen.processes}개)")
+    print(f"📊 Vision 호출 생략 {len(decided)}장 / 넘김 {len(scores) - len(decided)}장")
+
+    if not with_vision or not decided:
+        return
+
+    try:
+        from .VisionScheduler import VisionScheduler
+    except ImportError:
+        from VisionScheduler import VisionScheduler
+
+    # 이미지 1장 = 팝업 1개로 보내야 이미지별 Vision 판정을 얻는다
+    remote = VisionScheduler().check_all({path: [path] for path in decided})
+    compared = [(decided[path], remote[path]) for path in decided if remote.get(path) is not None]
+    agree = sum(1 for a, b in compared if a == b)
+    false_clear = sum(1 for a, b in compared if a is False and b is True)
+    if compared:
+        print(f"📊 Vision 일치율 {agree / len(compared):.1%} ({agree}/{len(compared)}), "
+              f"놓친 사람(로컬 '없음' → Vision '있음') {false_clear}장")
+
+
+if __name__ == "__main__":
+    import sys, json
+
+    # 사용법: python HumanDetector.py [이미지 폴더 | geo.json] [--no-vision]
+    target = next((arg for arg in sys.argv[1:] if not arg.startswith("--")), "geo.json")
+    if os.path.isdir(target):
+        image_paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(target)
+            for name in names
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        ]
+    else:
+        with open(target, "r", encoding="utf-8") as f:
+            image_paths = [p for item in json.load(f) for p in item.get("image_paths", [])]
+
+    benchmark(image_paths, HumanScreen.from_env() or HumanScreen(), with_vision="--no-vision" not in sys.argv)
@@ -0,0 +1,213 @@
+import os
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Optional, Tuple
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .HttpClient import get_client
+except ImportError:
+    # 단독 실행(Pipeline/ImageStore.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from HttpClient import get_client
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+# ==============================
+# 🖼 콘텐츠 주소 기반 이미지 저장소
+# ==============================
+class ImageStore:
+    """
+    이미지 본문을 SHA-256 기준으로 한 번만 저장하고, 팝업 폴더에는 하드링크를 건다.
+    - images/.store/ab/abcdef....jpg  ← 실제 파일 (중복 없음)
+    - images/<insta_post_id>/<이름>_1.jpg  ← 하드링크 (실패 시 복사)
+    - URL 경로별 ETag / Last-Modified 를 기억했다가 조건부 요청(304)으로 재다운로드를 피한다
+    """
+
+    def __init__(self, base_dir: str = "images", max_workers: int = 8, timeout: int = 20):
+        self.base_dir = base_dir
+        self.store_dir = os.path.join(base_dir, ".store")
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        # CDN 호스트별 keep-alive 커넥션 풀 / 재시도는 공용 클라이언트가 담당
+        self.http = get_client()
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.store_dir, "index.db"), check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_index (
+                    url_key TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    sha256 TEXT NOT NULL,
+                    ext TEXT NOT NULL
+                )
+            """)
+        self.downloaded = 0
+        self.not_modified = 0
+        self.deduped = 0
+        self.log = Logger("ImageStore")
+
+    # ---------- 경로 ----------
+    @staticmethod
+    def url_key(url: str) -> str:
+        """CDN 서명 쿼리(oh=, oe= 등)는 요청마다 바뀌므로 host + path 만 키로 사용"""
+        parsed = urlparse(url)
+        return f"{parsed.netloc}{parsed.path}"
+
+    def blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.store_dir, sha256[:2], f"{sha256}{ext}")
+
+    # ---------- 다운로드 ----------
+    def _lookup(self, key: str):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, sha256, ext FROM url_index WHERE url_key=?", (key,)
+            ).fetchone()
+
+    def _remember(self, key: str, etag: Optional[str], last_modified: Optional[str], sha256: str, ext: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO url_index (url_key, etag, last_modified, sha256, ext) VALUES (?, ?, ?, ?, ?)",
+                (key, etag, last_modified, sha256, ext),
+            )
+
+    def fetch(self, url: str, ext: str) -> Optional[str]:
+        """URL → 저장소 내 blob 경로 (실패 시 None). 본문은 청크 단위로 디스크에 스트리밍"""
+        key = self.url_key(url)
+        known = self._lookup(key)
+        headers = {}
+        if known and os.path.exists(self.blob_path(known[2], known[3])):
+            if known[0]:
+                headers["If-None-Match"] = known[0]
+            if known[1]:
+                headers["If-Modified-Since"] = known[1]
+
+        with self.http.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            if resp.status_code == 304 and known:
+                with self.lock:
+                    self.not_modified += 1
+                return self.blob_path(known[2], known[3])
+
+            if resp.status_code != 200:
+                self.log.warn(f"⚠️ 다운로드 실패 (status={resp.status_code}): {url}", every=Logger.item_every)
+                return None
+
+            content_type = resp.headers.get("Content-Type", "").lower()
+            if not content_type.startswith("image/"):
+                self.log.warn(f"⚠️ 이미지 아님 (Content-Type={content_type}): {url}", every=Logger.item_every)
+                return None
+
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                sha256 = digest.hexdigest()
+                blob = self.blob_path(sha256, ext)
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                with self.lock:
+                    if os.path.exists(blob):
+                        self.deduped += 1
+                    else:
+                        os.replace(tmp_path, blob)
+                    self.downloaded += 1
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._remember(key, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), sha256, ext)
+            return blob
+
+    @staticmethod
+    def link(blob: str, dest: str):
+        """blob → dest 하드링크 (파일시스템이 지원하지 않으면 복사)"""
+        if os.path.exists(dest):
+            if os.path.samefile(blob, dest):
+                return
+            os.remove(dest)
+        try:
+            os.link(blob, dest)
+        except OSError:
+            shutil.copyfile(blob, dest)
+
+    # ---------- 팝업 단위 ----------
+    @staticmethod
+    def resolve_ext(url: str) -> Optional[str]:
+        """저장 확장자 결정 (webp는 None → 스킵)"""
+        ext = os.path.splitext(urlparse(url).path)[1].lower().split("?")[0]
+        if ext == ".webp":
+            return None
+        if ext in ("", ".heic"):
+            ext = ".jpg"
+        return ext
+
+    def download_all(self, events, slugify):
+        """
+        여러 팝업의 이미지를 하나의 스레드 풀에서 동시에 내려받고,
+        팝업별 image_paths / image_url 을 원래 순서대로 채운다.
+        """
+        self.downloaded = self.not_modified = self.deduped = 0
+        jobs = []
+        for event in events:
+            folder_path = os.path.join(self.base_dir, event.insta_post_id or "no_post")
+            name_slug = slugify(event.name) or "no_name"
+            for idx, url in enumerate(event.image_url, start=1):
+                if not url or not url.startswith("http"):
+                    self.log.warn(f"⚠️ 잘못된 URL → 스킵: {url}", every=Logger.item_every, post_id=event.insta_post_id)
+                    continue
+                ext = self.resolve_ext(url)
+                if ext is None:
+                    self.log.info(f"🚫 webp 파일 스킵 및 URL 제거: {url}", every=Logger.item_every, post_id=event.insta_post_id)
+                    continue
+                jobs.append((event, url, os.path.join(folder_path, f"{name_slug}_{idx}{ext}"), ext))
+
+        def run(job) -> Optional[Tuple[str, str]]:
+            event, url, filepath, ext = job
+            try:
+                blob = self.fetch(url, ext)
+                if not blob:
+                    return None
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                self.link(blob, filepath)
+                return os.path.abspath(filepath), url
+            except Exception as e:
+                self.log.error(f"❌ 이미지 다운로드 처리 중 오류 ({url}): {e}", every=Logger.item_every,
+                               post_id=event.insta_post_id)
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(run, jobs))
+
+        for event in events:
+            event.image_paths = []
+            event.image_url = []  # ✅ 실제로 성공한 URL만 유지 (webp 제거 반영)
+        for (event, *_), result in zip(jobs, results):
+            if result:
+                event.image_paths.append(result[0])
+                event.image_url.append(result[1])
+
+        self.log.plain(
+            f"🖼 이미지 {len(jobs)}건: 신규 다운로드 {self.downloaded - self.deduped}, "
+            f"중복 제거 {self.deduped}, 304 재사용 {self.not_modified}"
+        )
+
+    def close(self):
+        self.conn.close()
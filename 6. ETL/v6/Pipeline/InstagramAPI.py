@@ -1,10 +1,12 @@
 import requests
 import json
+import queue
+import threading
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 
 # -------------------------------------------------
 # Logger import: main 실행 + 단독 실행 모두 지원
@@ -12,11 +14,31 @@ from typing import List, Optional
 try:
     # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
     from .Logger import Logger
+    from .RateLimiter import RateLimiter
+    from .StateStore import StateStore
+    from .Metrics import metrics
+    from .HttpClient import get_client
 except ImportError:
     # 단독 실행(Pipeline/InstagramAPI.py) 시: sys.path로 상위 폴더 추가
     import sys, os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from Logger import Logger
+    from RateLimiter import RateLimiter
+    from StateStore import StateStore
+    from Metrics import metrics
+    from HttpClient import get_client
+
+
+DEFAULT_HASHTAGS = ["팝업스토어"]
+WATERMARK_KEY = "insta_watermarks"
+PENDING_MAX_ATTEMPTS = 5   # 다음 실행마다 다시 흘려보낼 최대 횟수 (계속 실패하는 게시물은 포기)
+
+# Graph API 앱 단위 호출 한도 (사용자당 시간당 200회)
+GRAPH_CALLS_PER_HOUR = 200
+
+
+class PartialHarvestError(RuntimeError):
+    """일부 해시태그가 이전 워터마크까지 페이지를 다 따라가지 못함 (요청 실패 / max_pages)"""
 
 
 # DTO 정의
@@ -29,12 +51,36 @@ class InstagramPostDTO:
     timestamp: str
     media_urls: List[str]
 
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Graph API timestamp(2025-10-20T12:34:56+0000) → datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+
+
 class InstagramAPI:
-    def __init__(self, access_token: str, user_id: str, base_url: str):
+    FIELDS = (
+        "id,caption,media_type,media_url,permalink,comments_count,"
+        "like_count,timestamp,children{media_url,media_type}"
+    )
+
+    def __init__(self, access_token: str, user_id: str, base_url: str, limiter: Optional[RateLimiter] = None):
         self.access_token = access_token
         self.user_id = user_id
         self.base_url = base_url
-        self.log = Logger("InstagramAPI", use_color=False)
+        self.http = get_client()
+        # 모든 해시태그 워커가 하나의 호출 예산을 공유
+        self.limiter = limiter or RateLimiter(GRAPH_CALLS_PER_HOUR, per=3600)
+        self.log = Logger("InstagramAPI", use_color=False, stage="instagram")
+
+    def _get(self, url: str, params: Optional[dict] = None) -> dict:
+        # 재시도(429/5xx)마다 호출 예산을 다시 차감
+        response = self.http.get(url, params=params, timeout=20, throttle=self.limiter.acquire, stage="instagram")
+        response.raise_for_status()
+        return response.json()
 
     # 주어진 해시태그 텍스트로부터 Instagram Graph API의 해시태그 ID를 조회
     def get_hashtag_id(self, hashtag: str) -> Optional[str]:
@@ -45,9 +91,7 @@ class InstagramAPI:
             "access_token": self.access_token
         }
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json().get("data", [])
+            data = self._get(url, params).get("data", [])
 
             if not data:
                 self.log.warn(f"⚠️ 해시태그 ID를 찾을 수 없습니다: '{hashtag}'")
@@ -57,56 +101,177 @@ class InstagramAPI:
             self.log.error(f"❌ 해시태그 ID 요청 실패: {e}")
             return None
         
+    # Graph API 응답 아이템 1개 → DTO 변환 (이미지가 아니면 None)
+    def _parse_post(self, item: dict) -> Optional[InstagramPostDTO]:
+        if item.get("media_type") not in ("IMAGE", "CAROUSEL_ALBUM"):
+            return None
+
+        media_urls: List[str] = []
+
+        if item["media_type"] == "CAROUSEL_ALBUM" and "children" in item:
+            for child in item["children"]["data"]:
+                if "media_url" in child:
+                    media_urls.append(child["media_url"])
+        elif "media_url" in item:
+            media_urls.append(item["media_url"])
+
+        return InstagramPostDTO(
+            id=item.get("id"),
+            caption=item.get("caption"),
+            media_type=item.get("media_type"),
+            permalink=item.get("permalink"),
+            timestamp=item.get("timestamp"),
+            media_urls=media_urls
+        )
+
     # 특정 해시태그 ID에 대한 최근 게시물들을 조회 → DTO 변환
     def get_recent_media(self, hashtag_id: str, limit: int = 5) -> List[InstagramPostDTO]:
         url = f"{self.base_url}/{hashtag_id}/recent_media"
         params = {
             "user_id": self.user_id,
             "access_token": self.access_token,
-            "fields": (
-                "id,caption,media_type,media_url,permalink,comments_count,"
-                "like_count,timestamp,children{media_url,media_type}"
-            ),
+            "fields": self.FIELDS,
             "limit": limit
         }
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            json_data = response.json()
-            raw_posts = json_data.get("data", [])
-
-            parsed_posts: List[InstagramPostDTO] = []
-            for item in raw_posts:
-                if item["media_type"] not in ("IMAGE", "CAROUSEL_ALBUM"):
-                    continue
-
-                media_urls: List[str] = []
-
-                if item["media_type"] == "CAROUSEL_ALBUM" and "children" in item:
-                    for child in item["children"]["data"]:
-                        if "media_url" in child:
-                            media_urls.append(child["media_url"])
-                elif "media_url" in item:
-                    media_urls.append(item["media_url"])
-
-                post_dto = InstagramPostDTO(
-                    id=item.get("id"),
-                    caption=item.get("caption"),
-                    media_type=item.get("media_type"),
-                    permalink=item.get("permalink"),
-                    timestamp=item.get("timestamp"),
-                    media_urls=media_urls
-                )
-                parsed_posts.append(post_dto)
-
-            return parsed_posts
+            raw_posts = self._get(url, params).get("data", [])
+            return [post for post in map(self._parse_post, raw_posts) if post]
 
         except requests.RequestException as e:
             self.log.error(f"❌ 요청 실패: {e}")
         except ValueError:
             self.log.error("❌ JSON 파싱 실패")
         return []
-    
+
+    # paging.cursors.after 를 따라가며 since 보다 새로운 게시물만 스트리밍
+    def iter_recent_media(
+        self,
+        hashtag_id: str,
+        since: Optional[datetime] = None,
+        page_size: int = 50,
+        max_pages: Optional[int] = None,
+        progress: Optional[dict] = None,
+    ) -> Iterator[InstagramPostDTO]:
+        """
+        recent_media는 최신순으로 내려오므로, since 이하의 게시물이 한 번이라도
+        섞인 페이지를 처리한 뒤에는 더 오래된 페이지를 요청하지 않는다.
+        - 요청 / JSON 파싱 실패는 예외로 올린다 (중간까지 본 게시물로 워터마크를 옮기면 안 되므로)
+        - progress 를 주면 since 또는 마지막 페이지까지 도달했을 때 progress["complete"] = True
+          (max_pages 에서 끊기면 False 그대로)
+        """
+        url = f"{self.base_url}/{hashtag_id}/recent_media"
+        params = {
+            "user_id": self.user_id,
+            "access_token": self.access_token,
+            "fields": self.FIELDS,
+            "limit": page_size
+        }
+        pages = 0
+        while True:
+            try:
+                json_data = self._get(url, params)
+            except requests.RequestException as e:
+                self.log.error(f"❌ 요청 실패 ({pages}페이지 이후): {e}")
+                raise
+            except ValueError:
+                self.log.error(f"❌ JSON 파싱 실패 ({pages}페이지 이후)")
+                raise
+
+            pages += 1
+            reached_old = False
+            for item in json_data.get("data", []):
+                posted_at = parse_timestamp(item.get("timestamp"))
+                if since and posted_at and posted_at <= since:
+                    reached_old = True
+                    continue
+                post = self._parse_post(item)
+                if post:
+                    yield post
+
+            after = json_data.get("paging", {}).get("cursors", {}).get("after")
+            if reached_old or not after:
+                if progress is not None:
+                    progress["complete"] = True
+                return
+            if max_pages and pages >= max_pages:
+                self.log.warn(f"⚠️ max_pages({max_pages}) 도달 → 이전 워터마크까지 수집하지 못함")
+                return
+            params["after"] = after
+
+    # 여러 해시태그를 동시에 수집 → 게시물 ID 기준 중복 제거 후 스트리밍
+    def harvest(
+        self,
+        hashtags: List[str],
+        watermarks: Optional[Dict[str, str]] = None,
+        max_workers: int = 4,
+        max_pages: Optional[int] = None,
+        state: Optional[StateStore] = None,
+        incomplete: Optional[List[str]] = None,
+    ) -> Iterator[InstagramPostDTO]:
+        """
+        Args:
+            hashtags: 수집할 해시태그 목록
+            watermarks: 해시태그별 마지막으로 본 게시물 timestamp (이보다 새로운 것만 수집)
+                        수집 중 갱신되므로 소비가 끝난 뒤 저장하면 된다
+                        이전 워터마크까지 페이지를 다 따라간 해시태그만 전진한다
+            state: 주어지면 모든 단계를 마친 게시물(캡션 동일)은 내보내지 않는다
+            incomplete: 주어지면 중간에 끊긴 해시태그를 담는다 (워터마크 유지 → 다음 실행에서 다시 수집)
+        """
+        incomplete = incomplete if incomplete is not None else []
+        watermarks = watermarks if watermarks is not None else {}
+        out: "queue.Queue" = queue.Queue(maxsize=100)
+        slots = threading.Semaphore(max_workers)
+        done = object()
+
+        def worker(hashtag: str):
+            with slots:
+                try:
+                    hashtag_id = self.get_hashtag_id(hashtag)
+                    if not hashtag_id:
+                        return
+                    since = parse_timestamp(watermarks.get(hashtag))
+                    newest = since
+                    progress = {"complete": False}
+                    for post in self.iter_recent_media(hashtag_id, since=since, max_pages=max_pages, progress=progress):
+                        posted_at = parse_timestamp(post.timestamp)
+                        if posted_at and (newest is None or posted_at > newest):
+                            newest = posted_at
+                        out.put(post)
+                    if not progress["complete"]:
+                        incomplete.append(hashtag)
+                    elif newest and newest != since:
+                        watermarks[hashtag] = newest.strftime("%Y-%m-%dT%H:%M:%S%z")
+                except Exception as e:
+                    incomplete.append(hashtag)
+                    self.log.error(f"❌ 해시태그 수집 실패 ({hashtag}): {e}")
+                finally:
+                    out.put(done)
+
+        for hashtag in hashtags:
+            threading.Thread(target=worker, args=(hashtag,), daemon=True).start()
+
+        running = len(hashtags)
+        seen = set()
+        completed = 0
+        while running:
+            item = out.get()
+            if item is done:
+                running -= 1
+                continue
+            if item.id in seen:
+                continue
+            seen.add(item.id)
+            if state and state.is_complete(item.id, StateStore.content_hash(item.caption)):
+                completed += 1
+                metrics.add("instagram", "reused")
+                continue
+            metrics.add("instagram", "items", post_id=item.id)
+            yield item
+
+        self.log.info(f"해시태그 {len(hashtags)}개에서 게시물 {len(seen)}건 수집 (처리 완료 {completed}건 제외)")
+        if incomplete:
+            self.log.warn(f"⚠️ 수집이 중간에 끊긴 해시태그 (워터마크 유지): {', '.join(incomplete)}")
+
     # DTO 리스트를 Json 파일로 저장
     def save_json(self, data: List[InstagramPostDTO], filename: str):
         # dataclass -> dict 변환
@@ -120,34 +285,84 @@ class InstagramAPI:
         except IOError as e:
             self.log.error(f"❌ 파일 저장 실패: {e}")
 
+    # .env 기반 인스턴스 + 해시태그 목록 생성
     @staticmethod
-    def play():
-
-        # .env 로드
+    def from_env():
         load_dotenv()
         BASE_URL = "https://graph.facebook.com/v20.0"
         ACCESS_TOKEN = os.getenv("INSTA_ACCESS_TOKEN")
         USER_ID = os.getenv("IG_USER_ID")
-        hashtag = "팝업스토어"
 
-        # 인스턴스 생성
-        log = Logger("InstaAPI")
-        api = InstagramAPI(ACCESS_TOKEN, USER_ID, BASE_URL)
+        # 쉼표로 구분된 해시태그 목록 (예: INSTA_HASHTAGS=팝업스토어,팝업,성수팝업)
+        raw = os.getenv("INSTA_HASHTAGS", "")
+        hashtags = [tag.strip().lstrip("#") for tag in raw.split(",") if tag.strip()] or DEFAULT_HASHTAGS
 
         # .env 값이 없으면 종료
         if not ACCESS_TOKEN or not USER_ID:
-            log.error("❌ .env 설정 누락: ACCESS_TOKEN 또는 IG_USER_ID")
+            Logger("InstaAPI").error("❌ .env 설정 누락: ACCESS_TOKEN 또는 IG_USER_ID")
+            return None, hashtags
+
+        return InstagramAPI(ACCESS_TOKEN, USER_ID, BASE_URL), hashtags
+
+    # 다음 단계(GptAPI)로 바로 흘려보내는 스트림
+    @staticmethod
+    def stream(state: Optional[StateStore] = None, strict: bool = False) -> Iterator[InstagramPostDTO]:
+        """strict=True 면 중간에 끊긴 해시태그가 있을 때 마지막에 PartialHarvestError (Runner 수집 미완료 기록용)"""
+        api, hashtags = InstagramAPI.from_env()
+        if api is None:
             return
 
-        # 해시태그 ID 조회 => 17842967191006184 반환
-        hashtag_id = api.get_hashtag_id(hashtag)
-        if not hashtag_id:
-            log.error(f"❌ 해시태그 ID를 찾을 수 없습니다: {hashtag}")
+        state = state or StateStore()
+        watermarks = state.get_meta(WATERMARK_KEY, {})
+        incomplete: List[str] = []
+
+        # 워터마크는 수집이 끝나면 전진하므로, 이후 단계에서 실패한 게시물은 다시 수집되지 않는다
+        # → 수집한 게시물 원본을 상태 저장소에 남겨 두고 끝날 때까지 다음 실행마다 먼저 흘려보낸다
+        retried = set()
+        finished, given_up = [], []
+        for row in state.pending_posts():
+            post_id = row["insta_post_id"]
+            if state.is_complete(post_id, row["content_hash"]):
+                finished.append(post_id)
+            elif row["attempts"] >= PENDING_MAX_ATTEMPTS:
+                given_up.append(post_id)
+            else:
+                retried.add(post_id)
+        state.drop_pending(finished + given_up)
+        state.retry_pending(retried)
+        if given_up:
+            Logger("InstaAPI").warn(f"⚠️ {PENDING_MAX_ATTEMPTS}회 재시도에도 끝나지 않은 게시물 {len(given_up)}건 포기")
+        if retried:
+            Logger("InstaAPI").plain(f"🔁 이전 실행에서 끝나지 않은 게시물 {len(retried)}건 다시 처리")
+        for row in state.pending_posts():
+            if row["insta_post_id"] in retried:
+                yield InstagramPostDTO(**row["item"])
+
+        for post in api.harvest(hashtags, watermarks, state=state, incomplete=incomplete):
+            if post.id in retried:
+                continue
+            if post.caption:   # 캡션 없는 게시물은 GPT 단계에서 버려지므로 남기지 않는다
+                state.add_pending(post.id, StateStore.content_hash(post.caption), post.__dict__)
+            yield post
+
+        # 스트림을 끝까지 소비했을 때만 워터마크 전진 (끝까지 수집한 해시태그만)
+        state.set_meta(WATERMARK_KEY, watermarks)
+        if incomplete and strict:
+            # Runner 가 수집 미완료로 기록 → --resume 시 다시 수집
+            raise PartialHarvestError(f"수집 미완료 해시태그: {', '.join(incomplete)}")
+
+    @staticmethod
+    def play():
+        api, hashtags = InstagramAPI.from_env()
+        if api is None:
             return
-        
-        posts = api.get_recent_media(hashtag_id, limit=3)
+
+        state = StateStore()
+        watermarks = state.get_meta(WATERMARK_KEY, {})
+        posts = list(api.harvest(hashtags, watermarks, state=state))
         api.save_json(posts, "popup.json")
-        
-        
+        state.set_meta(WATERMARK_KEY, watermarks)
+
+
 if __name__ == "__main__":
-    InstagramAPI.play()
\ No newline at end of file
+    InstagramAPI.play()
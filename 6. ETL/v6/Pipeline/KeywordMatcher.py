@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+# ==============================
+# 🔎 다중 키워드 매칭 (Aho-Corasick)
+# ==============================
+class KeywordMatcher:
+    """
+    모든 키워드로 오토마톤을 한 번 만들고, 텍스트를 한 번만 훑어 포함된 키워드를 모두 찾는다.
+    매칭 비용은 텍스트 길이 + 찾은 키워드 수에 비례한다 (키워드 수와 무관).
+    `kw in text` 와 같은 의미의 부분 문자열 매칭이며, 빈 문자열 키워드는 무시한다.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]   # 이 상태에서 끝나는 키워드
+        self.dict_link: List[int] = [0]       # 실패 링크를 따라가다 처음 만나는 출력 상태 (0 = 없음)
+
+        for keyword in set(keywords):
+            if keyword:
+                self._add(keyword)
+        self._build()
+
+    def _add(self, keyword: str):
+        state = 0
+        for ch in keyword:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.dict_link.append(0)
+            state = nxt
+        self.output[state].append(keyword)
+
+    def _build(self):
+        """BFS 로 실패 링크 / 출력 링크 계산"""
+        queue = deque(self.goto[0].values())   # 깊이 1 상태의 실패 링크는 루트(0)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                link = self.goto[f].get(ch, 0)
+                self.fail[nxt] = link
+                self.dict_link[nxt] = link if self.output[link] else self.dict_link[link]
+
+    def find(self, text: str) -> Set[str]:
+        """text 에 포함된 키워드 집합"""
+        found: Set[str] = set()
+        state = 0
+        for ch in text or "":
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            out = state
+            while out:
+                if self.output[out]:
+                    found.update(self.output[out])
+                out = self.dict_link[out]
+        return found
+
+    def find_all(self, *texts: str) -> Set[str]:
+        """여러 필드(제목, 요약 등) 중 하나라도 포함된 키워드 집합"""
+        found: Set[str] = set()
+        for text in texts:
+            found |= self.find(text)
+        return found
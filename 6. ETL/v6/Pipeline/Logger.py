@@ -1,5 +1,91 @@
-import datetime
+import os
 import sys
+import json
+import time
+import queue
+import atexit
+import datetime
+import threading
+
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warn": WARN, "error": ERROR}
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARN: "warn", ERROR: "error"}
+
+
+# ==============================
+# ✍️ 백그라운드 기록 스레드 (비동기 모드)
+# ==============================
+class _Writer:
+    """
+    큐에 쌓인 레코드를 모아서 한 번에 쓰고 flush 한다.
+    - flush_interval 초마다 또는 batch_size 개가 모이면 기록
+    - ERROR 레코드가 있으면 바로 기록
+    """
+
+    def __init__(self, flush_interval: float = 0.2, batch_size: int = 256):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="LoggerWriter", daemon=True)
+        self.thread.start()
+
+    def put(self, record):
+        self.queue.put(record)
+
+    def _drain(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and first[0] < ERROR:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is None:
+                self.stopped.set()
+                break
+            batch.append(record)
+            if record[0] >= ERROR:
+                break
+        return batch
+
+    def _run(self):
+        while not self.stopped.is_set():
+            first = self.queue.get()
+            if first is None:
+                break
+            self._write(self._drain(first))
+        # 종료 신호 이후 남은 레코드까지 기록
+        rest = []
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                rest.append(record)
+        if rest:
+            self._write(rest)
+
+    @staticmethod
+    def _write(batch):
+        by_stream = {}
+        for level, ts, logger, msg, fields, colored in batch:
+            by_stream.setdefault(logger.stream, []).append(logger._format(level, ts, msg, fields, colored))
+        for stream, lines in by_stream.items():
+            try:
+                stream.write("".join(lines))
+                stream.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
 
 class Logger:
     COLORS = {
@@ -9,51 +95,137 @@ class Logger:
         "gray": "\033[90m",
         "reset": "\033[0m",
     }
-    
-    def __init__(self, prefix: str = "", enable: bool = True, stream=None, use_color: bool = True):
+    LEVEL_COLORS = {DEBUG: "gray", INFO: "green", WARN: "yellow", ERROR: "red"}
+
+    # 프로세스 공통 설정 (main.py 에서 .env 를 먼저 읽으므로 import 시점의 환경 변수로 초기화)
+    level = LEVELS.get(os.getenv("LOG_LEVEL", "info").lower(), INFO)
+    json_lines = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    item_every = max(1, int(os.getenv("LOG_ITEM_EVERY", "1")))   # 게시물/행 단위 로그 샘플링 (every= 로 전달)
+    _writer = None
+    _writer_lock = threading.Lock()
+    _sample_counts = {}
+    _sample_lock = threading.Lock()
+
+    def __init__(self, prefix: str = "", enable: bool = True, stream=None, use_color: bool = True, **fields):
         """
         Args:
             prefix (str): 로그 앞 태그
             enable (bool): 로그 출력 여부
             stream: 출력 대상
             use_color (bool): ANSI 컬러 사용 여부
+            fields: 이 로거의 모든 JSON 레코드에 붙일 필드 (예: stage="gpt", 텍스트 출력에는 생략)
         """
+        self.name = prefix
         self.prefix = f"[{prefix}]" if prefix else ""
         self.enable = enable
         self.stream = stream or sys.stdout
         self.use_color = use_color
+        self.fields = fields
+
+    # ---------- 공통 설정 ----------
+    @classmethod
+    def configure(cls, level=None, json_lines=None, async_mode=None, flush_interval: float = 0.2,
+                  batch_size: int = 256):
+        """
+        Args:
+            level: "debug" / "info" / "warn" / "error" (이보다 낮은 레코드는 포맷 전에 버림)
+            json_lines (bool): JSON 한 줄 형식으로 출력 (ts, level, logger, msg + 필드)
+            async_mode (bool): 백그라운드 스레드에서 모아서 기록 (호출 스레드는 큐에 넣기만 한다)
+        """
+        if level is not None:
+            cls.level = LEVELS.get(str(level).lower(), level) if not isinstance(level, int) else level
+        if json_lines is not None:
+            cls.json_lines = json_lines
+        if async_mode is not None:
+            with cls._writer_lock:
+                if async_mode and cls._writer is None:
+                    cls._writer = _Writer(flush_interval, batch_size)
+                elif not async_mode and cls._writer is not None:
+                    cls._writer.close()
+                    cls._writer = None
+
+    @classmethod
+    def shutdown(cls):
+        """비동기 모드의 남은 레코드를 모두 기록하고 동기 모드로 돌아간다"""
+        cls.configure(async_mode=False)
 
+    def bind(self, **fields) -> "Logger":
+        """필드를 더한 로거 (예: log.bind(post_id=...))"""
+        return Logger(self.name, self.enable, self.stream, self.use_color, **{**self.fields, **fields})
+
+    # ---------- 포맷 ----------
     def _color(self, code: str):
         """ use_color=False 이면 색상 코드 제거 """
         if not self.use_color:
             return ""
         return self.COLORS[code]
 
-    def _log(self, msg: str, color: str = None):
-        if not self.enable:
-            return
-
-        ts = datetime.datetime.now().strftime("%H:%M:%S")
+    def _format(self, level: int, ts: float, msg: str, fields: dict, colored: bool = True) -> str:
+        if Logger.json_lines:
+            record = {
+                "ts": datetime.datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+                "level": LEVEL_NAMES.get(level, "info"),
+                "logger": self.name,
+                "msg": msg,
+                **self.fields,
+                **fields,
+            }
+            return json.dumps(record, ensure_ascii=False, default=str) + "\n"
 
+        clock = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
         prefix_color = self._color("gray")
-        msg_color = self._color(color) if color else ""
+        msg_color = self._color(self.LEVEL_COLORS[level]) if colored else ""
         reset = self._color("reset")
+        extra = " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"{prefix_color}{self.prefix}{reset} [{clock}] {msg_color}{msg}{reset}{' ' + extra if extra else ''}\n"
+
+    def _sampled(self, every: int) -> bool:
+        """호출 위치별로 every 번 중 1번만 통과"""
+        caller = sys._getframe(3)
+        key = (caller.f_code, caller.f_lineno)
+        with Logger._sample_lock:
+            count = Logger._sample_counts.get(key, 0)
+            Logger._sample_counts[key] = count + 1
+        return count % every == 0
 
-        formatted = f"{prefix_color}{self.prefix}{reset} [{ts}] {msg_color}{msg}{reset}\n"
-        self.stream.write(formatted)
+    # ---------- 기록 ----------
+    def _log(self, level: int, msg, every: int = 1, colored: bool = True, **fields):
+        # 레벨 / 비활성 / 샘플링으로 버려지는 레코드는 포맷하지 않는다
+        if not self.enable or level < Logger.level:
+            return
+        if every > 1:
+            if not self._sampled(every):
+                return
+            fields["sampled"] = every
+        if callable(msg):
+            msg = msg()   # log.debug(lambda: ...) 처럼 넘기면 버려질 때 문자열도 만들지 않는다
+
+        writer = Logger._writer
+        if writer is not None:
+            writer.put((level, time.time(), self, msg, fields, colored))
+            return
+        self.stream.write(self._format(level, time.time(), msg, fields, colored))
         self.stream.flush()
 
-    def info(self, msg: str):
-        self._log(msg, "green")
+    def debug(self, msg, every: int = 1, **fields):
+        self._log(DEBUG, msg, every, **fields)
+
+    def info(self, msg, every: int = 1, **fields):
+        self._log(INFO, msg, every, **fields)
 
-    def warn(self, msg: str):
-        self._log(msg, "yellow")
+    def warn(self, msg, every: int = 1, **fields):
+        self._log(WARN, msg, every, **fields)
 
-    def error(self, msg: str):
-        self._log(msg, "red")
+    def error(self, msg, every: int = 1, **fields):
+        self._log(ERROR, msg, every, **fields)
 
-    def plain(self, msg: str):
-        self._log(msg, None)
+    def plain(self, msg, every: int = 1, **fields):
+        self._log(INFO, msg, every, colored=False, **fields)
+
+
+if os.getenv("LOG_ASYNC", "").lower() in ("1", "true", "yes"):
+    Logger.configure(async_mode=True)
+atexit.register(Logger.shutdown)
 
 if __name__ == "__main__":
     log1 = Logger("Browser", use_color=True)   # 컬러 ON
@@ -63,3 +235,9 @@ if __name__ == "__main__":
     log1.info("드라이버 실행 완료")
     log2.warn("컬러 없음")
     log3.error("요청 실패")
+
+    # 비동기 + JSON 한 줄 + 샘플링
+    Logger.configure(json_lines=True, async_mode=True)
+    for i in range(1000):
+        log1.info(f"이미지 처리 {i}", every=100, stage="vision", post_id=f"post-{i}")
+    Logger.shutdown()
@@ -0,0 +1,201 @@
+import os
+import csv
+import json
+import time
+import functools
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+except ImportError:
+    # 단독 실행(Pipeline/Metrics.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+
+
+# 지표 이름 (단계마다 해당하는 것만 쌓인다)
+#   seconds            단계 처리 시간 (게시물별 값은 배치 시간을 게시물 수로 나눈 몫)
+#   api_seconds        외부 API 응답 대기 시간
+#   calls / retries / errors
+#   bytes_in / bytes_out
+#   prompt_tokens / cached_tokens / completion_tokens
+#   cache_hits / cache_misses / reused (상태 저장소 재사용)
+#   images / items 등 단계별 건수
+
+# 비용 추정 단가 (USD, 요금 변경 시 수정)
+PRICES = {
+    "gpt.prompt_tokens": 0.15 / 1_000_000,       # gpt-4o-mini 입력
+    "gpt.cached_tokens": -0.075 / 1_000_000,     # 캐시된 입력은 절반 가격 → 입력 단가에서 차감
+    "gpt.completion_tokens": 0.60 / 1_000_000,   # gpt-4o-mini 출력
+    "vision.images": 2 * 1.50 / 1000,            # 얼굴 + 라벨 검출 (기능당 1,000장 $1.50)
+}
+METRIC_PREFIX = "poppang_etl"
+
+
+# ==============================
+# 📈 실행 지표 수집기
+# ==============================
+class Metrics:
+    """
+    단계별 / 게시물별 카운터를 모아 실행 1회의 리포트로 남긴다 (스레드 안전).
+    - save(): metrics/run-YYYYmmdd-HHMMSS.json / .csv (+ Prometheus 텍스트 포맷)
+    프로세스 공용 인스턴스 `metrics` 를 각 단계에서 import 해서 쓴다.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        self.log = Logger("Metrics")
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages: Dict[str, Counter] = defaultdict(Counter)
+            self.posts: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+
+    # ---------- 기록 ----------
+    def add(self, stage: str, name: str, value: float = 1, post_id: Optional[str] = None):
+        """단계 합계에 더하고, post_id 가 있으면 게시물별 값에도 더한다"""
+        with self.lock:
+            self.stages[stage][name] += value
+            if post_id:
+                self.posts[post_id][stage][name] += value
+
+    def add_post(self, stage: str, name: str, value: float, post_id: Optional[str]):
+        """게시물별 값에만 더한다 (단계 합계는 따로 기록한 경우)"""
+        if not post_id:
+            return
+        with self.lock:
+            self.posts[post_id][stage][name] += value
+
+    @contextmanager
+    def timer(self, stage: str, name: str = "seconds"):
+        """
+        with metrics.timer("gpt") as post_ids: ...
+        블록 시간을 단계에 더하고, 블록 안에서 post_ids 에 넣은 게시물에 균등하게 나눈다
+        """
+        post_ids: List[str] = []
+        start = time.perf_counter()
+        try:
+            yield post_ids
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(stage, name, elapsed)
+            unique = list(dict.fromkeys(post_id for post_id in post_ids if post_id))
+            for post_id in unique:
+                self.add_post(stage, name, elapsed / len(unique), post_id)
+
+    def timed(self, stage: str):
+        """
+        메서드 데코레이터: 실행 시간을 단계에 더하고, 반환한 이벤트(dict/DTO)의 insta_post_id 에 균등하게 나눈다
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage) as post_ids:
+                    result = fn(*args, **kwargs)
+                    post_ids.extend(
+                        item.get("insta_post_id") if isinstance(item, dict) else getattr(item, "insta_post_id", None)
+                        for item in result or []
+                    )
+                return result
+            return wrapper
+        return decorator
+
+    # ---------- 집계 ----------
+    def cost(self) -> Dict[str, float]:
+        """단계별 추정 비용 (USD)"""
+        costs: Dict[str, float] = defaultdict(float)
+        with self.lock:
+            for key, price in PRICES.items():
+                stage, name = key.split(".", 1)
+                costs[stage] += self.stages.get(stage, Counter())[name] * price
+        return {stage: round(value, 6) for stage, value in costs.items()}
+
+    def to_dict(self) -> dict:
+        cost = self.cost()
+        with self.lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "wall_seconds": round(time.time() - self.started, 3),
+                "stages": {stage: dict(counter) for stage, counter in self.stages.items()},
+                "cost_usd": {**cost, "total": round(sum(cost.values()), 6)},
+                "posts": {
+                    post_id: {stage: dict(counter) for stage, counter in stages.items()}
+                    for post_id, stages in self.posts.items()
+                },
+            }
+
+    def rows(self) -> Iterable[tuple]:
+        """CSV 행: (scope, stage, post_id, metric, value)"""
+        report = self.to_dict()
+        for stage, values in report["stages"].items():
+            for name, value in values.items():
+                yield "stage", stage, "", name, value
+        for stage, value in report["cost_usd"].items():
+            yield "stage", stage, "", "cost_usd", value
+        for post_id, stages in report["posts"].items():
+            for stage, values in stages.items():
+                for name, value in values.items():
+                    yield "post", stage, post_id, name, value
+
+    def to_prometheus(self) -> str:
+        """Prometheus 텍스트 포맷 (게시물별 값은 라벨 폭증을 막기 위해 제외)"""
+        report = self.to_dict()
+        by_name: Dict[str, List[tuple]] = defaultdict(list)
+        for stage, values in report["stages"].items():
+            for name, value in values.items():
+                by_name[name].append((stage, value))
+        lines = []
+        for name in sorted(by_name):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f'{metric}{{stage="{stage}"}} {value:g}' for stage, value in sorted(by_name[name]))
+        lines.append(f"# TYPE {METRIC_PREFIX}_cost_usd gauge")
+        lines.extend(
+            f'{METRIC_PREFIX}_cost_usd{{stage="{stage}"}} {value:g}' for stage, value in sorted(report["cost_usd"].items())
+        )
+        lines.append(f"# TYPE {METRIC_PREFIX}_wall_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_wall_seconds {report['wall_seconds']:g}")
+        return "\n".join(lines) + "\n"
+
+    # ---------- 저장 / 출력 ----------
+    def save(self, directory: str = "metrics", prometheus: Optional[str] = None) -> str:
+        """JSON + CSV 리포트 저장 → JSON 경로. prometheus 경로를 주면 텍스트 포맷도 저장"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, datetime.fromtimestamp(self.started).strftime("run-%Y%m%d-%H%M%S"))
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        with open(f"{base}.csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope", "stage", "post_id", "metric", "value"])
+            writer.writerows(self.rows())
+        if prometheus:
+            # node_exporter textfile collector 가 쓰다 만 파일을 읽지 않도록 임시 파일 → rename
+            tmp = f"{prometheus}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp, prometheus)
+        self.log.info(f"📈 실행 리포트 저장: {os.path.abspath(base)}.json / .csv")
+        return f"{base}.json"
+
+    def report(self):
+        report = self.to_dict()
+        self.log.plain(f"📈 실행 {report['wall_seconds']:.1f}s, 추정 비용 ${report['cost_usd']['total']:.4f}")
+        for stage, values in report["stages"].items():
+            summary = ", ".join(
+                f"{name} {value:.1f}" if isinstance(value, float) else f"{name} {value}"
+                for name, value in sorted(values.items())
+            )
+            self.log.plain(f"   {stage:<10} {summary}")
+
+
+metrics = Metrics()
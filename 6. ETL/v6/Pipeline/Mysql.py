@@ -0,0 +1,543 @@
+import os
+import json
+import uuid
+from dotenv import load_dotenv
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .StateStore import StateStore
+    from . import Database
+    from .VisionCache import VisionCache
+    from .VisionScheduler import VisionScheduler
+    from .HumanDetector import HumanScreen
+    from . import VisionAPI
+    from .Metrics import metrics
+except ImportError:
+    # 단독 실행(Pipeline/Mysql.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from StateStore import StateStore
+    import Database
+    from VisionCache import VisionCache
+    from VisionScheduler import VisionScheduler
+    from HumanDetector import HumanScreen
+    import VisionAPI
+    from Metrics import metrics
+
+
+# ==============================
+# 📦 DTO 정의
+# ==============================
+@dataclass
+class PopupImageDTO:
+    imageUrl: str
+    sortOrder: int
+
+@dataclass
+class PopupUploadDTO:
+    name: str
+    startDate: str
+    endDate: str
+    openTime: Optional[str]
+    closeTime: Optional[str]
+    address: str
+    roadAddress: Optional[str]
+    longitude: Optional[float]
+    latitude: Optional[float]
+    region: str
+    geocodingQuery: str
+    instaPostId: str
+    instaPostUrl: str
+    captionSummary: str
+    caption: str
+    mediaType: str
+    imageList: List[PopupImageDTO]
+    recommendIdList: List[int]
+    isActive: bool = True
+
+
+# ==============================
+# 🧭 Util
+# ==============================
+def build_image_list(image_paths: List[str]) -> List[PopupImageDTO]:
+    return [
+        PopupImageDTO(
+            imageUrl=path,
+            sortOrder=i,
+        )
+        for i, path in enumerate(image_paths)
+    ]
+
+def to_server_path(local_path: str) -> str:
+    """
+    절대경로(/Users/...) → /images/... 로 변환
+    """
+    if "/images/" in local_path:
+        return local_path[local_path.index("/images/"):]
+    return local_path
+
+def build_payload(item: dict) -> PopupUploadDTO:
+    image_paths = item.get("image_paths", [])
+    return PopupUploadDTO(
+        name=item.get("name"),
+        startDate=item.get("start_date"),
+        endDate=item.get("end_date"),
+        openTime=item.get("open_time"),
+        closeTime=item.get("close_time"),
+        address=item.get("address"),
+        roadAddress=item.get("road_address"),
+        longitude=item.get("longitude"),
+        latitude=item.get("latitude"),
+        region=item.get("region"),
+        geocodingQuery=item.get("geocoding_query"),
+        instaPostId=item.get("insta_post_id"),
+        instaPostUrl=item.get("insta_post_url"),
+        captionSummary=item.get("caption_summary"),
+        caption=item.get("caption"),
+        mediaType=item.get("media_type"),
+        imageList=build_image_list(image_paths),
+        recommendIdList=item.get("recommend", []),
+    )
+
+
+# ==============================
+# 🔁 중복 게시물 조회
+# ==============================
+# insta_post_id 는 게시물 1개에서 팝업이 여러 개 나올 수 있어 UNIQUE 가 아니다
+# → ON DUPLICATE KEY UPDATE 대신 인덱스로 한 번에 조회해서 건너뛴다
+# 스키마 변경은 ETL 이 하지 않는다 — 배포 DB 에 한 번만 (DBA):
+#   CREATE INDEX idx_popup_insta_post_id ON popup (insta_post_id);
+EXISTING_LOOKUP_CHUNK = 1000
+SEEN_POPUP_KEY = "mysql:seen_popup_id"   # 상태 저장소 meta: 마지막으로 확인한 popup.id
+
+
+def fetch_existing_posts(conn, post_ids: List[str]) -> Dict[str, Set[str]]:
+    """DB에 이미 적재된 게시물 {insta_post_id: 팝업 이름 집합} (인덱스로 청크 단위 조회)"""
+    existing = {}
+    unique = [post_id for post_id in dict.fromkeys(post_ids) if post_id]
+    with conn.cursor() as cursor:
+        for start in range(0, len(unique), EXISTING_LOOKUP_CHUNK):
+            chunk = unique[start:start + EXISTING_LOOKUP_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"SELECT insta_post_id, name FROM popup WHERE insta_post_id IN ({placeholders})", chunk
+            )
+            for row in cursor.fetchall():
+                existing.setdefault(row["insta_post_id"], set()).add(row["name"])
+    return existing
+
+
+def fetch_new_posts(conn, after_id: int) -> Tuple[Dict[str, str], int]:
+    """popup.id 가 after_id 보다 큰 행만 (PK 범위 조회) → ({insta_post_id: caption}, 마지막 popup.id)"""
+    existing = {}
+    last_id = after_id
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, insta_post_id, caption FROM popup WHERE id > %s ORDER BY id", (after_id,)
+        )
+        for row in cursor.fetchall():
+            last_id = max(last_id, row["id"])
+            if row["insta_post_id"]:
+                existing.setdefault(row["insta_post_id"], row["caption"])
+    return existing, last_id
+
+
+def mark_done_from_mysql(state: StateStore, hashes: Dict[str, str]) -> int:
+    """
+    DB에 이미 있지만 상태 저장소에는 기록이 전혀 없는 게시물(이전 버전 파이프라인 / 다른 서버가 적재)만
+    mysql 단계 완료로 기록한다 → 다음 수집부터 GPT 단계에 들어오지 않는다
+    - 기록이 있는 게시물(부분 실패로 재시도 대기 등)은 건드리지 않는다
+    - 알림 단계는 DB 존재 여부로 알 수 없으므로 기록하지 않는다
+    """
+    known = state.known(hashes)
+    rows = [(post_id, content_hash, []) for post_id, content_hash in hashes.items() if post_id not in known]
+    state.record_many("mysql", rows, replace=False)
+    return len(rows)
+
+
+# ==============================
+# 🚚 대량 적재 (청크 단위 트랜잭션)
+# ==============================
+# PyMySQL executemany 는 VALUES 가 플레이스홀더로만 되어 있어야 한 문장의 multi-row INSERT 로 합쳐준다
+# → NOW() 대신 청크마다 서버 시각을 한 번 읽어 %(now)s 로 넘긴다
+# 합친 문장이 Cursor.max_stmt_length(1,024,000 바이트)를 넘으면 PyMySQL 이 여러 문장으로 나누므로
+# 청크를 바이트 기준으로도 자른다 (POPUP_STMT_BUDGET)
+# uuid 는 DB 기본값(uuid()) 대신 여기서 만들어 넣고, (insta_post_id, uuid) 로 id 를 다시 읽는다
+# → lastrowid / auto_increment 간격에 기대지 않는다 (innodb_autoinc_lock_mode=2 에서도 안전)
+POPUP_STMT_BUDGET = 768 * 1024
+POPUP_ROW_OVERHEAD = 256   # 행마다 붙는 괄호·따옴표·고정 값 여유분 (바이트)
+
+POPUP_INSERT_SQL = """
+INSERT INTO popup (
+    uuid,
+    name, start_date, end_date,
+    open_time, close_time,
+    address, road_address,
+    region, latitude, longitude,
+    geocoding_query,
+    insta_post_id, insta_post_url,
+    caption_summary, caption,
+    media_type, is_active,
+    created_at, updated_at
+)
+VALUES (
+    %(uuid)s,
+    %(name)s, %(start_date)s, %(end_date)s,
+    %(open_time)s, %(close_time)s,
+    %(address)s, %(road_address)s,
+    %(region)s, %(latitude)s, %(longitude)s,
+    %(geocoding_query)s,
+    %(insta_post_id)s, %(insta_post_url)s,
+    %(caption_summary)s, %(caption)s,
+    %(media_type)s, %(is_active)s,
+    %(now)s, %(now)s
+)
+"""
+
+POPUP_IMAGE_INSERT_SQL = """
+INSERT INTO popup_image (popup_id, image_url, sort_order)
+VALUES (%s, %s, %s)
+"""
+
+
+def popup_params(dto: PopupUploadDTO, now, popup_uuid: str) -> dict:
+    return {
+        "uuid": popup_uuid,
+        "name": dto.name,
+        "start_date": dto.startDate,
+        "end_date": dto.endDate,
+        "open_time": dto.openTime,
+        "close_time": dto.closeTime,
+        "address": dto.address,
+        "road_address": dto.roadAddress,
+        "region": dto.region,
+        "latitude": dto.latitude,
+        "longitude": dto.longitude,
+        "geocoding_query": dto.geocodingQuery,
+        "insta_post_id": dto.instaPostId,
+        "insta_post_url": dto.instaPostUrl,
+        "caption_summary": dto.captionSummary,
+        "caption": dto.caption,
+        "media_type": dto.mediaType,
+        "is_active": dto.isActive,
+        "now": now,
+    }
+
+
+class PopupBulkLoader:
+    """
+    popup + popup_image 를 청크 단위로 적재한다. 청크 하나당 왕복은
+    서버 시각 1 + popup multi-row INSERT 1 + id 조회 1 + popup_image multi-row INSERT 1 + COMMIT 1.
+    - popup uuid 를 미리 만들어 넣고, id 는 (insta_post_id, uuid) 로 다시 읽는다 (idx_popup_insta_post_id 사용)
+    - 청크는 chunk_size 행 또는 POPUP_STMT_BUDGET 바이트 중 먼저 차는 쪽에서 자른다
+    - 청크가 실패하면 SAVEPOINT 로 되돌린 뒤 행 단위로 다시 넣어 실패한 행만 제외
+    """
+
+    def __init__(self, conn, chunk_size: int = 200, stmt_budget: int = POPUP_STMT_BUDGET,
+                 log: Optional[Logger] = None):
+        self.conn = conn
+        self.chunk_size = max(1, chunk_size)
+        self.stmt_budget = stmt_budget
+        self.log = log or Logger("PopupBulkLoader")
+
+    @staticmethod
+    def row_bytes(dto: PopupUploadDTO) -> int:
+        """INSERT 문에 들어갈 행 1개의 대략적인 크기 (문자열 값은 UTF-8 바이트)"""
+        values = popup_params(dto, None, "").values()
+        return POPUP_ROW_OVERHEAD + 36 + sum(len(str(value).encode("utf-8")) for value in values if value is not None)
+
+    def chunks(self, rows: List[tuple]):
+        """행 수(chunk_size)와 문장 크기(stmt_budget) 안에서 청크를 나눈다"""
+        chunk, size = [], len(POPUP_INSERT_SQL)
+        for row in rows:
+            row_size = self.row_bytes(row[1])
+            if chunk and (len(chunk) >= self.chunk_size or size + row_size > self.stmt_budget):
+                yield chunk
+                chunk, size = [], len(POPUP_INSERT_SQL)
+            chunk.append(row)
+            size += row_size
+        if chunk:
+            yield chunk
+
+    def _insert(self, cursor, rows, now) -> List[tuple]:
+        """rows 전체를 한 번에 INSERT → [(popup_id, popup_uuid)] (실패 시 예외)"""
+        uuids = [str(uuid.uuid4()) for _ in rows]
+        cursor.executemany(
+            POPUP_INSERT_SQL, [popup_params(dto, now, popup_uuid) for (_, dto), popup_uuid in zip(rows, uuids)]
+        )
+
+        # insta_post_id 인덱스로 범위를 좁힌 뒤 uuid 로 행을 특정 (insta_post_id 가 빈 행이 있으면 uuid 만)
+        post_ids = list(dict.fromkeys(dto.instaPostId for _, dto in rows))
+        where, params = f"uuid IN ({', '.join(['%s'] * len(uuids))})", list(uuids)
+        if all(post_ids):
+            where = f"insta_post_id IN ({', '.join(['%s'] * len(post_ids))}) AND {where}"
+            params = post_ids + params
+        cursor.execute(f"SELECT id, uuid FROM popup WHERE {where}", params)
+        found = {row["uuid"]: row["id"] for row in cursor.fetchall()}
+        missing = [popup_uuid for popup_uuid in uuids if popup_uuid not in found]
+        if missing:
+            raise RuntimeError(f"적재한 popup id 조회 실패 ({len(missing)}건)")
+        ids = [found[popup_uuid] for popup_uuid in uuids]
+
+        image_params = [
+            (popup_id, to_server_path(img.imageUrl), img.sortOrder)
+            for popup_id, (_, dto) in zip(ids, rows)
+            for img in dto.imageList
+        ]
+        if image_params:
+            cursor.executemany(POPUP_IMAGE_INSERT_SQL, image_params)
+        return list(zip(ids, uuids))
+
+    def _insert_each(self, cursor, rows, now):
+        """행 단위 SAVEPOINT 로 실패한 행만 되돌린다"""
+        loaded, failed = [], []
+        for item, dto in rows:
+            cursor.execute("SAVEPOINT popup_row")
+            try:
+                (popup_id, popup_uuid), = self._insert(cursor, [(item, dto)], now)
+                cursor.execute("RELEASE SAVEPOINT popup_row")
+                loaded.append((item, dto, popup_id, popup_uuid))
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT popup_row")
+                self.log.error(f"❌ popup INSERT 실패: insta={dto.instaPostId}, {e}")
+                failed.append((item, dto))
+        return loaded, failed
+
+    def load(self, rows: List[tuple]):
+        """[(item, dto)] → (적재 성공 [(item, dto, popup_id, popup_uuid)], 실패 [(item, dto)])"""
+        loaded, failed = [], []
+        with self.conn.cursor() as cursor:
+            for chunk in self.chunks(rows):
+                chunk_loaded, chunk_failed = [], []
+                try:
+                    cursor.execute("SELECT NOW() AS now")
+                    now = cursor.fetchone()["now"]
+                    cursor.execute("SAVEPOINT popup_chunk")
+                    try:
+                        ids = self._insert(cursor, chunk, now)
+                        chunk_loaded = [(item, dto, *ids[i]) for i, (item, dto) in enumerate(chunk)]
+                    except Exception as e:
+                        self.log.warn(f"⚠️ 청크 적재 실패 → 행 단위 재시도 ({len(chunk)}건): {e}")
+                        cursor.execute("ROLLBACK TO SAVEPOINT popup_chunk")
+                        chunk_loaded, chunk_failed = self._insert_each(cursor, chunk, now)
+                    self.conn.commit()
+                except Exception as e:
+                    self.log.error(f"❌ 청크 커밋 실패 ({len(chunk)}건): {e}")
+                    self.conn.rollback()
+                    chunk_loaded, chunk_failed = [], list(chunk)
+                loaded.extend(chunk_loaded)
+                failed.extend(chunk_failed)
+        return loaded, failed
+
+
+# ==============================
+# 🐬 Mysql 업로드 클래스
+# ==============================
+class Mysql:
+    log = Logger("Mysql", stage="mysql")
+
+    @staticmethod
+    def connect(local: bool = True):
+        # 서버에서는 루프백, 로컬 개발 시에는 DB_HOST (공용 풀에서 대여 → close() 시 반납)
+        return Database.get_connection("127.0.0.1" if local else os.getenv("DB_HOST"))
+
+    @staticmethod
+    def mark_existing(local: bool = True, state: Optional[StateStore] = None):
+        """
+        수집 전에 DB의 기존 게시물을 상태 저장소에 기록 (GPT 단계 진입 전 중복 제거)
+        지난번에 확인한 popup.id 이후의 행만 읽는다 (첫 실행만 전체)
+        """
+        load_dotenv()
+        state = state or StateStore()
+        try:
+            conn = Mysql.connect(local)
+        except Exception as e:
+            Mysql.log.warn(f"⚠️ 기존 게시물 조회 실패 → 중복 제거 없이 진행: {e}")
+            return
+        try:
+            existing, last_id = fetch_new_posts(conn, int(state.get_meta(SEEN_POPUP_KEY, 0)))
+        except Exception as e:
+            Mysql.log.warn(f"⚠️ 기존 게시물 조회 실패 → 중복 제거 없이 진행: {e}")
+            return
+        finally:
+            conn.close()
+        marked = mark_done_from_mysql(
+            state, {post_id: StateStore.content_hash(caption) for post_id, caption in existing.items()}
+        )
+        state.set_meta(SEEN_POPUP_KEY, last_id)
+        Mysql.log.plain(f"🔁 DB 신규 게시물 {len(existing)}건 확인 → 상태 저장소에 없던 {marked}건 완료 처리")
+
+    @staticmethod
+    def play(local: bool = True, state: Optional[StateStore] = None):
+        # 📌 환경 변수 로드
+        load_dotenv()
+
+        # 📌 JSON 파일 지정
+        geo_path = os.path.join(os.getcwd(), "geo.json")
+        if not os.path.exists(geo_path):
+            Mysql.log.error("❌ geo.json 없음")
+            return
+
+        with open(geo_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        vision_cache = VisionCache()
+        try:
+            success_list = Mysql.upload(data, local=local, state=state, vision_cache=vision_cache)
+        finally:
+            vision_cache.close()
+
+        # ===== mysql.json 저장 =====
+        out_path = os.path.join(os.getcwd(), "mysql.json")
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(success_list, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    @metrics.timed("mysql")
+    def upload(data: List[dict], local: bool = True, state: Optional[StateStore] = None,
+               vision_cache: Optional[VisionCache] = None) -> List[dict]:
+        """
+        지오코딩된 이벤트 목록 → Vision 필터 → popup/popup_image INSERT → 업로드된 이벤트(popup_id 포함)
+        파일 입출력이 없어 Runner 에서 배치 단위로 호출할 수 있다 (vision_cache 는 호출하는 쪽에서 닫는다)
+        """
+        state = state or StateStore()
+
+        # 📌 DB 연결 (예외가 나도 with 블록 종료 시 풀에 반납 → Runner 가 배치 실패 후 계속 진행해도 풀이 마르지 않는다)
+        with Mysql.connect(local) as conn:
+            return Mysql._upload(conn, data, state, vision_cache)
+
+    @staticmethod
+    def _upload(conn, data: List[dict], state: StateStore, vision_cache: Optional[VisionCache]) -> List[dict]:
+        success_list = []
+        total = len(data)
+        inserted = 0
+        skipped = 0
+        human_skipped = 0
+        reused = 0
+        duplicated = 0
+
+        # ✅ 이미 업로드를 마친 게시물은 Vision/INSERT 없이 이전 결과 재사용
+        hashes = {}
+        done_posts = set()
+        for item in data:
+            post_id = item.get("insta_post_id")
+            if post_id in hashes:
+                continue
+            hashes[post_id] = StateStore.content_hash(item.get("caption"))
+            saved = state.lookup("mysql", post_id, hashes[post_id])
+            if saved is not None:
+                done_posts.add(post_id)
+                success_list.extend(saved)
+                reused += len(saved)
+                metrics.add("mysql", "reused", post_id=post_id)
+
+        post_results = {post_id: [] for post_id in hashes if post_id not in done_posts}
+        failed_posts = set()
+
+        # ===== DB에 이미 있는 팝업은 Vision/INSERT 전에 제외 (인덱스 조회 1회) =====
+        # 게시물 단위가 아니라 (insta_post_id, name) 단위 → 일부만 적재된 게시물은 나머지만 다시 넣는다
+        existing = fetch_existing_posts(conn, [post_id for post_id in post_results if post_id])
+
+        # ===== Vision 검사 (모든 팝업의 이미지를 모아 한 번에 배치 전송) =====
+        pending = []
+        for item in data:
+            if item.get("insta_post_id") in done_posts:
+                continue
+            if item.get("name") in existing.get(item.get("insta_post_id"), ()):
+                duplicated += 1
+                metrics.add("mysql", "duplicated", post_id=item.get("insta_post_id"))
+                continue
+            dto = build_payload(item)
+            if dto.mediaType == "VIDEO":
+                skipped += 1
+                continue
+            pending.append((item, dto))
+
+        scheduler = VisionScheduler(
+            cache=vision_cache,
+            screen=HumanScreen.from_env(),
+            max_workers=int(os.getenv("VISION_MAX_WORKERS", "4")),
+        )
+        verdicts = scheduler.check_all({
+            idx: [img.imageUrl for img in dto.imageList]
+            for idx, (_, dto) in enumerate(pending)
+            if dto.imageList
+        })
+
+        rows = []
+        for idx, (item, dto) in enumerate(pending):
+            has_human = verdicts.get(idx, False)
+            if has_human is None:
+                Mysql.log.error(f"Vision 오류: insta={dto.instaPostId}")
+                failed_posts.add(dto.instaPostId)
+                skipped += 1
+                metrics.add("mysql", "vision_errors", post_id=dto.instaPostId)
+                continue
+
+            if has_human:
+                human_skipped += 1
+                metrics.add("mysql", "human_filtered", post_id=dto.instaPostId)
+                continue
+
+            rows.append((item, dto))
+
+        # ===== popup / popup_image 대량 INSERT =====
+        loader = PopupBulkLoader(conn, chunk_size=int(os.getenv("MYSQL_CHUNK_SIZE", "200")), log=Mysql.log)
+        loaded, failed = loader.load(rows)
+
+        for _, dto in failed:
+            failed_posts.add(dto.instaPostId)
+            skipped += 1
+            metrics.add("mysql", "errors", post_id=dto.instaPostId)
+
+        for item, dto, popup_id, popup_uuid in loaded:
+            # ===== 성공한 데이터 mysql.json에 저장될 리스트에 추가 =====
+            uploaded = {
+                **item,
+                "popup_id": popup_id,
+                "popup_uuid": popup_uuid,
+            }
+            success_list.append(uploaded)
+            post_results[dto.instaPostId].append(uploaded)
+
+            inserted += 1
+            metrics.add("mysql", "items", post_id=dto.instaPostId)
+            Mysql.log.info(f"📌 업로드 완료 popup_id={popup_id}", every=Logger.item_every, post_id=dto.instaPostId)
+
+        # ===== 게시물별 완료 기록 (실패가 섞인 게시물은 다음 실행에서 재시도) =====
+        for post_id, uploaded in post_results.items():
+            if post_id and post_id not in failed_posts:
+                state.record("mysql", post_id, hashes[post_id], uploaded)
+
+        Mysql.log.plain(f"✅ 업로드 완료 {inserted}/{total}")
+        Mysql.log.plain(f"🚫 Vision 필터: {human_skipped}")
+        Mysql.log.plain(f"⚠️ 기타 스킵: {skipped}")
+        Mysql.log.plain(f"♻️ 이전 실행 결과 재사용: {reused}")
+        Mysql.log.plain(f"🔁 DB 중복 게시물 스킵: {duplicated}")
+        if vision_cache:
+            Mysql.log.plain(
+                f"👤 Vision 캐시 적중률 {vision_cache.hit_rate:.0%} "
+                f"(절약한 이미지 요청 {vision_cache.saved_calls}건)"
+            )
+        sent = VisionAPI.upload_stats
+        if sent["images"]:
+            Mysql.log.plain(
+                f"🗜️ Vision 업로드 {sent['images']}장: "
+                f"{sent['original_bytes'] / 1e6:.1f}MB → {sent['sent_bytes'] / 1e6:.1f}MB"
+            )
+
+        return success_list
+
+
+# ==============================
+# 🏁 실행
+# ==============================
+if __name__ == "__main__":
+    Mysql.play(local=False)
@@ -0,0 +1,52 @@
+import time
+import threading
+from typing import Optional
+
+
+# ==============================
+# 🚦 토큰 버킷 Rate Limiter
+# ==============================
+class RateLimiter:
+    """
+    스레드 안전한 토큰 버킷.
+    - rate 개의 토큰이 per 초 동안 균등하게 충전된다
+    - 여러 스레드가 같은 인스턴스를 공유하면 하나의 호출 예산을 나눠 쓴다
+    """
+
+    def __init__(self, rate: float, per: float = 60.0, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): per 초 동안 허용되는 호출(또는 토큰) 수
+            per (float): 충전 주기(초)
+            capacity (float): 한 번에 몰아서 쓸 수 있는 최대량 (기본 rate)
+        """
+        self.fill_rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """예산이 충전될 때까지 대기한 뒤 amount 만큼 차감"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+if __name__ == "__main__":
+    limiter = RateLimiter(5, per=1.0)
+    start = time.monotonic()
+    for i in range(10):
+        limiter.acquire()
+        print(f"{i}: {time.monotonic() - start:.2f}s")
@@ -0,0 +1,410 @@
+import os
+import json
+import time
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .StateStore import StateStore, STAGES, group_by_post
+except ImportError:
+    # 단독 실행(Pipeline/Runner.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from StateStore import StateStore, STAGES, group_by_post
+
+
+QUEUE_SIZE = 64      # 단계 사이 큐 크기 (가득 차면 앞 단계가 기다린다 → 메모리 상한)
+BATCH_SIZE = 10      # 단계 1회 호출당 게시물 수
+LINGER = 2.0         # 배치가 덜 찼어도 입력이 이 시간(초) 동안 없으면 모인 만큼 처리
+
+_END = object()      # 스트림 종료 신호
+
+
+# ==============================
+# 📦 DTO 정의
+# ==============================
+@dataclass
+class Stage:
+    """
+    fn(batch) → 다음 단계로 넘길 항목들 (None 이면 넘길 것 없음)
+    - batch_size=None: 입력이 끝날 때까지 모아서 한 번에 호출 (알림처럼 전체가 모여야 하는 단계)
+    - snapshot: 출력을 이 파일명(JSON)으로 저장 → 디버깅 / 단계별 play() 재실행 입력
+    """
+    name: str
+    fn: Callable[[List[Any]], Optional[Iterable[Any]]]
+    batch_size: Optional[int] = BATCH_SIZE
+    workers: int = 1
+    linger: float = LINGER
+    snapshot: Optional[str] = None
+
+
+@dataclass
+class StageStats:
+    items_in: int = 0
+    items_out: int = 0
+    batches: int = 0
+    errors: int = 0
+    busy: float = 0.0       # fn 실행 누적 시간 (워커 합계)
+    finished: int = 0       # 종료한 워커 수
+
+
+def post_id_of(item: Any) -> Optional[str]:
+    """단계 사이 항목(게시물 DTO / 이벤트 dict / 게시물별 이벤트 목록) → insta_post_id"""
+    if isinstance(item, list):
+        item = item[0] if item else {}
+    if isinstance(item, dict):
+        return item.get("insta_post_id")
+    return getattr(item, "id", None)
+
+
+# ==============================
+# ⏯ 실행 체크포인트
+# ==============================
+class RunCheckpoint:
+    """
+    실행 1회에서 수집한 게시물 원본과 게시물별 진행 위치를 상태 저장소에 남긴다.
+    단계가 끝났는지는 예외 여부가 아니라 상태 저장소의 단계 완료 기록으로 판단한다
+    (지오코딩 일부 실패, INSERT 실패처럼 단계 안에서 조용히 빠진 게시물도 미완료로 남는다).
+    - pending: 아직 진행 중 (stage = 마지막으로 마친 단계)
+    - done: 마지막 단계까지 끝났거나 더 넘길 이벤트가 없음
+    - failed: 해당 단계에서 완료 기록을 남기지 못함 → --resume 대상
+    """
+
+    def __init__(self, state: StateStore, run_id: str, stages: List[str] = STAGES):
+        self.state = state
+        self.run_id = run_id
+        self.last_stage = stages[-1]
+        self.hashes = {}   # post_id → content_hash
+        self.lock = threading.Lock()
+
+    def record(self, replay: Iterable[Any], fresh: Iterable[Any]):
+        """이어서 처리할 게시물(이미 기록됨) → 새로 수집한 게시물(기록 후) 순서로 흘려보낸다"""
+        for post in replay:
+            with self.lock:
+                self.hashes[post.id] = StateStore.content_hash(post.caption)
+            yield post
+        for post in fresh:
+            if post.id in self.hashes:
+                continue
+            if post.caption:   # 캡션 없는 게시물은 GPT 단계에서 버려지므로 추적하지 않는다
+                content_hash = StateStore.content_hash(post.caption)
+                self.state.add_run_item(self.run_id, post.id, content_hash, post.__dict__)
+                with self.lock:
+                    self.hashes[post.id] = content_hash
+            yield post
+
+    def source_end(self, ok: bool):
+        if ok:
+            self.state.set_run(self.run_id, source_done=True)
+
+    def done(self, stage: str, batch: List[Any], out: List[Any]):
+        with self.lock:
+            hashes = {pid: self.hashes[pid] for pid in map(post_id_of, batch) if pid in self.hashes}
+        committed = self.state.completed(stage, hashes)
+        forwarded = {post_id_of(item) for item in out}
+        advanced = [pid for pid in committed if pid in forwarded and stage != self.last_stage]
+        finished = [pid for pid in committed if pid not in forwarded or stage == self.last_stage]
+        failed = [pid for pid in hashes if pid not in committed]
+        self.state.update_run_items(self.run_id, advanced, "pending", stage)
+        self.state.update_run_items(self.run_id, finished, "done", stage)
+        self.state.update_run_items(self.run_id, failed, "failed", error=f"{stage} 미완료")
+
+    def failed(self, stage: str, batch: List[Any], error: Exception):
+        with self.lock:
+            post_ids = [pid for pid in map(post_id_of, batch) if pid in self.hashes]
+        self.state.update_run_items(self.run_id, post_ids, "failed", error=f"{stage}: {error}")
+
+    def finish(self) -> Tuple[int, str]:
+        """남은 게시물이 없으면 실행 완료 처리 → (미완료 게시물 수, 오프셋 요약)"""
+        offsets = self.state.run_offsets(self.run_id)
+        remaining = len(self.state.run_items(self.run_id))
+        self.state.set_run(self.run_id, "failed" if remaining else "done")
+        summary = ", ".join(f"{stage} {offsets[stage]}" for stage in STAGES)
+        return remaining, f"단계별 커밋 오프셋 ({summary} / 전체 {offsets['total']})"
+
+
+# ==============================
+# 🧵 스트리밍 파이프라인 실행기
+# ==============================
+class Runner:
+    """
+    단계마다 스레드를 두고 크기가 정해진 큐로 잇는다.
+    앞 배치가 지오코딩/업로드되는 동안 다음 배치가 GPT 에서 처리되므로
+    전체 소요 시간이 "단계 합"이 아니라 "가장 느린 단계"에 가까워진다.
+    배치 처리 중 예외는 그 배치만 버리고 계속 진행한다 (상태 저장소에 기록되지 않아 다음 실행에서 재시도).
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = QUEUE_SIZE,
+                 snapshot_dir: Optional[str] = None, source_snapshot: Optional[str] = None,
+                 checkpoint: Optional[RunCheckpoint] = None):
+        self.stages = stages
+        self.checkpoint = checkpoint
+        self.queue_size = queue_size
+        self.snapshot_dir = snapshot_dir
+        self.source_snapshot = source_snapshot
+        self.stats = {stage.name: StageStats() for stage in stages}
+        self.snapshots = {stage.name: [] for stage in stages}
+        self.source_items = []
+        self.lock = threading.Lock()
+        self.log = Logger("Runner")
+
+    # ---------- 단계 스레드 ----------
+    def _feed(self, source: Iterable[Any], outbox: queue.Queue):
+        count = 0
+        ok = False
+        try:
+            for item in source:
+                if self.snapshot_dir and self.source_snapshot:
+                    self.source_items.append(item)
+                outbox.put(item)
+                count += 1
+            ok = True
+        except Exception as e:
+            self.log.error(f"❌ 수집 중단 ({count}건 이후): {e}")
+        finally:
+            outbox.put(_END)
+            self.log.plain(f"📥 수집 완료: {count}건")
+            self._checkpoint("source_end", ok)
+
+    @staticmethod
+    def _take(stage: Stage, inbox: queue.Queue):
+        """배치 1개 → (항목들, 입력 종료 여부)"""
+        batch = []
+        while stage.batch_size is None or len(batch) < stage.batch_size:
+            try:
+                # 첫 항목은 올 때까지 기다리고, 이후에는 linger 동안만 기다린다
+                wait = batch and stage.batch_size is not None
+                item = inbox.get(timeout=stage.linger) if wait else inbox.get()
+            except queue.Empty:
+                break
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _process(self, stage: Stage, batch: List[Any], outbox: queue.Queue):
+        stats = self.stats[stage.name]
+        start = time.perf_counter()
+        try:
+            out = list(stage.fn(batch) or [])
+            self._checkpoint("done", stage.name, batch, out)
+        except Exception as e:
+            out = []
+            with self.lock:
+                stats.errors += 1
+            self.log.error(f"❌ [{stage.name}] {len(batch)}건 처리 실패 (다음 실행에서 재시도): {e}")
+            self._checkpoint("failed", stage.name, batch, e)
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            stats.items_in += len(batch)
+            stats.items_out += len(out)
+            stats.batches += 1
+            stats.busy += elapsed
+            if self.snapshot_dir and stage.snapshot:
+                self.snapshots[stage.name].extend(out)
+        for item in out:
+            outbox.put(item)
+
+    def _checkpoint(self, event: str, *args):
+        # 체크포인트 기록 실패는 실행을 멈추지 않는다 (다음 실행에서 상태 저장소 기준으로 다시 판단)
+        if self.checkpoint is None:
+            return
+        try:
+            getattr(self.checkpoint, event)(*args)
+        except Exception as e:
+            self.log.warn(f"⚠️ 체크포인트 기록 실패 ({event}): {e}")
+
+    def _work(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue):
+        ended = False
+        while not ended:
+            batch, ended = self._take(stage, inbox)
+            if batch:
+                self._process(stage, batch, outbox)
+
+        # 같은 단계의 다른 워커도 끝나도록 종료 신호를 되돌려 놓고, 마지막 워커만 다음 단계로 전달
+        inbox.put(_END)
+        with self.lock:
+            stats = self.stats[stage.name]
+            stats.finished += 1
+            last = stats.finished == stage.workers
+        if last:
+            outbox.put(_END)
+
+    # ---------- 실행 ----------
+    def run(self, source: Iterable[Any]) -> List[Any]:
+        """source 를 끝까지 흘려보내고 마지막 단계의 출력을 돌려준다"""
+        start = time.perf_counter()
+        size = max(self.queue_size, max((stage.workers for stage in self.stages), default=1))
+        queues = [queue.Queue(maxsize=size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name="Runner-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            for n in range(max(1, stage.workers)):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[i], queues[i + 1]),
+                    name=f"Runner-{stage.name}-{n}", daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                break
+            results.append(item)
+        for thread in threads:
+            thread.join()
+
+        self.save_snapshots()
+        self.report(time.perf_counter() - start)
+        return results
+
+    # ---------- 스냅샷 / 통계 ----------
+    @staticmethod
+    def _flatten(items: List[Any]) -> List[Any]:
+        """게시물 단위 묶음(list)은 펼친다 → 단계별 play() 가 읽는 JSON 과 같은 형식"""
+        return [x for item in items for x in (item if isinstance(item, list) else [item])]
+
+    def _dump(self, filename: str, items: List[Any]):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self._flatten(items), f, ensure_ascii=False, indent=2, default=lambda o: o.__dict__)
+        self.log.info(f"📁 스냅샷 저장: {os.path.abspath(path)}")
+
+    def save_snapshots(self):
+        if not self.snapshot_dir:
+            return
+        if self.source_snapshot:
+            self._dump(self.source_snapshot, self.source_items)
+        for stage in self.stages:
+            if stage.snapshot:
+                self._dump(stage.snapshot, self.snapshots[stage.name])
+
+    def report(self, wall: float):
+        self.log.plain(f"⏱ 파이프라인 전체 {wall:.1f}s")
+        for stage in self.stages:
+            stats = self.stats[stage.name]
+            self.log.plain(
+                f"   {stage.name:<10} 입력 {stats.items_in:>5} → 출력 {stats.items_out:>5}  "
+                f"배치 {stats.batches:>4}  실패 {stats.errors}  처리 {stats.busy:7.1f}s"
+            )
+        if self.stages:
+            slowest = max(self.stages, key=lambda s: self.stats[s.name].busy / max(1, s.workers))
+            self.log.plain(f"🐢 가장 느린 단계: {slowest.name}")
+
+    # ---------- ETL 구성 ----------
+    @staticmethod
+    def play(local: bool = False, state: Optional[StateStore] = None, download: bool = True,
+             snapshot_dir: Optional[str] = None, resume: bool = False, warm_up: bool = False):
+        """
+        수집 → GPT → 지오코딩 → 업로드 → 알림 을 JSON 파일 없이 메모리에서 흘려보낸다.
+        단계 사이에는 게시물 1개의 이벤트 목록(list)이 한 항목으로 흐른다
+        (게시물이 배치 사이에서 쪼개지지 않아야 단계별 완료 기록이 맞다).
+        snapshot_dir 를 주면 popup.json / gpt.json / geo.json / mysql.json 을 그 폴더에 남긴다.
+        resume=True 면 마지막으로 끝나지 않은 실행의 미완료 게시물만 다시 흘려보낸다
+        (인스타그램 재수집 없음, 이미 마친 단계는 상태 저장소의 결과를 재사용 → 실패한 단계부터 API 호출).
+        warm_up=True 면 시작 전에 popup 테이블의 좌표로 지오코딩 캐시를 채운다.
+        """
+        try:
+            from .InstagramAPI import InstagramAPI, InstagramPostDTO
+            from .GptAPI import GptAPI
+            from .GptCache import GptCache
+            from .GeoCoding import GeoCoding
+            from .GeoCache import GeoCache
+            from .Mysql import Mysql
+            from .VisionCache import VisionCache
+            from .Alert import Alert
+        except ImportError:
+            from InstagramAPI import InstagramAPI, InstagramPostDTO
+            from GptAPI import GptAPI
+            from GptCache import GptCache
+            from GeoCoding import GeoCoding
+            from GeoCache import GeoCache
+            from Mysql import Mysql
+            from VisionCache import VisionCache
+            from Alert import Alert
+
+        state = state or StateStore()
+        log = Logger("Runner")
+        gpt = GptAPI.from_env()
+        if gpt is None:
+            return
+        gpt_cache = GptCache()
+        gpt_cache.evict()
+        geo = GeoCoding(cache=GeoCache(), max_workers=int(os.getenv("GEO_MAX_WORKERS", 8)))
+        if warm_up:
+            try:
+                geo.warm_up_cache(local)
+            except Exception as e:
+                # 예열 실패는 API 호출이 늘어날 뿐 → 실행은 계속
+                log.warn(f"⚠️ 지오코딩 캐시 예열 실패: {e}")
+        vision_cache = VisionCache()
+        batch_size = int(os.getenv("PIPELINE_BATCH_SIZE", BATCH_SIZE))
+
+        def by_post(events) -> List[list]:
+            return list(group_by_post(events).values())
+
+        def extract(posts):
+            events = gpt.process_posts(posts, download=download, state=state, cache=gpt_cache)
+            return by_post(event.__dict__ for event in events)
+
+        def geocode(groups):
+            return by_post(geo.enrich(Runner._flatten(groups), state))
+
+        def upload(groups):
+            return by_post(Mysql.upload(Runner._flatten(groups), local=local, state=state, vision_cache=vision_cache))
+
+        def notify(groups):
+            Alert.notify(Runner._flatten(groups), local=local, state=state)
+
+        # ⏯ 체크포인트: 새 실행 또는 끝나지 않은 실행 이어서
+        previous = state.last_unfinished_run() if resume else None
+        if resume and previous is None:
+            log.plain("⏯ 이어서 실행할 중단된 실행 없음 → 새로 실행")
+        if previous:
+            run_id = previous["run_id"]
+            state.set_run(run_id, "running")
+            replay = [InstagramPostDTO(**row["item"]) for row in state.run_items(run_id)]
+            # 수집이 끝나지 않았던 실행이면 남은 수집도 이어서 (워터마크는 수집을 끝까지 마쳐야 전진)
+            fresh = iter(()) if previous["source_done"] else InstagramAPI.stream(state, strict=True)
+            offsets = state.run_offsets(run_id)
+            log.plain(
+                f"⏯ 실행 {run_id} 이어서: 미완료 {len(replay)}건 / 전체 {offsets['total']}건, "
+                f"수집 {'완료' if previous['source_done'] else '미완료 → 이어서 수집'}"
+            )
+        else:
+            run_id = state.begin_run()
+            replay, fresh = [], InstagramAPI.stream(state, strict=True)
+        checkpoint = RunCheckpoint(state, run_id)
+
+        runner = Runner(
+            [
+                Stage("gpt", extract, batch_size=batch_size, snapshot="gpt.json"),
+                Stage("geocoding", geocode, batch_size=batch_size, snapshot="geo.json"),
+                Stage("mysql", upload, batch_size=batch_size, snapshot="mysql.json"),
+                Stage("alert", notify, batch_size=None),   # 유저당 알림 1회 → 전체가 모인 뒤 한 번에
+            ],
+            queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", QUEUE_SIZE)),
+            snapshot_dir=snapshot_dir,
+            source_snapshot="popup.json",
+            checkpoint=checkpoint,
+        )
+        try:
+            runner.run(checkpoint.record(replay, fresh))
+        finally:
+            vision_cache.close()
+        remaining, offsets = checkpoint.finish()
+        if remaining:
+            log.warn(f"⏯ 미완료 게시물 {remaining}건 → python main.py --resume 으로 이어서 실행 ({offsets})")
+        else:
+            log.info(f"⏯ 실행 {run_id} 완료 ({offsets})")
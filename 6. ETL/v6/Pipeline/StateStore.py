@@ -0,0 +1,325 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# ETL 단계 순서 (마지막 단계까지 끝난 게시물은 수집 단계에서부터 제외)
+STAGES = ["gpt", "geocoding", "mysql", "alert"]
+DEFAULT_PATH = "etl_state.db"
+IN_CHUNK = 500   # IN (...) 한 번에 넣는 변수 수 (SQLite 변수 개수 제한: 구버전 999)
+
+
+# ==============================
+# 🗃 게시물 단위 진행 상태 저장소
+# ==============================
+class StateStore:
+    """
+    insta_post_id 기준으로 각 단계의 완료 여부와 결과를 SQLite에 기록한다.
+    - content_hash: 원본 캡션 해시. 캡션이 수정되면 모든 단계를 다시 수행
+    - payload: 해당 단계의 출력(JSON). 건너뛴 게시물도 다음 단계로 결과를 넘길 수 있다
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("ETL_STATE_DB", DEFAULT_PATH)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS post_stage (
+                    insta_post_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    payload TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (insta_post_id, stage)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            # 수집했지만 아직 끝나지 않은 게시물 원본 → 워터마크가 지나갔어도 다음 실행에서 다시 흘려보낸다
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_post (
+                    insta_post_id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            # 실행(run) 단위 체크포인트: 수집한 게시물 원본과 게시물별 진행 위치 → --resume 으로 이어서 실행
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS run (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    source_done INTEGER NOT NULL DEFAULT 0,
+                    started_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS run_item (
+                    run_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    insta_post_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    stage TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (run_id, seq)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_run_item_post ON run_item (run_id, insta_post_id)")
+
+    # ---------- 해시 ----------
+    @staticmethod
+    def content_hash(caption: Optional[str]) -> str:
+        return hashlib.sha256((caption or "").encode("utf-8")).hexdigest()
+
+    # ---------- 단계 상태 ----------
+    def lookup(self, stage: str, post_id: str, content_hash: str) -> Optional[List[Any]]:
+        """완료된 단계면 저장된 결과(list), 아니면 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_hash, payload FROM post_stage WHERE insta_post_id=? AND stage=?",
+                (post_id, stage),
+            ).fetchone()
+        if not row or row[0] != content_hash:
+            return None
+        return json.loads(row[1]) if row[1] else []
+
+    def record(self, stage: str, post_id: str, content_hash: str, payload: Optional[List[Any]] = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO post_stage (insta_post_id, stage, content_hash, payload, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (post_id, stage, content_hash, json.dumps(payload or [], ensure_ascii=False),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def record_many(self, stage: str, rows: Iterable[tuple], replace: bool = True):
+        """
+        (post_id, content_hash, payload) 여러 건을 한 트랜잭션으로 기록
+        - replace=False: 이미 기록이 있는 게시물은 그대로 둔다 (INSERT OR IGNORE)
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"""
+                {verb} INTO post_stage (insta_post_id, stage, content_hash, payload, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [(post_id, stage, content_hash, json.dumps(payload or [], ensure_ascii=False), now)
+                 for post_id, content_hash, payload in rows],
+            )
+
+    def is_complete(self, post_id: str, content_hash: str) -> bool:
+        """
+        더 할 일이 없는 게시물인지
+        - 마지막 단계(알림)까지 끝났거나
+        - 어떤 단계가 끝났는데 결과가 비어 있음 (예: GPT 가 팝업을 못 찾음, 적재된 팝업 없음 → 다음 단계로 넘길 것이 없다)
+        """
+        for stage in STAGES:
+            payload = self.lookup(stage, post_id, content_hash)
+            if payload is None:
+                return False
+            if payload == [] or stage == STAGES[-1]:
+                return True
+        return False
+
+    def known(self, post_ids: Iterable[str]) -> set:
+        """어느 단계든 기록이 남아 있는 게시물 ID 집합 (이 파이프라인이 한 번이라도 다룬 게시물)"""
+        unique = list(dict.fromkeys(post_ids))
+        found = set()
+        with self.lock:
+            for start in range(0, len(unique), IN_CHUNK):
+                chunk = unique[start:start + IN_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT DISTINCT insta_post_id FROM post_stage WHERE insta_post_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(post_id for (post_id,) in rows)
+        return found
+
+    def completed(self, stage: str, hashes: Dict[str, str]) -> set:
+        """{post_id: content_hash} 중 stage 를 마친 게시물 ID 집합 (한 번에 조회)"""
+        post_ids = list(hashes)
+        rows = []
+        with self.lock:
+            for start in range(0, len(post_ids), IN_CHUNK):   # 알림 단계는 실행 전체가 한 배치로 들어온다
+                chunk = post_ids[start:start + IN_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows.extend(self.conn.execute(
+                    f"SELECT insta_post_id, content_hash FROM post_stage WHERE stage=? AND insta_post_id IN ({placeholders})",
+                    (stage, *chunk),
+                ).fetchall())
+        return {post_id for post_id, content_hash in rows if hashes.get(post_id) == content_hash}
+
+    # ---------- 다시 흘려보낼 게시물 ----------
+    def add_pending(self, post_id: str, content_hash: str, item: Dict[str, Any]):
+        """수집한 게시물 원본 기록 (캡션이 바뀌었으면 새 원본으로 교체하고 시도 횟수 초기화)"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO pending_post (insta_post_id, content_hash, item, attempts, updated_at)
+                VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT (insta_post_id) DO UPDATE SET
+                    item = excluded.item, updated_at = excluded.updated_at,
+                    attempts = CASE WHEN content_hash = excluded.content_hash THEN attempts ELSE 0 END,
+                    content_hash = excluded.content_hash
+                """,
+                (post_id, content_hash, json.dumps(item, ensure_ascii=False, default=str),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def pending_posts(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT insta_post_id, content_hash, item, attempts FROM pending_post ORDER BY updated_at"
+            ).fetchall()
+        return [
+            {"insta_post_id": post_id, "content_hash": content_hash, "item": json.loads(item), "attempts": attempts}
+            for post_id, content_hash, item, attempts in rows
+        ]
+
+    def retry_pending(self, post_ids: Iterable[str]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE pending_post SET attempts = attempts + 1 WHERE insta_post_id=?",
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def drop_pending(self, post_ids: Iterable[str]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM pending_post WHERE insta_post_id=?", [(post_id,) for post_id in post_ids]
+            )
+
+    # ---------- 실행 체크포인트 ----------
+    def begin_run(self) -> str:
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO run (run_id, status, started_at, updated_at) VALUES (?, 'running', ?, ?)",
+                (run_id, now, now),
+            )
+        return run_id
+
+    def set_run(self, run_id: str, status: Optional[str] = None, source_done: Optional[bool] = None):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            if status is not None:
+                self.conn.execute("UPDATE run SET status=?, updated_at=? WHERE run_id=?", (status, now, run_id))
+            if source_done is not None:
+                self.conn.execute(
+                    "UPDATE run SET source_done=?, updated_at=? WHERE run_id=?", (int(source_done), now, run_id)
+                )
+
+    def last_unfinished_run(self) -> Optional[Dict[str, Any]]:
+        """가장 최근의 끝나지 않은 실행 (중단 = running 그대로, 실패 = failed)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT run_id, status, source_done FROM run WHERE status != 'done' ORDER BY started_at DESC LIMIT 1"
+            ).fetchone()
+        return {"run_id": row[0], "status": row[1], "source_done": bool(row[2])} if row else None
+
+    def add_run_item(self, run_id: str, post_id: str, content_hash: str, item: Dict[str, Any]) -> int:
+        """수집한 게시물 원본 기록 → 실행 내 순번(offset)"""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            seq = self.conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM run_item WHERE run_id=?", (run_id,)
+            ).fetchone()[0]
+            self.conn.execute(
+                """
+                INSERT INTO run_item (run_id, seq, insta_post_id, content_hash, item, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, seq, post_id, content_hash, json.dumps(item, ensure_ascii=False), now),
+            )
+        return seq
+
+    def update_run_items(self, run_id: str, post_ids: Iterable[str], status: str,
+                         stage: Optional[str] = None, error: Optional[str] = None):
+        """게시물들의 진행 상태 갱신 (stage 를 주면 마지막으로 마친 단계도 갱신)"""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.executemany(
+                """
+                UPDATE run_item SET status=?, stage=COALESCE(?, stage), error=?, updated_at=?
+                WHERE run_id=? AND insta_post_id=?
+                """,
+                [(status, stage, error, now, run_id, post_id) for post_id in post_ids],
+            )
+
+    def run_items(self, run_id: str, unfinished: bool = True) -> List[Dict[str, Any]]:
+        """실행의 게시물 원본 (순번 순서, unfinished 면 끝나지 않은 것만)"""
+        query = "SELECT seq, insta_post_id, stage, status, item FROM run_item WHERE run_id=?"
+        if unfinished:
+            query += " AND status != 'done'"
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY seq", (run_id,)).fetchall()
+        return [
+            {"seq": seq, "insta_post_id": post_id, "stage": stage, "status": status, "item": json.loads(item)}
+            for seq, post_id, stage, status, item in rows
+        ]
+
+    def run_offsets(self, run_id: str, stages: List[str] = STAGES) -> Dict[str, int]:
+        """단계별 커밋 오프셋: 앞에서부터 연속으로 그 단계를 마친 게시물 수"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT stage, status FROM run_item WHERE run_id=? ORDER BY seq", (run_id,)
+            ).fetchall()
+        offsets = {}
+        for i, stage in enumerate(stages):
+            offset = 0
+            for done_stage, status in rows:
+                passed = status == "done" or (done_stage in stages and stages.index(done_stage) >= i)
+                if not passed:
+                    break
+                offset += 1
+            offsets[stage] = offset
+        offsets["total"] = len(rows)
+        return offsets
+
+    # ---------- 메타 (워터마크 등) ----------
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# ==============================
+# 🧭 Util
+# ==============================
+def group_by_post(items: Iterable[Dict[str, Any]], key: str = "insta_post_id") -> "OrderedDict[str, List[Dict[str, Any]]]":
+    """이벤트 목록을 게시물 단위로 묶는다 (입력 순서 유지)"""
+    grouped: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for item in items:
+        grouped.setdefault(item.get(key) or "", []).append(item)
+    return grouped
@@ -0,0 +1,345 @@
+import io
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from PIL import Image, ImageOps
+# -------------------------------------------------
+# VisionCache import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    from .VisionCache import VisionCache, dhash
+    from .HttpClient import get_client
+except ImportError:
+    from VisionCache import VisionCache, dhash
+    from HttpClient import get_client
+
+# ✅ DNS 회피 설정
+os.environ["GRPC_DNS_RESOLVER"] = "native"
+os.environ["GRPC_ENABLE_FEDERATION"] = "0"
+os.environ["GRPC_DNS_ENABLE_SRV_QUERY"] = "0"
+os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "poppang-475205-c9e6e178df72.json"
+from google.cloud import vision
+
+# ✅ 절대 경로로 Credential 설정 (Pipeline 상위 폴더 = main.py 위치)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.join(BASE_DIR, "poppang-475205-c9e6e178df72.json")
+
+client = vision.ImageAnnotatorClient(
+    client_options={"api_endpoint": "vision.googleapis.com:443"}
+)
+
+# ✅ 사람이 포함됐는지 판별할 키워드 목록
+HUMAN_KEYWORDS = [
+    # 인물 기본
+    "person", "people", "human", "face",
+
+    # 성별·연령
+    "man", "woman", "boy", "girl",
+    "child", "kid", "baby", "toddler", "infant", "teenager",
+
+    # 집단
+    "crowd", "family", "group",
+]
+
+
+def is_human_verdict(face_count: int, labels: List[str]) -> bool:
+    """얼굴 수 + 라벨 목록 → 사람 포함 여부"""
+    if face_count > 0:
+        return True
+    return any(keyword in label.lower() for label in labels for keyword in HUMAN_KEYWORDS)
+
+
+# ===================================
+# 🗜️ 업로드 전처리 (한 번 디코딩 → 축소 → JPEG 재인코딩)
+# ===================================
+MAX_SIDE = 1024                          # 얼굴/라벨 감지에는 긴 변 1024px 이면 충분
+JPEG_QUALITY = 80
+MAX_IMAGES_PER_REQUEST = 16              # batch_annotate_images 요청당 이미지 수 한도
+REQUEST_BYTE_BUDGET = 7 * 1024 * 1024    # 요청 JSON 10MB 한도 - base64(4/3) 팽창 고려한 원본 바이트 예산
+
+# 이번 실행에서 원본 대비 실제로 보낸 바이트 (Mysql 단계 로그용)
+upload_stats = {"images": 0, "original_bytes": 0, "sent_bytes": 0}
+_stats_lock = threading.Lock()
+
+
+@dataclass
+class PreparedImage:
+    path: str
+    content: bytes          # Vision 으로 보낼 바이트
+    image_hash: int         # VisionCache 키 (dHash)
+
+
+def prepare_image(path: str, max_side: int = MAX_SIDE, quality: int = JPEG_QUALITY) -> PreparedImage:
+    """
+    파일을 한 번만 디코딩해서
+    - EXIF 회전 반영 + 긴 변 max_side 로 축소 후 JPEG 재인코딩
+    - 같은 디코딩 결과로 dHash 계산
+    이미 작은 JPEG 라 재인코딩이 오히려 커지면 원본 바이트를 그대로 쓴다.
+    """
+    with open(path, "rb") as f:
+        original = f.read()
+
+    with Image.open(io.BytesIO(original)) as image:
+        source_format = image.format
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # 투명 배경은 흰색으로 합성 (JPEG 는 알파 채널 없음)
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.split()[-1])
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        resized = max(image.size) > max_side
+        if resized:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        image_hash = dhash(image)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        content = buffer.getvalue()
+
+    if not resized and source_format == "JPEG" and len(original) <= len(content):
+        content = original
+
+    with _stats_lock:
+        upload_stats["images"] += 1
+        upload_stats["original_bytes"] += len(original)
+        upload_stats["sent_bytes"] += len(content)
+
+    return PreparedImage(path=path, content=content, image_hash=image_hash)
+
+
+def build_request(content: bytes) -> "vision.AnnotateImageRequest":
+    """얼굴 + 라벨 감지 요청 1건"""
+    return vision.AnnotateImageRequest(
+        image=vision.Image(content=content),
+        features=[
+            vision.Feature(type=vision.Feature.Type.FACE_DETECTION),
+            vision.Feature(type=vision.Feature.Type.LABEL_DETECTION)
+        ]
+    )
+
+
+def pack_batches(images: List[PreparedImage], byte_budget: int = REQUEST_BYTE_BUDGET,
+                 max_images: int = MAX_IMAGES_PER_REQUEST) -> List[List[PreparedImage]]:
+    """요청 크기 예산과 이미지 수 한도를 넘지 않게 순서대로 배치를 채운다"""
+    batches, current, current_bytes = [], [], 0
+    for item in images:
+        size = len(item.content)
+        if current and (len(current) >= max_images or current_bytes + size > byte_budget):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(item)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+# ===================================
+# 🖼️ 1. 로컬 이미지 1개 검사
+# ===================================
+def contains_human_file(image_path: str) -> bool:
+    """로컬 이미지 1개에서 사람 감지"""
+    try:
+        with open(image_path, "rb") as f:
+            content = f.read()
+        image = vision.Image(content=content)
+
+        # 얼굴 감지
+        faces = client.face_detection(image=image).face_annotations
+        if len(faces) > 0:
+            return True
+
+        # 라벨 감지
+        labels = client.label_detection(image=image).label_annotations
+        for label in labels:
+            if any(keyword in label.description.lower() for keyword in HUMAN_KEYWORDS):
+                return True
+
+    except Exception as e:
+        print(f"❌ Vision API 오류 (file: {image_path}): {e}")
+    return False
+
+
+# ===================================
+# 🖼️ 2. 로컬 이미지 여러 개 검사 (배치 처리 개선)
+# ===================================
+def contains_human_in_all_files(image_paths: list[str], batch_size: int = MAX_IMAGES_PER_REQUEST,
+                                cache: Optional[VisionCache] = None) -> bool:
+    """
+    이미지를 축소/재인코딩한 뒤 요청 바이트 예산 기준으로 배치를 묶어 Vision API 로 보낸다.
+    - batch_size: 요청당 최대 이미지 수 (바이트 예산이 먼저 차면 더 작게 나뉜다)
+    - cache 를 넘기면 dHash 가 가까운 이미지의 이전 판정(얼굴 수/라벨)을 재사용하고,
+      캐시에 없는 이미지만 보낸 뒤 결과를 캐시에 저장한다.
+    """
+    if not image_paths:
+        print("❌ 이미지 경로가 비어 있음")
+        return False
+
+    # ✅ 이미지 확장자 필터링 (mp4 등 제거)
+    valid_paths = [p for p in image_paths if p.lower().endswith((".jpg", ".jpeg", ".png"))]
+    if not valid_paths:
+        print("❌ 유효한 이미지 파일이 없음")
+        return False
+
+    # ✅ 전처리 + 캐시 조회: 재게시/중복 홍보 이미지는 API 호출 없이 판정
+    pending: List[PreparedImage] = []
+    for path in valid_paths:
+        try:
+            prepared = prepare_image(path)
+        except Exception as e:
+            print(f"❌ 로컬 파일 읽기 오류: {path}, {e}")
+            continue
+        if cache is not None:
+            verdict = cache.get(prepared.image_hash)
+            if verdict is not None:
+                if is_human_verdict(*verdict):
+                    print(f"🚫 사람 감지됨(캐시): {path}")
+                    return True
+                continue
+        pending.append(prepared)
+
+    # ✅ 바이트 예산 단위로 Vision API 요청
+    for batch in pack_batches(pending, max_images=min(batch_size, MAX_IMAGES_PER_REQUEST)):
+        requests_list = [build_request(item.content) for item in batch]
+        response = client.batch_annotate_images(requests=requests_list)
+
+        # 배치 안의 판정은 모두 캐시에 남긴 뒤 결과를 반환한다
+        found = False
+        for item, res in zip(batch, response.responses):
+            if res.error.message:
+                print(f"❌ Vision API 오류 (file={item.path}): {res.error.message}")
+                continue
+
+            face_count = len(res.face_annotations)
+            labels = [label.description for label in res.label_annotations]
+            if cache is not None:
+                cache.put(item.image_hash, face_count, labels)
+
+            if found:
+                continue
+            if face_count > 0:
+                # print(f"🚫 사람 감지됨: {item.path}")
+                found = True
+            else:
+                for label in labels:
+                    if any(keyword in label.lower() for keyword in HUMAN_KEYWORDS):
+                        print(f"🚫 라벨 감지됨(사람 관련): {item.path} ({label})")
+                        found = True
+                        break
+
+        if found:
+            return True
+
+    return False
+
+# ===================================
+# 🌐 3. URL 이미지 1개 검사
+# ===================================
+def contains_human_url(image_url: str) -> bool:
+    """URL 1개에서 사람 감지"""
+    try:
+        resp = get_client().get(image_url, timeout=10)
+        if resp.status_code != 200:
+            print(f"❌ 이미지 다운로드 실패: {image_url}")
+            return False
+
+        content = resp.content
+        image = vision.Image(content=content)
+
+        faces = client.face_detection(image=image).face_annotations
+        if len(faces) > 0:
+            return True
+
+        labels = client.label_detection(image=image).label_annotations
+        for label in labels:
+            if any(keyword in label.description.lower() for keyword in HUMAN_KEYWORDS):
+                return True
+
+    except Exception as e:
+        print(f"❌ Vision API 오류 (url: {image_url}): {e}")
+    return False
+
+
+# ===================================
+# 🌐 4. URL 이미지 여러 개 검사 (배치 처리)
+# ===================================
+def contains_human_in_all_urls(image_urls: list[str]) -> bool:
+    if not image_urls:
+        print("❌ URL 리스트가 비어 있음")
+        return False
+
+    requests_list = []
+    valid_urls = []   # 다운로드 성공한 URL만 따로 저장
+
+    # 이미지는 공용 클라이언트의 커넥션 풀에서 동시에 받는다 (입력 순서 유지, 실패는 예외 객체)
+    responses = get_client().get_many(image_urls, timeout=10)
+    for url, resp in zip(image_urls, responses):
+        try:
+            if isinstance(resp, Exception):
+                raise resp
+            if resp.status_code != 200:
+                print(f"❌ 이미지 다운로드 실패: {url}")
+                continue
+
+            image = vision.Image(content=resp.content)
+            annotate_request = vision.AnnotateImageRequest(
+                image=image,
+                features=[
+                    vision.Feature(type=vision.Feature.Type.FACE_DETECTION),
+                    vision.Feature(type=vision.Feature.Type.LABEL_DETECTION)
+                ]
+            )
+            requests_list.append(annotate_request)
+            valid_urls.append(url)
+
+        except Exception as e:
+            print(f"❌ URL 요청 실패: {url}, {e}")
+
+    if not requests_list:
+        print("❌ 유효한 URL 이미지가 없음")
+        return False
+
+    response = client.batch_annotate_images(requests=requests_list)
+
+    for idx, res in enumerate(response.responses):
+        if res.error.message:
+            print(f"❌ Vision API 오류 (url={valid_urls[idx]}): {res.error.message}")
+            continue
+
+        if len(res.face_annotations) > 0:
+            # print(f"🚫 사람 감지됨: {valid_urls[idx]}")
+            return True
+
+        for label in res.label_annotations:
+            if any(keyword in label.description.lower() for keyword in HUMAN_KEYWORDS):
+                print(f"🚫 라벨 감지됨(사람 관련): {valid_urls[idx]} ({label.description})")
+                return True
+
+    return False
+
+
+# ===================================
+# 🧪 테스트
+# ===================================
+if __name__ == "__main__":
+    # ✅ 로컬 단일 테스트
+    # local_file = "sample.jpg"
+    # print(f"[로컬 1개] {contains_human_file(local_file)}")
+
+    # # ✅ 로컬 여러 개 테스트
+    # local_list = ["sample.jpg", "sample2.jpg"]
+    # print(f"[로컬 여러 개] {contains_human_in_all_files(local_list)}")
+
+    # ✅ URL 단일 테스트
+    # url_file = "https://scontent-icn2-1.cdninstagram.com/v/t51.82787-15/565417090_17864747205473410_3126136565006634466_n.jpg?stp=dst-jpg_e35_tt6&_nc_cat=108&ccb=1-7&_nc_sid=18de74&efg=eyJlZmdfdGFnIjoiQ0FST1VTRUxfSVRFTS5iZXN0X2ltYWdlX3VybGdlbi5DMyJ9&_nc_ohc=hd8y4X23JGMQ7kNvwFwRexL&_nc_oc=AdnE1KUZNxyhYYZ5KKjcCMvvZR2oBDHXJ5WAQwkKJaoNpizxm4AGoqBIbxzXYskWuPc&_nc_zt=23&_nc_ht=scontent-icn2-1.cdninstagram.com&edm=AEoDcc0EAAAA&_nc_gid=GlzyGCrbEDWlbvWdep2TBQ&oh=00_Afc-KMxIrJpYK3iefhT3xW3tmuXibVXHazGyxSjcX7873g&oe=68F5AFC0"
+    # print(f"[URL 1개] {contains_human_url(url_file)}")
+
+    # # ✅ URL 여러 개 테스트
+    url_list = [
+        "https://scontent-icn2-1.cdninstagram.com/v/t51.82787-15/565417090_17864747205473410_3126136565006634466_n.jpg?stp=dst-jpg_e35_tt6&_nc_cat=108&ccb=1-7&_nc_sid=18de74&efg=eyJlZmdfdGFnIjoiQ0FST1VTRUxfSVRFTS5iZXN0X2ltYWdlX3VybGdlbi5DMyJ9&_nc_ohc=hd8y4X23JGMQ7kNvwFwRexL&_nc_oc=AdnE1KUZNxyhYYZ5KKjcCMvvZR2oBDHXJ5WAQwkKJaoNpizxm4AGoqBIbxzXYskWuPc&_nc_zt=23&_nc_ht=scontent-icn2-1.cdninstagram.com&edm=AEoDcc0EAAAA&_nc_gid=GlzyGCrbEDWlbvWdep2TBQ&oh=00_Afc-KMxIrJpYK3iefhT3xW3tmuXibVXHazGyxSjcX7873g&oe=68F5AFC0",
+        "https://scontent-icn2-1.cdninstagram.com/v/t51.82787-15/565417090_17864747205473410_3126136565006634466_n.jpg?stp=dst-jpg_e35_tt6&_nc_cat=108&ccb=1-7&_nc_sid=18de74&efg=eyJlZmdfdGFnIjoiQ0FST1VTRUxfSVRFTS5iZXN0X2ltYWdlX3VybGdlbi5DMyJ9&_nc_ohc=hd8y4X23JGMQ7kNvwFwRexL&_nc_oc=AdnE1KUZNxyhYYZ5KKjcCMvvZR2oBDHXJ5WAQwkKJaoNpizxm4AGoqBIbxzXYskWuPc&_nc_zt=23&_nc_ht=scontent-icn2-1.cdninstagram.com&edm=AEoDcc0EAAAA&_nc_gid=GlzyGCrbEDWlbvWdep2TBQ&oh=00_Afc-KMxIrJpYK3iefhT3xW3tmuXibVXHazGyxSjcX7873g&oe=68F5AFC0"
+    ]
+    print(f"[URL 여러 개] {contains_human_in_all_urls(url_list)}")
\ No newline at end of file
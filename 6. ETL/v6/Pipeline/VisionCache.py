@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+
+
+DEFAULT_PATH = "vision_cache.db"
+MAX_DISTANCE = 5   # dHash 64비트 중 이 개수 이하로 다르면 같은 이미지로 본다
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """
+    difference hash (64비트)
+    재압축/리사이즈/약한 보정에는 거의 변하지 않아 리포스트된 홍보 이미지를 찾는 데 쓴다
+    """
+    gray = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def dhash_file(path: str) -> int:
+    with Image.open(path) as image:
+        return dhash(image)
+
+
+# ==============================
+# 👤 Vision 판정 캐시 (perceptual hash)
+# ==============================
+class VisionCache:
+    """
+    dHash → (얼굴 수, 라벨 목록). Hamming 거리 max_distance 이내면 같은 이미지로 보고 재사용한다.
+    항목 수가 수만 건 수준이라 메모리에 올려두고 선형 탐색한다 (SQLite는 영속화 용도).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = MAX_DISTANCE):
+        self.path = path or os.getenv("VISION_CACHE_DB", DEFAULT_PATH)
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS vision_cache (
+                    hash TEXT PRIMARY KEY,
+                    face_count INTEGER NOT NULL,
+                    labels TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+        # SQLite INTEGER는 부호 있는 64비트라 해시는 16진 문자열로 저장
+        self.entries: Dict[int, Tuple[int, List[str]]] = {
+            int(h, 16): (face_count, json.loads(labels))
+            for h, face_count, labels in self.conn.execute("SELECT hash, face_count, labels FROM vision_cache")
+        }
+
+    def get(self, image_hash: int) -> Optional[Tuple[int, List[str]]]:
+        """가장 가까운 항목의 (얼굴 수, 라벨), 허용 거리 밖이면 None"""
+        best = None
+        best_distance = self.max_distance + 1
+        with self.lock:
+            for h, verdict in self.entries.items():
+                distance = bin(h ^ image_hash).count("1")
+                if distance < best_distance:
+                    best, best_distance = verdict, distance
+                    if distance == 0:
+                        break
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def put(self, image_hash: int, face_count: int, labels: List[str]):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO vision_cache (hash, face_count, labels, created_at) VALUES (?, ?, ?, ?)",
+                (f"{image_hash:016x}", face_count, json.dumps(labels, ensure_ascii=False), time.time()),
+            )
+            self.entries[image_hash] = (face_count, labels)
+
+    @property
+    def saved_calls(self) -> int:
+        """캐시 적중으로 생략한 Vision 이미지 요청 수"""
+        return self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,189 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Optional
+# -------------------------------------------------
+# Logger import: main 실행 + 단독 실행 모두 지원
+# -------------------------------------------------
+try:
+    # 패키지 실행(main.py) 시: Pipeline → 상위 폴더 → Logger.py
+    from .Logger import Logger
+    from .VisionCache import VisionCache
+    from .HumanDetector import HumanScreen
+    from . import VisionAPI
+    from .Metrics import metrics
+except ImportError:
+    # 단독 실행(Pipeline/VisionScheduler.py) 시: sys.path로 상위 폴더 추가
+    import sys, os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Logger import Logger
+    from VisionCache import VisionCache
+    from HumanDetector import HumanScreen
+    import VisionAPI
+    from Metrics import metrics
+
+
+# ==============================
+# 🗂 팝업 여러 개를 묶어서 보내는 Vision 스케줄러
+# ==============================
+class VisionScheduler:
+    """
+    팝업별 이미지 목록을 받아 하나의 대기열로 합친 뒤, 워커가 요청 직전에
+    바이트 예산/이미지 수 한도까지 대기열에서 꺼내 batch_annotate_images 로 보낸다.
+    - 어떤 팝업에서 사람이 한 번 감지되면 그 팝업의 남은 이미지는 보내지 않는다
+    - screen 이 있으면 캐시에 없는 이미지를 로컬 검출기로 먼저 거르고, 애매한 이미지만 보낸다
+    - 판정: True(사람 있음) / False(없음) / None(요청 오류 → 호출 측에서 재시도 대상)
+    """
+
+    def __init__(self, cache: Optional[VisionCache] = None, screen: Optional[HumanScreen] = None,
+                 max_workers: int = 4, byte_budget: int = VisionAPI.REQUEST_BYTE_BUDGET,
+                 max_images: int = VisionAPI.MAX_IMAGES_PER_REQUEST):
+        self.cache = cache
+        self.screen = screen
+        self.max_workers = max(1, max_workers)
+        self.byte_budget = byte_budget
+        self.max_images = min(max_images, VisionAPI.MAX_IMAGES_PER_REQUEST)
+        self.lock = threading.Lock()
+        self.api_calls = 0
+        self.images_sent = 0
+        self.images_skipped = 0
+        self.log = Logger("VisionScheduler", stage="vision")
+
+    # ---------- 전처리 + 캐시 ----------
+    def _prepare(self, key: Hashable, path: str):
+        try:
+            return key, VisionAPI.prepare_image(path)
+        except Exception as e:
+            self.log.error(f"❌ 로컬 파일 읽기 오류: {path}, {e}", every=Logger.item_every)
+            return key, None
+
+    # ---------- 배치 전송 ----------
+    def _next_batch(self, queue: deque, verdicts: Dict[Hashable, Optional[bool]]):
+        """대기열에서 아직 사람이 감지되지 않은 팝업의 이미지만 한도까지 꺼낸다"""
+        batch, size = [], 0
+        with self.lock:
+            while queue and len(batch) < self.max_images:
+                key, item = queue[0]
+                if verdicts.get(key) is True:
+                    queue.popleft()
+                    self.images_skipped += 1
+                    continue
+                if batch and size + len(item.content) > self.byte_budget:
+                    break
+                queue.popleft()
+                batch.append((key, item))
+                size += len(item.content)
+        return batch
+
+    def _worker(self, queue: deque, verdicts: Dict[Hashable, Optional[bool]]):
+        while True:
+            batch = self._next_batch(queue, verdicts)
+            if not batch:
+                return
+            start = time.perf_counter()
+            try:
+                response = VisionAPI.client.batch_annotate_images(
+                    requests=[VisionAPI.build_request(item.content) for _, item in batch]
+                )
+            except Exception as e:
+                metrics.add("vision", "errors")
+                self.log.error(f"Vision 요청 실패 (이미지 {len(batch)}장): {e}")
+                self._undecided(batch, verdicts)
+                continue
+
+            with self.lock:
+                self.api_calls += 1
+                self.images_sent += len(batch)
+            metrics.add("vision", "calls")
+            metrics.add("vision", "api_seconds", time.perf_counter() - start)
+            metrics.add("vision", "images", len(batch))
+            metrics.add("vision", "bytes_out", sum(len(item.content) for _, item in batch))
+
+            try:
+                self._apply(batch, response, verdicts)
+            except Exception as e:
+                # 캐시 기록 실패 등: 판정을 확신할 수 없으므로 미판정(None) → 업로드하지 않고 다음 실행에서 재시도
+                metrics.add("vision", "errors")
+                self.log.error(f"Vision 결과 처리 실패 (이미지 {len(batch)}장): {e}")
+                self._undecided(batch, verdicts)
+
+    def _apply(self, batch, response, verdicts: Dict[Hashable, Optional[bool]]):
+        for (key, item), res in zip(batch, response.responses):
+            if res.error.message:
+                self.log.error(f"❌ Vision API 오류 (file={item.path}): {res.error.message}", every=Logger.item_every)
+                self._undecided([(key, item)], verdicts)
+                continue
+            face_count = len(res.face_annotations)
+            labels = [label.description for label in res.label_annotations]
+            if self.cache is not None:
+                self.cache.put(item.image_hash, face_count, labels)
+            if VisionAPI.is_human_verdict(face_count, labels):
+                with self.lock:
+                    verdicts[key] = True
+
+    def _undecided(self, batch, verdicts: Dict[Hashable, Optional[bool]]):
+        """사람이 이미 감지된 팝업은 그대로, 나머지는 미판정(None)"""
+        with self.lock:
+            for key, _ in batch:
+                if verdicts.get(key) is not True:
+                    verdicts[key] = None
+
+    # ---------- 진입점 ----------
+    def check_all(self, groups: Dict[Hashable, List[str]]) -> Dict[Hashable, Optional[bool]]:
+        """{팝업 키: 이미지 경로 목록} → {팝업 키: 사람 포함 여부}"""
+        self.api_calls = self.images_sent = self.images_skipped = 0
+        verdicts: Dict[Hashable, Optional[bool]] = {key: False for key in groups}
+
+        jobs = [
+            (key, path)
+            for key, paths in groups.items()
+            for path in paths
+            if path.lower().endswith((".jpg", ".jpeg", ".png"))   # mp4 등 제거
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            prepared = list(pool.map(lambda job: self._prepare(*job), jobs))
+
+        # ✅ 캐시로 판정되는 이미지는 대기열에 넣지 않는다
+        misses = []
+        for key, item in prepared:
+            if item is None:
+                continue
+            if self.cache is not None:
+                verdict = self.cache.get(item.image_hash)
+                if verdict is not None:
+                    metrics.add("vision", "cache_hits")
+                    if VisionAPI.is_human_verdict(*verdict):
+                        verdicts[key] = True
+                    continue
+                metrics.add("vision", "cache_misses")
+            misses.append((key, item))
+
+        # ✅ 로컬 검출기로 확실한 이미지는 Vision 없이 판정
+        if self.screen is not None:
+            misses = [(key, item) for key, item in misses if verdicts[key] is not True]
+            local = self.screen.screen([item.path for _, item in misses])
+            undecided = []
+            for key, item in misses:
+                verdict = local.get(item.path)
+                if verdict is True:
+                    verdicts[key] = True
+                elif verdict is None:
+                    undecided.append((key, item))
+            metrics.add("vision", "local_decided", len(misses) - len(undecided))
+            misses = undecided
+
+        queue = deque(misses)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._worker, queue, verdicts) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()   # 워커에서 처리하지 못한 예외는 조용히 버리지 않고 호출한 쪽으로 올린다
+
+        metrics.add("vision", "images_skipped", self.images_skipped)
+        self.log.plain(
+            f"🗂 Vision 팝업 {len(groups)}개 / 이미지 {len(jobs)}장: "
+            f"요청 {self.api_calls}회, 전송 {self.images_sent}장, 조기 종료로 생략 {self.images_skipped}장"
+        )
+        return verdicts
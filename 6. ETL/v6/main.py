@@ -1,7 +1,53 @@
-from Pipeline.Logger import *
-from Pipeline.InstagramAPI import *
-from Pipeline.GptAPI import *
+from dotenv import load_dotenv
+import os
+import argparse
 
+# ✅ main.py 위치 기준으로 .env 로드
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+from Pipeline.StateStore import StateStore
+from Pipeline.InstagramAPI import InstagramAPI
+from Pipeline.GptAPI import GptAPI
+from Pipeline.GeoCoding import GeoCoding
+from Pipeline.Mysql import Mysql
+from Pipeline.Alert import Alert
+from Pipeline.Runner import Runner
+from Pipeline import Database
+from Pipeline.Metrics import metrics
+
+
+# 서버에서는 local = true로 해주세요(루프백 아이피이기 때문)
 if __name__ == "__main__":
-    # InstagramAPI.play()
-    GptAPI.play(download=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sequential", action="store_true", help="단계별로 JSON 파일을 거쳐 순서대로 실행 (이전 방식)")
+    parser.add_argument("--resume", action="store_true", help="마지막으로 끝나지 않은 실행의 미완료 게시물만 이어서 처리")
+    parser.add_argument("--snapshot", metavar="DIR", help="스트리밍 실행 시 단계별 출력을 DIR 에 JSON 으로 저장")
+    parser.add_argument("--metrics", metavar="DIR", default=os.getenv("METRICS_DIR", "metrics"), help="실행 리포트(JSON/CSV) 저장 폴더")
+    parser.add_argument("--prometheus", metavar="PATH", help="Prometheus 텍스트 포맷 지표 파일 (node_exporter textfile)")
+    parser.add_argument(
+        "--warm-geo-cache", action="store_true",
+        default=os.getenv("GEO_WARM_UP", "").lower() in ("1", "true", "yes"),
+        help="시작 전에 popup 테이블의 좌표로 지오코딩 캐시를 채움 (환경 변수 GEO_WARM_UP=1 과 같음)",
+    )
+    args = parser.parse_args()
+    if args.resume and args.sequential:
+        parser.error("--resume 은 스트리밍 실행에서만 지원 (--sequential 은 단계별 JSON 파일로 재실행)")
+
+    # 모든 단계가 같은 상태 저장소(etl_state.db)를 공유 → 이미 처리한 게시물은 건너뜀
+    state = StateStore()
+    Mysql.mark_existing(local=False, state=state)   # DB에 이미 있는 게시물은 수집 단계에서부터 제외
+
+    if args.sequential:
+        # 인스타그램 수집 결과를 popup.json 없이 바로 GPT 단계로 스트리밍 -> gpt.json
+        GptAPI.play(download=True, posts=InstagramAPI.stream(state), state=state)
+        GeoCoding.play(state, warm_up=args.warm_geo_cache)   # 도로명주소 및 좌표(경도/위도) 추가 -> geo.json
+        Mysql.play(local=False, state=state)    # mysql에 저장 -> mysql.json
+        Alert.play(local=False, state=state)    # 유저에게 알림 전송
+    else:
+        # 수집 → GPT → 지오코딩 → 업로드 → 알림 을 큐로 이어 동시에 진행 (JSON 파일은 --snapshot 일 때만)
+        Runner.play(local=False, state=state, download=True, snapshot_dir=args.snapshot, resume=args.resume,
+                    warm_up=args.warm_geo_cache)
+    Database.report_all()                   # 단계 전체 DB 쿼리 통계
+    metrics.report()                        # 단계별 시간 / API 호출 / 토큰 / 캐시 / 추정 비용
+    metrics.save(args.metrics, prometheus=args.prometheus)